@@ -3,7 +3,6 @@
 from io import BytesIO
 import numpy as np
 import httpx
-import faster_whisper
 from pydantic import BaseModel
 from fastapi import (
     HTTPException,
@@ -11,6 +10,8 @@ from fastapi import (
 )
 from typing import Annotated, Any, BinaryIO, Literal, Generator, Union, Optional, List, Tuple
 
+from modules.utils.audio_manager import LowMemoryOptions, decode_pcm
+
 
 class AudioInfo(BaseModel):
     duration: float # 音频时长，单位为秒
@@ -18,9 +19,13 @@ class AudioInfo(BaseModel):
 
 async def read_audio(
     file: Optional[UploadFile] = None,
-    file_url: Optional[str] = None
+    file_url: Optional[str] = None,
+    low_memory: Optional[LowMemoryOptions] = None
 ):
-    """Read audio from "UploadFile". This resamples sampling rates to 16000."""
+    """
+    Read audio from "UploadFile". This resamples sampling rates to 16000.
+    With `low_memory`, the audio is decoded to int16 PCM, which is disk-backed above its memmap threshold.
+    """
     if (file and file_url) or (not file and not file_url):
         raise HTTPException(status_code=400, detail="Provide only one of file or file_url")
 
@@ -33,6 +38,6 @@ async def read_audio(
             raise HTTPException(status_code=422, detail="Could not download the file")
         file_content = file_response.content
     file_bytes = BytesIO(file_content)
-    audio = faster_whisper.audio.decode_audio(file_bytes)
+    audio = decode_pcm(file_bytes, 16000, low_memory=low_memory)
     duration = len(audio) / 16000
     return audio, AudioInfo(duration=duration)
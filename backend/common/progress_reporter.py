@@ -0,0 +1,108 @@
+import functools
+import time
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from backend.common.config_loader import load_server_config
+from backend.db.task.dao import update_tasks_in_db
+from backend.db.task.models import TaskStatus
+from modules.utils.logger import get_logger
+
+logger = get_logger()
+
+
+class ProgressReporter:
+    """
+    Keeps the progress of the running tasks in memory and writes it to the db in batches, instead of committing an
+    update for every progress report.
+
+    The pending progress of all the tasks is flushed in a single transaction when any task progresses by
+    `min_progress_delta` since its last flush, and otherwise at most every `flush_interval_ms` by a background thread.
+    Terminal states of the tasks are always written right away, together with the pending progress.
+    """
+    def __init__(self,
+                 flush_interval_ms: float = 1000,
+                 min_progress_delta: float = 0.05,
+                 writer: Callable[[Dict[str, Dict[str, Any]]], None] = update_tasks_in_db):
+        """
+        Parameters
+        ----------
+        flush_interval_ms: float
+            Maximum time in milliseconds that a progress stays in memory before it's written to the db
+        min_progress_delta: float
+            Change of the progress between 0 and 1 since the last flush of a task that flushes immediately
+        writer: Callable[[Dict[str, Dict[str, Any]]], None]
+            Function that writes the updates of the tasks, keyed by the identifier, in a single transaction
+        """
+        self.flush_interval = flush_interval_ms / 1000
+        self.min_progress_delta = min_progress_delta
+        self.writer = writer
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._flushed_progress: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+
+    def report(self, identifier: str, progress: float):
+        """Record the progress of the task, it's written to the db later with the other pending updates"""
+        progress = round(progress, 2)
+        with self._lock:
+            self._pending[identifier] = {
+                "uuid": identifier,
+                "status": TaskStatus.IN_PROGRESS,
+                "progress": progress,
+                "updated_at": datetime.utcnow()
+            }
+            flush_now = abs(progress - self._flushed_progress.get(identifier, 0.0)) >= self.min_progress_delta
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+                self._flusher.start()
+
+        if flush_now:
+            self.flush()
+
+    def finish(self, identifier: str, update_data: Dict[str, Any]):
+        """
+        Write the terminal state of the task immediately, with the pending updates of the other tasks.
+        The pending progress of the task itself is discarded in favor of `update_data`.
+        """
+        with self._write_lock:
+            with self._lock:
+                self._pending.pop(identifier, None)
+                updates = self._take_pending()
+                self._flushed_progress.pop(identifier, None)
+            updates[identifier] = update_data
+            self.writer(updates)
+
+    def flush(self):
+        """Write all the pending updates to the db in a single transaction"""
+        # The batch is taken and written under the write lock, so an older batch can't overwrite a newer one
+        with self._write_lock:
+            with self._lock:
+                updates = self._take_pending()
+            if updates:
+                self.writer(updates)
+
+    def _take_pending(self) -> Dict[str, Dict[str, Any]]:
+        updates, self._pending = self._pending, {}
+        for identifier, update_data in updates.items():
+            self._flushed_progress[identifier] = update_data["progress"]
+        return updates
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush the progress of the tasks")
+
+
+@functools.lru_cache
+def get_progress_reporter() -> ProgressReporter:
+    config = load_server_config().get("progress", {})
+    return ProgressReporter(
+        flush_interval_ms=config.get("flush_interval_ms", 1000),
+        min_progress_delta=config.get("min_progress_delta", 0.05)
+    )
@@ -1,9 +1,10 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Sequence
+import numpy as np
 from sqlalchemy.orm import Session
 from fastapi import Depends
 
 from ..db_instance import handle_database_errors, get_db_session
-from .models import Task, TasksResult, TaskStatus
+from .models import Task, TasksResult, TaskStatus, TaskProfile, TaskProfilesResult, StagePercentilesResult
 
 
 @handle_database_errors
@@ -58,6 +59,30 @@ def update_task_status_in_db(
         session.commit()
 
 
+@handle_database_errors
+def update_tasks_in_db(
+    updates: Dict[str, Dict[str, Any]],
+    session: Session,
+):
+    """
+    Update the attributes of multiple tasks in a single transaction.
+
+    Args:
+        updates (Dict[str, Dict[str, Any]]): Attributes to update of each task, keyed by the identifier of the task.
+        session (Session, optional): Database session. Defaults to Depends(get_db_session).
+
+    Returns:
+        None
+    """
+    if not updates:
+        return
+    tasks = session.query(Task).filter(Task.uuid.in_(list(updates))).all()
+    for task in tasks:
+        for key, value in updates[task.uuid].items():
+            setattr(task, key, value)
+    session.commit()
+
+
 @handle_database_errors
 def get_task_status_from_db(
     identifier: str, session: Session
@@ -92,3 +117,70 @@ def delete_task_from_db(identifier: str, session: Session):
     else:
         # If the task does not exist, return False
         return False
+
+
+@handle_database_errors
+def add_task_profiles_to_db(
+    identifier: str,
+    profiles: List[Dict[str, Any]],
+    audio_duration: Optional[float],
+    session: Session,
+):
+    """
+    Add the stage profiles of the task to the db.
+
+    Args:
+        identifier (str): Identifier of the task that the profiles belong to.
+        profiles (List[Dict[str, Any]]): Profiles from `PipelineProfiler.to_list()`.
+        audio_duration (Optional[float]): Duration of the audio of the task in seconds.
+        session (Session, optional): Database session. Defaults to Depends(get_db_session).
+    """
+    for profile in profiles:
+        session.add(TaskProfile(task_uuid=identifier, audio_duration=audio_duration, **profile))
+    session.commit()
+
+
+@handle_database_errors
+def get_task_profiles_from_db(identifier: str, session: Session):
+    """Get the stage profiles of the task from db"""
+    profiles = session.query(TaskProfile).filter(TaskProfile.task_uuid == identifier).order_by(TaskProfile.id).all()
+    return TaskProfilesResult(profiles=profiles)
+
+
+@handle_database_errors
+def get_stage_percentiles_from_db(
+    session: Session,
+    percentiles: Sequence[float] = (50, 90, 95, 99),
+    stage: Optional[str] = None,
+):
+    """
+    Get the percentiles of the wall time, CPU time, peak memory and RTF of each stage from db.
+
+    Args:
+        session (Session, optional): Database session. Defaults to Depends(get_db_session).
+        percentiles (Sequence[float]): Percentiles to compute, between 0 and 100.
+        stage (Optional[str]): Name of the stage to compute only. All the stages are computed if it's None.
+
+    Returns:
+        StagePercentilesResult: Percentiles of each stage. A metric without any value has None percentiles.
+    """
+    metrics = ["wall_time", "cpu_time", "peak_memory", "rtf"]
+    query = session.query(TaskProfile.stage, *[getattr(TaskProfile, metric) for metric in metrics])
+    if stage is not None:
+        query = query.filter(TaskProfile.stage == stage)
+
+    rows_by_stage: Dict[str, List[tuple]] = {}
+    for row in query:
+        rows_by_stage.setdefault(row[0], []).append(row[1:])
+
+    result = StagePercentilesResult()
+    for stage_name, rows in rows_by_stage.items():
+        result.count[stage_name] = len(rows)
+        result.percentiles[stage_name] = {}
+        for i, metric in enumerate(metrics):
+            values = np.array([row[i] for row in rows if row[i] is not None], dtype=np.float64)
+            result.percentiles[stage_name][metric] = {
+                f"p{percentile:g}": float(np.percentile(values, percentile)) if values.size else None
+                for percentile in percentiles
+            }
+    return result
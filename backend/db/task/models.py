@@ -2,7 +2,7 @@
 
 from enum import Enum
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict
 from uuid import uuid4
 from datetime import datetime
 from sqlalchemy.types import Enum as SQLAlchemyEnum
@@ -182,3 +182,73 @@ class Task(SQLModel, table=True):
 class TasksResult(BaseModel):
     tasks: List[Task]
 
+
+
+class TaskProfile(SQLModel, table=True):
+    """
+    Table to store the timings of each stage of the tasks, separated from `Task` to query them per stage.
+
+    Attributes:
+    - id: Unique identifier for each row (Primary Key).
+    - task_uuid: Universally unique identifier of the task that the stage belongs to.
+    - stage: Name of the stage of the pipeline.
+    - wall_time: Wall clock time of the stage in seconds.
+    - cpu_time: CPU time of the process during the stage in seconds.
+    - peak_memory: Peak resident memory of the process during the stage in bytes.
+    - rtf: Real-time factor of the stage, the wall time divided by the audio duration.
+    - audio_duration: Duration of the audio in seconds.
+    - created_at: Date and time of creation.
+    """
+
+    __tablename__ = "task_profiles"
+
+    id: Optional[int] = Field(
+        default=None,
+        primary_key=True,
+        description="Unique identifier for each row (Primary Key)"
+    )
+    task_uuid: str = Field(
+        index=True,
+        description="Universally unique identifier of the task that the stage belongs to"
+    )
+    stage: str = Field(
+        index=True,
+        description="Name of the stage of the pipeline"
+    )
+    wall_time: float = Field(
+        default=0.0,
+        description="Wall clock time of the stage in seconds"
+    )
+    cpu_time: float = Field(
+        default=0.0,
+        description="CPU time of the process during the stage in seconds"
+    )
+    peak_memory: Optional[int] = Field(
+        default=None,
+        description="Peak resident memory of the process during the stage in bytes"
+    )
+    rtf: Optional[float] = Field(
+        default=None,
+        description="Real-time factor of the stage, the wall time divided by the audio duration"
+    )
+    audio_duration: Optional[float] = Field(
+        default=None,
+        description="Duration of the audio in seconds"
+    )
+    created_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        description="Date and time of creation"
+    )
+
+
+class TaskProfilesResult(BaseModel):
+    profiles: List[TaskProfile]
+
+
+class StagePercentilesResult(BaseModel):
+    """Percentiles of the metrics of each stage, as `{stage: {metric: {percentile: value}}}`"""
+    count: Dict[str, int] = Field(default_factory=dict, description="Number of the profiles of each stage")
+    percentiles: Dict[str, Dict[str, Dict[str, Optional[float]]]] = Field(
+        default_factory=dict,
+        description="Percentiles of the wall time, CPU time, peak memory and RTF of each stage"
+    )
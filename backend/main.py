@@ -18,7 +18,10 @@ from backend.routers.face_search.router import face_search_router
 from backend.routers.interview.router import interview_router
 from backend.common.config_loader import read_env, load_server_config
 from backend.common.cache_manager import cleanup_old_files
-from modules.utils.paths import SERVER_CONFIG_PATH, BACKEND_CACHE_DIR
+from modules.utils.paths import SERVER_CONFIG_PATH, BACKEND_CACHE_DIR, PCM_CACHE_DIR
+from modules.utils.model_registry import get_model_registry
+from modules.utils.audio_manager import register_pcm_cache
+from modules.utils.disk_cache import NumpyDiskLRUCache
 
 
 def clean_cache_thread(ttl: int, frequency: int) -> threading.Thread:
@@ -41,6 +44,19 @@ async def lifespan(app: FastAPI):
     read_env("DB_URL")  # Place .env file into /configs/.env
     init_db()
 
+    registry_config = server_config.get("model_registry", {})
+    get_model_registry().configure(
+        memory_budget_bytes=int(registry_config.get("memory_budget_gb", 0) * 1024 ** 3),
+        idle_timeout=registry_config.get("idle_timeout", 0)
+    )
+
+    pcm_cache_config = server_config.get("pcm_cache", {})
+    if pcm_cache_config.get("enable", False):
+        register_pcm_cache(NumpyDiskLRUCache(
+            cache_dir=PCM_CACHE_DIR,
+            max_bytes=int(pcm_cache_config.get("max_size_gb", 2) * 1024 ** 3)
+        ))
+
     # Inferencer initialization
     transcription_pipeline = get_pipeline()
     vad_inferencer = get_vad_model()
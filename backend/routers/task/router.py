@@ -1,19 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
+from typing import List, Optional
 import os
 
 from backend.db.db_instance import get_db_session
 from backend.db.task.dao import (
     get_task_status_from_db,
     get_all_tasks_status_from_db,
+    get_task_profiles_from_db,
+    get_stage_percentiles_from_db,
     delete_task_from_db,
 )
 from backend.db.task.models import (
     TasksResult,
     Task,
     TaskStatusResponse,
-    TaskType
+    TaskType,
+    TaskProfilesResult,
+    StagePercentilesResult
 )
 from backend.common.models import (
     Response,
@@ -24,6 +29,44 @@ from modules.utils.paths import BACKEND_CACHE_DIR
 task_router = APIRouter(prefix="/task", tags=["Tasks"])
 
 
+@task_router.get(
+    "/profiles/percentiles",
+    response_model=StagePercentilesResult,
+    status_code=status.HTTP_200_OK,
+    summary="Retrieve Percentiles of Stage Profiles",
+    description="Retrieve the percentiles of the wall time, CPU time, peak memory and real-time factor of each stage"
+                " of the pipeline over all the profiled tasks.",
+)
+async def get_stage_percentiles(
+    percentiles: List[float] = Query(default=[50, 90, 95, 99], description="Percentiles between 0 and 100"),
+    stage: Optional[str] = Query(default=None, description="Name of the stage. All stages if it's not given"),
+    session: Session = Depends(get_db_session),
+) -> StagePercentilesResult:
+    """
+    Retrieve the percentiles of the stage profiles for the capacity planning.
+    """
+    if any(not 0 <= percentile <= 100 for percentile in percentiles):
+        raise HTTPException(status_code=422, detail="Percentiles must be between 0 and 100")
+    return get_stage_percentiles_from_db(percentiles=percentiles, stage=stage, session=session)
+
+
+@task_router.get(
+    "/{identifier}/profile",
+    response_model=TaskProfilesResult,
+    status_code=status.HTTP_200_OK,
+    summary="Retrieve Stage Profiles of Task",
+    description="Retrieve the wall time, CPU time, peak memory and real-time factor of each stage of the task.",
+)
+async def get_task_profile(
+    identifier: str,
+    session: Session = Depends(get_db_session),
+) -> TaskProfilesResult:
+    """
+    Retrieve the stage profiles of a specific task by its identifier.
+    """
+    return get_task_profiles_from_db(identifier=identifier, session=session)
+
+
 @task_router.get(
     "/{identifier}",
     response_model=TaskStatusResponse,
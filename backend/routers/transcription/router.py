@@ -1,4 +1,5 @@
 import functools
+import tempfile
 import uuid
 import numpy as np
 from fastapi import (
@@ -7,49 +8,82 @@ from fastapi import (
 )
 import gradio as gr
 from fastapi import APIRouter, BackgroundTasks, Depends, Response, status
-from typing import List, Dict
+from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
 from datetime import datetime
 from modules.whisper.data_classes import *
-from modules.utils.paths import BACKEND_CACHE_DIR
+from modules.utils.paths import BACKEND_CACHE_DIR, STAGE_CACHE_DIR
+from modules.utils.disk_cache import DiskLRUCache
+from modules.utils.audio_manager import LowMemoryOptions
+from modules.utils.profiler import PipelineProfiler
 from modules.whisper.faster_whisper_inference import FasterWhisperInference
+from modules.whisper.pipeline_planner import PipelinePlanner
 from backend.common.audio import read_audio
 from backend.common.models import QueueResponse
 from backend.common.config_loader import load_server_config
+from backend.common.progress_reporter import get_progress_reporter
 from backend.db.task.dao import (
     add_task_to_db,
+    add_task_profiles_to_db,
     get_db_session,
     update_task_status_in_db
 )
 from backend.db.task.models import TaskStatus, TaskType
+from backend.routers.vad.router import get_vad_session_pool
 
 transcription_router = APIRouter(prefix="/transcription", tags=["Transcription"])
 
 
 def create_progress_callback(identifier: str):
+    reporter = get_progress_reporter()
+
     def progress_callback(progress_value: float):
-        update_task_status_in_db(
-            identifier=identifier,
-            update_data={
-                "uuid": identifier,
-                "status": TaskStatus.IN_PROGRESS,
-                "progress": round(progress_value, 2),
-                "updated_at": datetime.utcnow()
-            },
-        )
+        reporter.report(identifier, progress_value)
     return progress_callback
 
 
+@functools.lru_cache
+def get_low_memory_options() -> Optional[LowMemoryOptions]:
+    low_memory_config = load_server_config().get("low_memory", {})
+    if not low_memory_config.get("enable", False):
+        return None
+    return LowMemoryOptions(
+        memmap_threshold_mb=low_memory_config.get("memmap_threshold_mb", 512),
+        memmap_dir=low_memory_config.get("memmap_dir") or tempfile.gettempdir(),
+        window_s=low_memory_config.get("window_s", 1800)
+    )
+
+
 @functools.lru_cache
 def get_pipeline() -> 'FasterWhisperInference':
-    config = load_server_config()["whisper"]
+    server_config = load_server_config()
+    config = server_config["whisper"]
     inferencer = FasterWhisperInference(
-        output_dir=BACKEND_CACHE_DIR
+        output_dir=BACKEND_CACHE_DIR,
+        num_workers=config.get("num_workers", 1),
+        cpu_threads=config.get("cpu_threads", 0)
     )
     inferencer.update_model(
         model_size=config["model_size"],
         compute_type=config["compute_type"]
     )
+    stage_cache_config = server_config.get("stage_cache", {})
+    if stage_cache_config.get("enable", False):
+        inferencer.register_stage_cache(DiskLRUCache(
+            cache_dir=STAGE_CACHE_DIR,
+            max_bytes=int(stage_cache_config.get("max_size_gb", 5) * 1024 ** 3)
+        ))
+    planner_config = server_config.get("planner", {})
+    if planner_config.get("enable", False):
+        inferencer.register_planner(PipelinePlanner(
+            min_speech_ratio=planner_config.get("min_speech_ratio", 0.01),
+            min_music_ratio=planner_config.get("min_music_ratio", 0.2),
+            vad_silence_ratio=planner_config.get("vad_silence_ratio", 0.5),
+            shard_duration_s=planner_config.get("shard_duration_s", 600),
+            max_shards=planner_config.get("max_shards", 1)
+        ))
+    inferencer.register_low_memory(get_low_memory_options())
+    inferencer.vad.register_session_pool(get_vad_session_pool())
     return inferencer
 
 
@@ -57,6 +91,8 @@ def run_transcription(
     audio: np.ndarray,
     params: TranscriptionPipelineParams,
     identifier: str,
+    cascade_params: Optional[CascadeParams] = None,
+    incremental_params: Optional[IncrementalParams] = None,
 ) -> List[Segment]:
     update_task_status_in_db(
         identifier=identifier,
@@ -68,17 +104,50 @@ def run_transcription(
     )
 
     progress_callback = create_progress_callback(identifier)
-    segments, elapsed_time = get_pipeline().run(
-        audio,
-        gr.Progress(),
-        "SRT",
-        False,
-        progress_callback,  
-        *params.to_list()
-    )
+    profiler = PipelineProfiler()
+    try:
+        with profiler.stage("total"):
+            if incremental_params is not None and incremental_params.enable_incremental:
+                segments, elapsed_time = get_pipeline().run_incremental(
+                    audio,
+                    gr.Progress(),
+                    "SRT",
+                    False,
+                    progress_callback,
+                    incremental_params=incremental_params,
+                    profiler=profiler,
+                    params=params
+                )
+            else:
+                segments, elapsed_time = get_pipeline().run(
+                    audio,
+                    gr.Progress(),
+                    "SRT",
+                    False,
+                    progress_callback,
+                    profiler=profiler,
+                    params=params,
+                    cascade_params=cascade_params
+                )
+    except Exception as e:
+        get_progress_reporter().finish(
+            identifier=identifier,
+            update_data={
+                "uuid": identifier,
+                "status": TaskStatus.FAILED,
+                "error": str(e),
+                "updated_at": datetime.utcnow(),
+            },
+        )
+        raise
     segments = [seg.model_dump() for seg in segments]
+    add_task_profiles_to_db(
+        identifier=identifier,
+        profiles=profiler.to_list(),
+        audio_duration=profiler.audio_duration
+    )
 
-    update_task_status_in_db(
+    get_progress_reporter().finish(
         identifier=identifier,
         update_data={
             "uuid": identifier,
@@ -106,9 +175,11 @@ async def transcription(
     vad_params: VadParams = Depends(),
     bgm_separation_params: BGMSeparationParams = Depends(),
     diarization_params: DiarizationParams = Depends(),
+    cascade_params: CascadeParams = Depends(),
+    incremental_params: IncrementalParams = Depends(),
 ) -> QueueResponse:
     if not isinstance(file, np.ndarray):
-        audio, info = await read_audio(file=file)
+        audio, info = await read_audio(file=file, low_memory=get_low_memory_options())
     else:
         audio, info = file, None
 
@@ -125,7 +196,8 @@ async def transcription(
         audio_duration=info.duration if info else None,
         language=params.whisper.lang,
         task_type=TaskType.TRANSCRIPTION,
-        task_params=params.to_dict(),
+        task_params={**params.to_dict(), "cascade": cascade_params.to_dict(),
+                     "incremental": incremental_params.to_dict()},
     )
 
     background_tasks.add_task(
@@ -133,6 +205,8 @@ async def transcription(
         audio=audio,
         params=params,
         identifier=identifier,
+        cascade_params=cascade_params,
+        incremental_params=incremental_params,
     )
 
     return QueueResponse(identifier=identifier, status=TaskStatus.QUEUED, message="Transcription task has queued")
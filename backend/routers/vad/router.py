@@ -10,7 +10,11 @@ from typing import List, Dict
 from datetime import datetime
 
 from modules.vad.silero_vad import SileroVAD
+from modules.vad.vad_session_pool import VadSessionPool
 from modules.whisper.data_classes import VadParams
+from modules.utils.paths import STAGE_CACHE_DIR
+from modules.utils.disk_cache import DiskLRUCache
+from backend.common.config_loader import load_server_config
 from backend.common.audio import read_audio
 from backend.common.models import QueueResponse
 from backend.db.task.dao import add_task_to_db, update_task_status_in_db
@@ -19,10 +23,26 @@ from backend.db.task.models import TaskStatus, TaskType
 vad_router = APIRouter(prefix="/vad", tags=["Voice Activity Detection"])
 
 
+@functools.lru_cache
+def get_vad_session_pool() -> VadSessionPool:
+    server_config = load_server_config()
+    vad_config = server_config.get("vad", {})
+    return VadSessionPool(
+        num_sessions=vad_config.get("num_sessions", 0) or server_config["whisper"].get("num_workers", 1),
+        intra_op_num_threads=vad_config.get("cpu_threads", 0)
+    )
+
+
 @functools.lru_cache
 def get_vad_model() -> SileroVAD:
     inferencer = SileroVAD()
-    inferencer.update_model()
+    inferencer.register_session_pool(get_vad_session_pool())
+    stage_cache_config = load_server_config().get("stage_cache", {})
+    if stage_cache_config.get("enable", False):
+        inferencer.register_probs_cache(DiskLRUCache(
+            cache_dir=STAGE_CACHE_DIR,
+            max_bytes=int(stage_cache_config.get("max_size_gb", 5) * 1024 ** 3)
+        ))
     return inferencer
 
 
@@ -30,6 +50,7 @@ def run_vad(
     audio: np.ndarray,
     params: VadOptions,
     identifier: str,
+    fast_mode: bool = False,
 ) -> List[Dict]:
     update_task_status_in_db(
         identifier=identifier,
@@ -43,7 +64,8 @@ def run_vad(
     start_time = datetime.utcnow()
     audio, speech_chunks = get_vad_model().run(
         audio=audio,
-        vad_parameters=params
+        vad_parameters=params,
+        fast_mode=fast_mode
     )
     elapsed_time = (datetime.utcnow() - start_time).total_seconds()
 
@@ -94,7 +116,8 @@ async def vad(
         task_params=params.model_dump(),
     )
 
-    background_tasks.add_task(run_vad, audio=audio, params=vad_options, identifier=identifier)
+    background_tasks.add_task(run_vad, audio=audio, params=vad_options, identifier=identifier,
+                              fast_mode=params.fast_mode)
 
     return QueueResponse(identifier=identifier, status=TaskStatus.QUEUED, message="VAD task has queued")
 
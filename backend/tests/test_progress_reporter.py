@@ -0,0 +1,34 @@
+from backend.common.progress_reporter import ProgressReporter
+from backend.db.task.models import TaskStatus
+
+
+def get_progress(batch):
+    return {identifier: update_data["progress"] for identifier, update_data in batch.items()}
+
+
+def test_progress_reporter_coalesces_updates():
+    batches = []
+    # The interval is long enough that the background thread doesn't flush during the test, it's flushed directly
+    reporter = ProgressReporter(flush_interval_ms=60 * 60 * 1000, min_progress_delta=0.1, writer=batches.append)
+
+    for i in range(1, 90):
+        reporter.report("a", i / 1000)
+        reporter.report("b", i / 1000)
+    assert batches == []
+
+    reporter.report("a", 0.2)
+    assert [get_progress(batch) for batch in batches] == [{"a": 0.2, "b": 0.09}]
+
+    reporter.report("b", 0.15)
+    reporter.report("b", 0.16)
+    reporter.flush()
+    assert [get_progress(batch) for batch in batches] == [{"a": 0.2, "b": 0.09}, {"b": 0.16}]
+
+    reporter.flush()
+    assert len(batches) == 2
+
+    reporter.report("a", 0.25)
+    reporter.report("b", 0.17)
+    reporter.finish("a", {"status": TaskStatus.COMPLETED, "progress": 1.0})
+    assert batches[2]["a"] == {"status": TaskStatus.COMPLETED, "progress": 1.0}
+    assert get_progress(batches[2]) == {"a": 1.0, "b": 0.17}
@@ -0,0 +1,225 @@
+# 这个脚本用于对三种Whisper实现（faster-whisper、whisper、insanely-fast-whisper）进行基准测试。它会生成一组固定的合成音频（不同的时长、静音比例和背景音乐），对每种阶段组合（VAD、BGM分离、说话人分离的开关）测量实时率(RTF)、峰值内存和每秒片段数，并将结果写入JSON文件，方便对比不同版本的性能变化。
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from modules.utils.paths import WEBUI_DIR, OUTPUT_DIR
+from modules.utils.cli_manager import str2bool
+from modules.utils.profiler import PipelineProfiler
+from modules.whisper.data_classes import *
+
+SAMPLE_RATE = 16000
+DEFAULT_SPEECH_PATH = os.path.join(WEBUI_DIR, "tests", "jfk.wav")
+BENCHMARK_OUTPUT_DIR = os.path.join(OUTPUT_DIR, "benchmark")
+
+
+@dataclass
+class BenchmarkClip:
+    name: str
+    audio: np.ndarray
+    duration: float
+    silence_ratio: float
+    music: bool
+
+
+def synthesize_speech(duration: float, rng: np.random.Generator) -> np.ndarray:
+    """Speech-like harmonic tones with syllable-rate envelopes, used when no speech recording is available"""
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    f0 = 120 + 60 * np.sin(2 * np.pi * 0.5 * t + rng.uniform(0, np.pi))
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 2
+    return (0.3 * voiced * envelope / np.abs(voiced).max()).astype(np.float32)
+
+
+def synthesize_music(duration: float) -> np.ndarray:
+    """Chord progression with a beat, as a music bed under the speech"""
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    chords = [(261.6, 329.6, 392.0), (220.0, 261.6, 329.6), (174.6, 220.0, 261.6), (196.0, 246.9, 293.7)]
+    chord_index = (t // 2).astype(int) % len(chords)
+    music = np.zeros_like(t)
+    for voice in range(3):
+        frequencies = np.array([chord[voice] for chord in chords])[chord_index]
+        music += np.sin(2 * np.pi * np.cumsum(frequencies) / SAMPLE_RATE)
+    beat = np.exp(-(t % 0.5) * 20)
+    return (0.05 * music * (0.5 + beat)).astype(np.float32)
+
+
+def make_clip(speech: np.ndarray,
+              duration: float,
+              silence_ratio: float,
+              music: bool) -> BenchmarkClip:
+    """Lay the speech out in blocks that are followed by silence, so `silence_ratio` of the clip has no speech"""
+    num_samples = int(duration * SAMPLE_RATE)
+    audio = np.zeros(num_samples, dtype=np.float32)
+    block_samples = int(len(speech) / max(1 - silence_ratio, 1e-3))
+    for start in range(0, num_samples, block_samples):
+        end = min(start + len(speech), num_samples)
+        audio[start:end] = speech[:end - start]
+    if music:
+        audio += synthesize_music(duration)
+
+    name = f"{duration:g}s-silence{silence_ratio:g}{'-music' if music else ''}"
+    return BenchmarkClip(name=name, audio=audio, duration=duration, silence_ratio=silence_ratio, music=music)
+
+
+def build_corpus(durations: List[float],
+                 silence_ratios: List[float],
+                 speech_path: Optional[str] = DEFAULT_SPEECH_PATH,
+                 seed: int = 0) -> List[BenchmarkClip]:
+    """
+    Build the fixed corpus of the benchmark. The speech is taken from `speech_path` if it exists, otherwise it's
+    synthesized. Every clip is generated with and without the music bed.
+    """
+    if speech_path and os.path.exists(speech_path):
+        from faster_whisper.audio import decode_audio
+        speech = decode_audio(speech_path, sampling_rate=SAMPLE_RATE)
+    else:
+        speech = synthesize_speech(10, np.random.default_rng(seed))
+
+    return [make_clip(speech, duration, silence_ratio, music)
+            for duration, silence_ratio, music in itertools.product(durations, silence_ratios, [False, True])]
+
+
+def run_case(pipeline,
+             clip: BenchmarkClip,
+             params: TranscriptionPipelineParams,
+             repeats: int) -> Dict[str, Any]:
+    """Run the pipeline on the clip `repeats` times and report the median of the measurements"""
+    runs = []
+    for _ in range(repeats):
+        profiler = PipelineProfiler()
+        with profiler.stage("total"):
+            segments, elapsed_time = pipeline.run(
+                clip.audio, lambda *args, **kwargs: None, "SRT", False, None,
+                profiler=profiler,
+                params=params
+            )
+        stages = {profile.stage: profile for profile in profiler.stages}
+        total = stages["total"]
+        num_segments = len([segment for segment in segments if segment.text])
+        runs.append({
+            "wall_time": total.wall_time,
+            "rtf": total.wall_time / clip.duration,
+            "peak_rss": total.peak_memory,
+            "segments": num_segments,
+            "segments_per_second": num_segments / total.wall_time,
+            "stages": [profile.model_dump() for name, profile in stages.items() if name != "total"],
+        })
+
+    result = {key: statistics.median(run[key] for run in runs)
+              for key in ["wall_time", "rtf", "segments_per_second"]}
+    peak_rss = [run["peak_rss"] for run in runs if run["peak_rss"] is not None]
+    result["peak_rss"] = max(peak_rss) if peak_rss else None
+    result["segments"] = runs[-1]["segments"]
+    result["stages"] = runs[-1]["stages"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the real-time factor of the Whisper implementations.")
+    parser.add_argument("--whisper_types", type=str, nargs="+",
+                        default=[impl.value for impl in WhisperImpl],
+                        choices=[impl.value for impl in WhisperImpl],
+                        help="Whisper implementations to benchmark.")
+    parser.add_argument("--model_size", type=str, default="tiny", help="Whisper model size.")
+    parser.add_argument("--compute_types", type=str, nargs="+", default=["float32"],
+                        help="Compute types to benchmark. Only faster-whisper uses them, the others run once.")
+    parser.add_argument("--device", type=str, default="cpu",
+                        help="Device for the BGM separation and the diarization models.")
+    parser.add_argument("--durations", type=float, nargs="+", default=[10, 60],
+                        help="Durations of the clips in seconds.")
+    parser.add_argument("--silence_ratios", type=float, nargs="+", default=[0.2, 0.6],
+                        help="Ratios of the silence in the clips.")
+    parser.add_argument("--vad", type=str2bool, nargs="+", default=[False, True], help="VAD on/off to benchmark.")
+    parser.add_argument("--bgm", type=str2bool, nargs="+", default=[False, True],
+                        help="BGM separation on/off to benchmark.")
+    parser.add_argument("--diarization", type=str2bool, nargs="+", default=[False, True],
+                        help="Diarization on/off to benchmark. It requires the diarization model or HF_TOKEN.")
+    parser.add_argument("--repeats", type=int, default=1, help="Number of runs of each case, the median is reported.")
+    parser.add_argument("--speech_path", type=str, default=DEFAULT_SPEECH_PATH,
+                        help="Speech recording to build the corpus with. Speech is synthesized if it doesn't exist.")
+    parser.add_argument("--output", type=str, default=None, help="Path of the JSON report.")
+    args = parser.parse_args()
+
+    from modules.whisper.whisper_factory import WhisperFactory
+
+    corpus = build_corpus(args.durations, args.silence_ratios, speech_path=args.speech_path)
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "environment": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {**vars(args),
+                   "speech": args.speech_path if os.path.exists(args.speech_path or "") else "synthesized"},
+        "results": [],
+    }
+
+    for whisper_type in args.whisper_types:
+        pipeline = WhisperFactory.create_whisper_inference(
+            whisper_type=whisper_type,
+            output_dir=os.path.join(BENCHMARK_OUTPUT_DIR, "outputs")
+        )
+        compute_types = args.compute_types if whisper_type == WhisperImpl.FASTER_WHISPER.value else [None]
+        for compute_type in compute_types:
+            whisper_params = WhisperParams(model_size=args.model_size,
+                                           compute_type=compute_type or pipeline.current_compute_type)
+            # Warm up to load the model, so the first case doesn't include the loading time
+            pipeline.run(corpus[0].audio, lambda *a, **k: None, "SRT", False, None,
+                         params=TranscriptionPipelineParams(whisper=whisper_params))
+
+            for clip, vad, bgm, diarization in itertools.product(corpus, args.vad, args.bgm, args.diarization):
+                params = TranscriptionPipelineParams(
+                    whisper=whisper_params,
+                    vad=VadParams(vad_filter=vad),
+                    bgm_separation=BGMSeparationParams(is_separate_bgm=bgm, uvr_device=args.device,
+                                                       enable_offload=False),
+                    diarization=DiarizationParams(is_diarize=diarization, diarization_device=args.device,
+                                                  enable_offload=False),
+                )
+                case = {
+                    "whisper_type": whisper_type,
+                    "model_size": args.model_size,
+                    "compute_type": whisper_params.compute_type,
+                    "clip": clip.name,
+                    "duration": clip.duration,
+                    "silence_ratio": clip.silence_ratio,
+                    "music": clip.music,
+                    "vad": vad,
+                    "bgm": bgm,
+                    "diarization": diarization,
+                }
+                print(f"[INFO] Benchmarking {case}")
+                try:
+                    case.update(run_case(pipeline, clip, params, args.repeats))
+                except Exception as e:
+                    case["error"] = f"{type(e).__name__}: {e}"
+                    print(f"[WARN] Failed: {case['error']}")
+                report["results"].append(case)
+
+        pipeline.offload()
+        pipeline.music_separator.offload()
+        pipeline.diarizer.offload()
+
+    output_path = args.output or os.path.join(
+        BENCHMARK_OUTPUT_DIR, f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"[INFO] Benchmark report is written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,9 @@ from modules.utils.paths import (
     KNOWLEDGE_BASE_DIR,
     NLLB_MODELS_DIR,
     OUTPUT_DIR,
+    PCM_CACHE_DIR,
     RAG_STORE_DIR,
+    STAGE_CACHE_DIR,
     UVR_MODELS_DIR,
     WHISPER_MODELS_DIR,
 )
@@ -61,6 +63,16 @@ class AppConfig:
     rag_store_dir: str
     rag_embedding_model: str
     max_background_workers: int
+    stage_cache_dir: str
+    stage_cache_size_gb: float
+    pcm_cache_dir: str
+    pcm_cache_size_gb: float
+    model_memory_budget_gb: float
+    model_idle_timeout: float
+    enable_pipeline_planner: bool
+    planner_max_shards: int
+    low_memory: bool
+    low_memory_memmap_threshold_mb: float
 
 
 def build_arg_parser() -> argparse.ArgumentParser:
@@ -156,6 +168,74 @@ def build_arg_parser() -> argparse.ArgumentParser:
         default=_default_max_workers(),
         help="Number of worker threads to use for background jobs",
     )
+    parser.add_argument(
+        "--stage_cache_dir",
+        type=str,
+        default=STAGE_CACHE_DIR,
+        help="Directory path of the cache for the intermediate results of the transcription pipeline",
+    )
+    parser.add_argument(
+        "--stage_cache_size_gb",
+        type=float,
+        default=0,
+        help="Maximum size of the stage cache in GB. The stage cache is disabled with 0, set a size like 5 to "
+             "enable it",
+    )
+    parser.add_argument(
+        "--pcm_cache_dir",
+        type=str,
+        default=PCM_CACHE_DIR,
+        help="Directory path of the cache for the decoded audio",
+    )
+    parser.add_argument(
+        "--pcm_cache_size_gb",
+        type=float,
+        default=0,
+        help="Maximum size of the decoded audio cache in GB, which skips decoding the same media again. "
+             "The cache is disabled with 0, set a size like 2 to enable it",
+    )
+    parser.add_argument(
+        "--model_memory_budget_gb",
+        type=float,
+        default=0,
+        help="Memory budget in GB for the resident models. The least recently used models are offloaded when it's "
+             "exceeded, instead of offloading every model after its use. Set to 0 to disable it",
+    )
+    parser.add_argument(
+        "--model_idle_timeout",
+        type=float,
+        default=0,
+        help="Seconds after the last use of a model to offload it. Set to 0 to disable it",
+    )
+    parser.add_argument(
+        "--enable_pipeline_planner",
+        type=str2bool,
+        default=False,
+        nargs="?",
+        const=True,
+        help="Whether to analyze the audio before the transcription to skip the stages it doesn't need, such as the "
+             "transcription of a silent audio or the BGM separation of an audio without music",
+    )
+    parser.add_argument(
+        "--planner_max_shards",
+        type=int,
+        default=1,
+        help="Maximum number of the shards that the pipeline planner splits a long audio into to transcribe in parallel",
+    )
+    parser.add_argument(
+        "--low_memory",
+        type=str2bool,
+        default=False,
+        nargs="?",
+        const=True,
+        help="Whether to keep the audio as int16 PCM and convert it to float32 only per window, for long archives",
+    )
+    parser.add_argument(
+        "--low_memory_memmap_threshold_mb",
+        type=float,
+        default=512,
+        help="Size of the decoded audio in MB above which it's written to a disk-backed memmap in the low-memory mode",
+    )
     return parser
 
 
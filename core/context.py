@@ -10,6 +10,10 @@ from modules.rag.temp_chat import TemporaryRAGChatService
 from modules.rag.text_corrector import TextCorrectionRAG
 from modules.translation.deepl_api import DeepLAPI
 from modules.translation.nllb_inference import NLLBInference
+from modules.utils.disk_cache import DiskLRUCache, NumpyDiskLRUCache
+from modules.utils.model_registry import get_model_registry
+from modules.whisper.pipeline_planner import PipelinePlanner
+from modules.utils.audio_manager import LowMemoryOptions, register_pcm_cache
 from modules.whisper.whisper_factory import WhisperFactory
 
 
@@ -37,6 +41,22 @@ class AppContext:
                 uvr_model_dir=cfg.uvr_model_dir,
                 output_dir=cfg.output_dir,
             )
+            if cfg.stage_cache_size_gb > 0:
+                self._whisper.register_stage_cache(DiskLRUCache(
+                    cache_dir=cfg.stage_cache_dir,
+                    max_bytes=int(cfg.stage_cache_size_gb * 1024 ** 3),
+                ))
+            if cfg.pcm_cache_size_gb > 0:
+                register_pcm_cache(NumpyDiskLRUCache(
+                    cache_dir=cfg.pcm_cache_dir,
+                    max_bytes=int(cfg.pcm_cache_size_gb * 1024 ** 3),
+                ))
+            if cfg.enable_pipeline_planner:
+                self._whisper.register_planner(PipelinePlanner(max_shards=cfg.planner_max_shards))
+            if cfg.low_memory:
+                self._whisper.register_low_memory(LowMemoryOptions(
+                    memmap_threshold_mb=cfg.low_memory_memmap_threshold_mb,
+                ))
         return self._whisper
 
     @property
@@ -91,6 +111,10 @@ class AppContext:
 
 
 def create_app_context(config: AppConfig, logger) -> AppContext:
+    get_model_registry().configure(
+        memory_budget_bytes=int(config.model_memory_budget_gb * 1024 ** 3),
+        idle_timeout=config.model_idle_timeout,
+    )
     return AppContext(config=config, logger=logger)
 
 
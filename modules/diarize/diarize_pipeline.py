@@ -4,13 +4,15 @@
 import numpy as np
 import pandas as pd
 import os
+import warnings
 from pyannote.audio import Pipeline
 from typing import Optional, Union
 import torch
 
 from modules.whisper.data_classes import *
 from modules.utils.paths import DIARIZATION_MODELS_DIR
-from modules.diarize.audio_loader import load_audio, SAMPLE_RATE
+from modules.diarize.audio_loader import SAMPLE_RATE
+from modules.utils.audio_manager import decode_pcm
 
 
 class DiarizationPipeline:
@@ -31,9 +33,13 @@ class DiarizationPipeline:
 
     def __call__(self, audio: Union[str, np.ndarray], min_speakers=None, max_speakers=None):
         if isinstance(audio, str):
-            audio = load_audio(audio)
+            audio = decode_pcm(audio, SAMPLE_RATE)
+        with warnings.catch_warnings():
+            # The waveform is only read, so the read-only audio of the pipeline is shared instead of being copied
+            warnings.filterwarnings("ignore", message="The given NumPy array is not writable")
+            waveform = torch.from_numpy(audio[None, :])
         audio_data = {
-            'waveform': torch.from_numpy(audio[None, :]),
+            'waveform': waveform,
             'sample_rate': SAMPLE_RATE
         }
         segments = self.model(audio_data, min_speakers=min_speakers, max_speakers=max_speakers)
@@ -2,13 +2,16 @@ import os
 import torch
 from typing import List, Union, BinaryIO, Optional, Tuple
 import numpy as np
+import pandas as pd
 import time
 import logging
 import gc
 
 from modules.utils.paths import DIARIZATION_MODELS_DIR
 from modules.diarize.diarize_pipeline import DiarizationPipeline, assign_word_speakers
-from modules.diarize.audio_loader import load_audio
+from modules.diarize.audio_loader import load_audio, SAMPLE_RATE
+from modules.utils.audio_manager import DecodedAudio, decode_pcm
+from modules.utils.model_registry import ModelRegistry, get_model_registry
 from modules.whisper.data_classes import *
 
 
@@ -22,9 +25,10 @@ class Diarizer:
         self.model_dir = model_dir
         os.makedirs(self.model_dir, exist_ok=True)
         self.pipe = None
+        self.registry_key = ModelRegistry.make_key(self, "diarization")
 
     def run(self,
-            audio: Union[str, BinaryIO, np.ndarray],
+            audio: Union[str, BinaryIO, np.ndarray, DecodedAudio],
             transcribed_result: List[Segment],
             use_auth_token: str,
             device: Optional[str] = None
@@ -34,8 +38,8 @@ class Diarizer:
 
         Parameters
         ----------
-        audio: Union[str, BinaryIO, np.ndarray]
-            Audio input. This can be file path or binary type.
+        audio: Union[str, BinaryIO, np.ndarray, DecodedAudio]
+            Audio input. This can be file path or binary type or the decoded audio.
         transcribed_result: List[Segment]
             transcribed result through whisper.
         use_auth_token: str
@@ -53,20 +57,57 @@ class Diarizer:
         """
         start_time = time.time()
 
+        diarization_segments = self.diarize(
+            audio=audio,
+            use_auth_token=use_auth_token,
+            device=device
+        )
+        segments_result = self.assign_speakers(
+            diarization_segments=diarization_segments,
+            transcribed_result=transcribed_result
+        )
+
+        elapsed_time = time.time() - start_time
+        return segments_result, elapsed_time
+
+    def diarize(self,
+                audio: Union[str, BinaryIO, np.ndarray, DecodedAudio],
+                use_auth_token: str,
+                device: Optional[str] = None
+                ) -> pd.DataFrame:
+        """
+        Get the speaker frames of the audio, independent of the transcribed result.
+
+        Returns
+        ----------
+        diarization_segments: pd.DataFrame
+            Frames with the "start", "end" and "speaker" columns
+        """
         if device is None:
             device = self.device
 
-        if device != self.device or self.pipe is None:
-            self.update_pipe(
-                device=device,
-                use_auth_token=use_auth_token
-            )
+        if isinstance(audio, DecodedAudio) and audio.sample_rate == SAMPLE_RATE:
+            audio = audio.to_float32()
+        elif isinstance(audio, (str, DecodedAudio)):
+            audio = decode_pcm(audio.source if isinstance(audio, DecodedAudio) else audio, SAMPLE_RATE)
+        else:
+            audio = load_audio(audio)
 
-        audio = load_audio(audio)
+        with get_model_registry().use(self.registry_key):
+            if device != self.device or self.pipe is None:
+                self.update_pipe(
+                    device=device,
+                    use_auth_token=use_auth_token
+                )
+            return self.pipe(audio)
 
-        diarization_segments = self.pipe(audio)
+    @staticmethod
+    def assign_speakers(diarization_segments: pd.DataFrame,
+                        transcribed_result: List[Segment]
+                        ) -> List[Segment]:
+        """Assign the speakers of the diarization frames to the transcribed result"""
         diarized_result = assign_word_speakers(
-            diarization_segments,
+            diarization_segments.copy(),
             {"segments": transcribed_result}
         )
 
@@ -81,9 +122,7 @@ class Diarizer:
                 end=segment["end"],
                 text=diarized_text
             ))
-
-        elapsed_time = time.time() - start_time
-        return segments_result, elapsed_time
+        return segments_result
 
     def update_pipe(self,
                     use_auth_token: Optional[str] = None,
@@ -117,15 +156,17 @@ class Diarizer:
         logger = logging.getLogger("speechbrain.utils.train_logger")
         # Disable redundant torchvision warning message
         logger.disabled = True
-        self.pipe = DiarizationPipeline(
-            use_auth_token=use_auth_token,
-            device=device,
-            cache_dir=self.model_dir
-        )
+        with get_model_registry().loading(self.registry_key, self.offload):
+            self.pipe = DiarizationPipeline(
+                use_auth_token=use_auth_token,
+                device=device,
+                cache_dir=self.model_dir
+            )
         logger.disabled = False
 
     def offload(self):
         """Offload the model and free up the memory"""
+        get_model_registry().unregister(self.registry_key)
         if self.pipe is not None:
             del self.pipe
             self.pipe = None
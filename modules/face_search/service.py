@@ -12,6 +12,7 @@ import cv2
 from PIL import Image
 
 from modules.utils.logger import get_logger
+from modules.utils.model_registry import ModelRegistry, get_model_registry
 
 logger = get_logger()
 
@@ -57,6 +58,7 @@ class FaceSearchService:
 
         # Lazy-loaded components
         self._insight_app = None
+        self._insight_registry_key = ModelRegistry.make_key(self, "insightface")
         self._chroma_client = None
         self._collection = None
         self.collection_name = "faces"
@@ -81,8 +83,10 @@ class FaceSearchService:
 
     # ---------- Lazy initializers ----------
     def _ensure_insightface(self):
-        if self._insight_app is not None:
-            return
+        insight_app = self._insight_app
+        if insight_app is not None:
+            get_model_registry().touch(self._insight_registry_key)
+            return insight_app
         from insightface.app import FaceAnalysis
         # Prefer GPU if available, fallback to CPU
         try:
@@ -94,12 +98,19 @@ class FaceSearchService:
                 providers = ['CPUExecutionProvider']
         except Exception:
             providers = ['CPUExecutionProvider']
-        self._insight_app = FaceAnalysis(name="buffalo_l", providers=providers)
-        self._insight_app.prepare(ctx_id=0, det_size=self.det_size)
+        with get_model_registry().loading(self._insight_registry_key, self._offload_insightface):
+            insight_app = FaceAnalysis(name="buffalo_l", providers=providers)
+            insight_app.prepare(ctx_id=0, det_size=self.det_size)
+        self._insight_app = insight_app
         if 'CUDAExecutionProvider' in providers:
             logger.info("InsightFace initialized with GPU (CUDA) support.")
         else:
             logger.info("InsightFace initialized with CPU only.")
+        return insight_app
+
+    def _offload_insightface(self):
+        get_model_registry().unregister(self._insight_registry_key)
+        self._insight_app = None
 
     def _ensure_chromadb(self):
         if self._chroma_client is not None and self._collection is not None:
@@ -292,7 +303,6 @@ class FaceSearchService:
         Returns:
             人脸特征向量列表，每个向量是一个归一化的 numpy 数组
         """
-        self._ensure_insightface()
         img = self._read_image(image_path)
         if img is None:
             return []
@@ -305,11 +315,13 @@ class FaceSearchService:
             img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
             logger.debug(f"图像已缩放: {w}x{h} -> {new_w}x{new_h}")
         
-        try:
-            faces = self._insight_app.get(img)
-        except Exception as e:
-            logger.error(f"人脸检测失败 {image_path}: {e}")
-            return []
+        with get_model_registry().use(self._insight_registry_key):
+            insight_app = self._ensure_insightface()
+            try:
+                faces = insight_app.get(img)
+            except Exception as e:
+                logger.error(f"人脸检测失败 {image_path}: {e}")
+                return []
         
         # 限制每张图片的人脸数量以减少索引成本
         selected = faces[: self.max_faces_per_image] if (self.max_faces_per_image and self.max_faces_per_image > 0) else faces
@@ -342,7 +354,6 @@ class FaceSearchService:
             (可视化图像路径, 检测到的人脸数量, 人脸信息列表)
             人脸信息包含: bbox (边界框), confidence (置信度), age (年龄，如果有), gender (性别，如果有)
         """
-        self._ensure_insightface()
         img = self._read_image(image_path)
         if img is None:
             return None, 0, []
@@ -363,11 +374,13 @@ class FaceSearchService:
         else:
             img_resized = img.copy()
         
-        try:
-            faces = self._insight_app.get(img_resized)
-        except Exception as e:
-            logger.error(f"人脸检测失败 {image_path}: {e}")
-            return None, 0, []
+        with get_model_registry().use(self._insight_registry_key):
+            insight_app = self._ensure_insightface()
+            try:
+                faces = insight_app.get(img_resized)
+            except Exception as e:
+                logger.error(f"人脸检测失败 {image_path}: {e}")
+                return None, 0, []
         
         # 不限制数量，显示所有检测到的人脸
         # 创建可视化图像（使用原始尺寸）
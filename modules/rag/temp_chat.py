@@ -17,6 +17,8 @@ try:
 except ImportError:
     from requests.packages.urllib3.util.retry import Retry  # type: ignore
 
+from modules.utils.model_registry import ModelRegistry, get_model_registry
+
 
 class TemporaryRAGChatService:
     """In-memory service that turns the latest transcript into a temporary RAG store."""
@@ -31,6 +33,7 @@ class TemporaryRAGChatService:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self._embedder: Optional[SentenceTransformer] = None
+        self._embedder_registry_key = ModelRegistry.make_key(self, "embedder")
         self._sessions: Dict[str, Dict[str, Any]] = {}
 
     # ------------------------------------------------------------------ #
@@ -159,15 +162,25 @@ class TemporaryRAGChatService:
         return [c for c in chunks if c.strip()]
 
     def _get_embedder(self) -> SentenceTransformer:
-        if self._embedder is None:
-            self._embedder = SentenceTransformer(self.embedding_model_name, device="cpu")
-        return self._embedder
+        embedder = self._embedder
+        if embedder is None:
+            with get_model_registry().loading(self._embedder_registry_key, self._offload_embedder):
+                embedder = SentenceTransformer(self.embedding_model_name, device="cpu")
+            self._embedder = embedder
+        else:
+            get_model_registry().touch(self._embedder_registry_key)
+        return embedder
+
+    def _offload_embedder(self):
+        get_model_registry().unregister(self._embedder_registry_key)
+        self._embedder = None
 
     def _embed(self, chunks: List[str]) -> np.ndarray:
         if not chunks:
             return np.zeros((0, 0))
-        embedder = self._get_embedder()
-        vectors = embedder.encode(chunks, batch_size=16, convert_to_numpy=True, show_progress_bar=False)
+        with get_model_registry().use(self._embedder_registry_key):
+            embedder = self._get_embedder()
+            vectors = embedder.encode(chunks, batch_size=16, convert_to_numpy=True, show_progress_bar=False)
         return vectors
 
     def _retrieve_context(
@@ -182,8 +195,9 @@ class TemporaryRAGChatService:
             return []
         embeddings = session["embeddings"]
         chunks = session["chunks"]
-        embedder = self._get_embedder()
-        query_vec = embedder.encode([query], convert_to_numpy=True, show_progress_bar=False)[0]
+        with get_model_registry().use(self._embedder_registry_key):
+            embedder = self._get_embedder()
+            query_vec = embedder.encode([query], convert_to_numpy=True, show_progress_bar=False)[0]
 
         if embeddings.size == 0:
             return []
@@ -11,6 +11,7 @@ from rapidfuzz import fuzz
 from sentence_transformers import SentenceTransformer
 
 from modules.utils.logger import get_logger
+from modules.utils.model_registry import ModelRegistry, get_model_registry
 from modules.whisper.data_classes import Segment
 
 logger = get_logger()
@@ -53,6 +54,7 @@ class TextCorrectionRAG:
         os.makedirs(self.persist_dir, exist_ok=True)
 
         self._embedder: Optional[SentenceTransformer] = None
+        self._embedder_registry_key = ModelRegistry.make_key(self, "embedder")
         self._client: Optional[chromadb.PersistentClient] = None
         self._collection = None
 
@@ -638,13 +640,24 @@ class TextCorrectionRAG:
             metadata={"hnsw:space": "cosine"},
         )
 
-    def _ensure_embedder(self):
-        if self._embedder is None:
-            self._embedder = SentenceTransformer(self.embedding_model_name, device="cpu")
+    def _ensure_embedder(self) -> SentenceTransformer:
+        embedder = self._embedder
+        if embedder is None:
+            with get_model_registry().loading(self._embedder_registry_key, self._offload_embedder):
+                embedder = SentenceTransformer(self.embedding_model_name, device="cpu")
+            self._embedder = embedder
+        else:
+            get_model_registry().touch(self._embedder_registry_key)
+        return embedder
+
+    def _offload_embedder(self):
+        get_model_registry().unregister(self._embedder_registry_key)
+        self._embedder = None
 
     def _embed(self, documents: List[str]) -> List[List[float]]:
-        self._ensure_embedder()
-        embeddings = self._embedder.encode(documents, batch_size=32, convert_to_numpy=True, show_progress_bar=False)
+        with get_model_registry().use(self._embedder_registry_key):
+            embedder = self._ensure_embedder()
+            embeddings = embedder.encode(documents, batch_size=32, convert_to_numpy=True, show_progress_bar=False)
         return embeddings.tolist()
 
     def _read_text_file(self, file_path: str) -> Optional[str]:
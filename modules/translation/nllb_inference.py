@@ -4,6 +4,7 @@ import os
 
 from modules.utils.paths import TRANSLATION_OUTPUT_DIR, NLLB_MODELS_DIR
 from modules.translation.translation_base import TranslationBase
+from modules.utils.model_registry import get_model_registry
 
 
 class NLLBInference(TranslationBase):
@@ -52,12 +53,13 @@ class NLLBInference(TranslationBase):
             progress(0, desc="Initializing NLLB Model..")
             self.current_model_size = model_size
             local_files_only = self.is_model_exists(self.current_model_size)
-            self.model = AutoModelForSeq2SeqLM.from_pretrained(pretrained_model_name_or_path=model_size,
-                                                               cache_dir=self.model_dir,
+            with get_model_registry().loading(self.registry_key, self.offload):
+                self.model = AutoModelForSeq2SeqLM.from_pretrained(pretrained_model_name_or_path=model_size,
+                                                                   cache_dir=self.model_dir,
+                                                                   local_files_only=local_files_only)
+                self.tokenizer = AutoTokenizer.from_pretrained(pretrained_model_name_or_path=model_size,
+                                                               cache_dir=os.path.join(self.model_dir, "tokenizers"),
                                                                local_files_only=local_files_only)
-            self.tokenizer = AutoTokenizer.from_pretrained(pretrained_model_name_or_path=model_size,
-                                                           cache_dir=os.path.join(self.model_dir, "tokenizers"),
-                                                           local_files_only=local_files_only)
 
         self.pipeline = pipeline("translation",
                                  model=self.model,
@@ -66,6 +68,11 @@ class NLLBInference(TranslationBase):
                                  tgt_lang=tgt_lang,
                                  device=self.device)
 
+    def offload(self):
+        """Offload the model and the translation pipeline that holds it"""
+        self.pipeline = None
+        super().offload()
+
     def is_model_exists(self,
                         model_size: str):
         """Check if model exists or not (Only facebook model)"""
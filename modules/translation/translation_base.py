@@ -11,6 +11,7 @@ from modules.whisper.data_classes import *
 from modules.utils.subtitle_manager import *
 from modules.utils.files_manager import load_yaml, save_yaml
 from modules.utils.paths import DEFAULT_PARAMETERS_CONFIG_PATH, NLLB_MODELS_DIR, TRANSLATION_OUTPUT_DIR
+from modules.utils.model_registry import ModelRegistry, get_model_registry
 
 
 class TranslationBase(ABC):
@@ -20,6 +21,7 @@ class TranslationBase(ABC):
                  ):
         super().__init__()
         self.model = None
+        self.registry_key = ModelRegistry.make_key(self, "translation")
         self.model_dir = model_dir
         self.output_dir = output_dir
         os.makedirs(self.model_dir, exist_ok=True)
@@ -88,30 +90,31 @@ class TranslationBase(ABC):
                                   max_length=max_length,
                                   add_timestamp=add_timestamp)
 
-            self.update_model(model_size=model_size,
-                              src_lang=src_lang,
-                              tgt_lang=tgt_lang,
-                              progress=progress)
-
-            files_info = {}
-            for fileobj in fileobjs:
-                file_name, file_ext = os.path.splitext(os.path.basename(fileobj))
-                writer = get_writer(file_ext, self.output_dir)
-                segments = writer.to_segments(fileobj)
-                for i, segment in enumerate(segments):
-                    progress(i / len(segments), desc="Translating..")
-                    translated_text = self.translate(segment.text, max_length=max_length)
-                    segment.text = translated_text
-
-                subtitle, file_path = generate_file(
-                    output_dir=self.output_dir,
-                    output_file_name=file_name,
-                    output_format=file_ext,
-                    result=segments,
-                    add_timestamp=add_timestamp
-                )
-
-                files_info[file_name] = {"subtitle": subtitle, "path": file_path}
+            with get_model_registry().use(self.registry_key):
+                self.update_model(model_size=model_size,
+                                  src_lang=src_lang,
+                                  tgt_lang=tgt_lang,
+                                  progress=progress)
+
+                files_info = {}
+                for fileobj in fileobjs:
+                    file_name, file_ext = os.path.splitext(os.path.basename(fileobj))
+                    writer = get_writer(file_ext, self.output_dir)
+                    segments = writer.to_segments(fileobj)
+                    for i, segment in enumerate(segments):
+                        progress(i / len(segments), desc="Translating..")
+                        translated_text = self.translate(segment.text, max_length=max_length)
+                        segment.text = translated_text
+
+                    subtitle, file_path = generate_file(
+                        output_dir=self.output_dir,
+                        output_file_name=file_name,
+                        output_format=file_ext,
+                        result=segments,
+                        add_timestamp=add_timestamp
+                    )
+
+                    files_info[file_name] = {"subtitle": subtitle, "path": file_path}
 
             total_result = ''
             for file_name, info in files_info.items():
@@ -127,7 +130,8 @@ class TranslationBase(ABC):
             print(f"Error translating file: {e}")
             raise
         finally:
-            self.offload()
+            if get_model_registry().should_offload(True):
+                self.offload()
 
     @staticmethod
     def get_device():
@@ -142,6 +146,7 @@ class TranslationBase(ABC):
 
     def offload(self):
         """Offload the model and free up the memory"""
+        get_model_registry().unregister(self.registry_key)
         if self.model is not None:
             del self.model
             self.model = None
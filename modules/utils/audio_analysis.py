@@ -0,0 +1,95 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class AudioAnalysis:
+    """Cheap estimates of the content of the audio, used to plan the pipeline before running the models"""
+    duration: float
+    # Ratio of the frames with the signal above the noise floor. It doesn't tell speech from other sounds.
+    speech_ratio: float
+    # Ratio of the active frames whose spectrum barely changes from the previous frame, as in sustained music notes
+    music_ratio: float
+    peak_db: float
+
+    @property
+    def silence_ratio(self) -> float:
+        return 1 - self.speech_ratio
+
+
+def analyze_audio(audio: np.ndarray,
+                  sample_rate: int = 16000,
+                  decimation: int = 4,
+                  frame_size: int = 512,
+                  active_db: float = -50,
+                  floor_margin_db: float = 10,
+                  min_db: float = -70,
+                  stationary_similarity: float = 0.8,
+                  block_frames: int = 4096) -> AudioAnalysis:
+    """
+    Analyze the audio with the frame energies and spectra of the decimated audio, without any model.
+    This takes a fraction of a second even for hours of audio.
+
+    Parameters
+    ----------
+    audio: np.ndarray
+        Mono audio
+    sample_rate: int
+        Sample rate of the audio
+    decimation: int
+        Factor to decimate the audio by before the analysis, by averaging the consecutive samples
+    frame_size: int
+        Number of the decimated samples in a frame. The frames don't overlap.
+    active_db: float
+        Frame energy in dBFS above which a frame is active regardless of the noise floor
+    floor_margin_db: float
+        A frame is also active if its energy is this much above the noise floor, the 10th percentile of the energies
+    min_db: float
+        Frame energy in dBFS below which a frame is never active, so faint clicks in digital silence are ignored
+    stationary_similarity: float
+        Cosine similarity of the magnitude spectra of the consecutive active frames above which they're stationary
+    block_frames: int
+        Number of the frames to compute the spectra of at once, which bounds the memory of the analysis
+
+    Returns
+    ----------
+    Analysis of the audio
+    """
+    duration = len(audio) / sample_rate
+    # Averaging with the float32 accumulator converts int16 PCM without a float32 copy of the whole audio
+    decimated = audio[:len(audio) // decimation * decimation].reshape(-1, decimation).mean(axis=1, dtype=np.float32)
+    if audio.dtype == np.int16:
+        decimated *= 1 / 32768
+    num_frames = len(decimated) // frame_size
+    if num_frames < 2:
+        return AudioAnalysis(duration=duration, speech_ratio=0.0, music_ratio=0.0, peak_db=-100.0)
+
+    frames = decimated[:num_frames * frame_size].reshape(num_frames, frame_size)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    noise_floor = np.percentile(energy_db, 10)
+    active = (energy_db > active_db) | ((energy_db > noise_floor + floor_margin_db) & (energy_db > min_db))
+
+    window = np.hanning(frame_size).astype(np.float32)
+    similarities = np.empty(num_frames - 1, dtype=np.float32)
+    previous = None
+    for start in range(0, num_frames, block_frames):
+        magnitude = np.abs(np.fft.rfft(frames[start:start + block_frames] * window, axis=1))
+        magnitude /= np.linalg.norm(magnitude, axis=1, keepdims=True) + 1e-9
+        # Carry the last frame of the previous block to compare with the first frame of this block
+        first = start
+        if previous is not None:
+            magnitude = np.concatenate([previous, magnitude])
+            first -= 1
+        similarities[first: first + len(magnitude) - 1] = np.sum(magnitude[1:] * magnitude[:-1], axis=1)
+        previous = magnitude[-1:]
+
+    both_active = active[1:] & active[:-1]
+    music_ratio = float(np.mean(similarities[both_active] > stationary_similarity)) if both_active.any() else 0.0
+
+    return AudioAnalysis(
+        duration=duration,
+        speech_ratio=float(np.mean(active)),
+        music_ratio=music_ratio,
+        peak_db=float(energy_db.max())
+    )
@@ -1,27 +1,304 @@
-from typing import Optional, Union
+from typing import Optional, Union, BinaryIO
+from dataclasses import dataclass, field
+import hashlib
+import io
+import itertools
 import soundfile as sf
 import os
+import tempfile
+import weakref
+import av
 import numpy as np
 from faster_whisper.audio import decode_audio
 
 from modules.utils.files_manager import is_video
+from modules.utils.disk_cache import DiskLRUCache
 from modules.utils.logger import get_logger
 
 logger = get_logger()
 
+_pcm_cache: Optional[DiskLRUCache] = None
 
-def validate_audio(audio: Optional[str] = None):
-    """Validate audio file and check if it's corrupted"""
-    if isinstance(audio, np.ndarray):
+# Number of the samples that are converted at once, so the conversions never hold a float32 copy of the whole audio
+CONVERSION_BLOCK_SAMPLES = 1 << 20
+
+
+@dataclass
+class LowMemoryOptions:
+    """
+    Options of the low-memory mode, where the audio is kept as int16 PCM and converted to float32 only per window.
+
+    Attributes
+    ----------
+    memmap_threshold_mb: float
+        The decoded PCM larger than this is written to a disk-backed memmap instead of the memory
+    memmap_dir: str
+        Directory of the memmap files
+    window_s: float
+        Maximum duration of the audio that is converted to float32 and transcribed at once
+    """
+    memmap_threshold_mb: float = 512
+    memmap_dir: str = field(default_factory=tempfile.gettempdir)
+    window_s: float = 1800
+
+
+@dataclass
+class DecodedAudio:
+    """
+    Audio that is decoded only once per request and shared by all the stages of the pipeline.
+    The pcm is read-only, so the stages can share it and its views without copying.
+    A stage that needs to modify the waveform has to work on its own copy of the pcm.
+
+    Attributes
+    ----------
+    pcm: np.ndarray
+        Mono float32 waveform, or int16 PCM that may be a disk-backed memmap in the low-memory mode.
+        Use `to_float32()` or `window()` to get the float32 waveform regardless of it.
+    sample_rate: int
+        Sample rate of the `pcm`
+    source: Optional[str]
+        File path that the audio is decoded from, None if it's not decoded from a file path.
+    """
+    pcm: np.ndarray
+    sample_rate: int = 16000
+    source: Optional[str] = None
+    _source_hash: Optional[str] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if self.pcm.flags.writeable:
+            # Use a view so the array given by the caller stays writable
+            self.pcm = self.pcm.view()
+            self.pcm.flags.writeable = False
+
+    @property
+    def duration(self) -> float:
+        return self.pcm.shape[0] / self.sample_rate
+
+    @property
+    def is_low_memory(self) -> bool:
+        return self.pcm.dtype == np.int16
+
+    def window(self, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+        """Float32 waveform of the samples from `start` to `end`"""
+        return to_float32(self.pcm[start:end])
+
+    def to_float32(self) -> np.ndarray:
+        """Float32 waveform of the whole audio, the pcm itself if it's already float32"""
+        return to_float32(self.pcm)
+
+    @property
+    def source_hash(self) -> str:
+        """Content hash of the source file, or of the pcm if it's not decoded from a file path"""
+        if self._source_hash is None:
+            self._source_hash = get_audio_hash(self.source if self.source is not None else self.pcm)
+        return self._source_hash
+
+    @classmethod
+    def from_source(cls,
+                    audio: Union[str, BinaryIO, np.ndarray, "DecodedAudio"],
+                    sample_rate: int = 16000,
+                    low_memory: Optional[LowMemoryOptions] = None) -> "DecodedAudio":
+        """
+        Decode the audio input to the mono waveform of the `sample_rate`. Numpy arrays are used as is.
+        With `low_memory`, the audio is decoded to int16 PCM and float32 arrays are converted to it.
+        """
+        if isinstance(audio, DecodedAudio):
+            if low_memory is None or audio.is_low_memory:
+                return audio
+            return cls(pcm=to_int16(audio.pcm), sample_rate=audio.sample_rate, source=audio.source,
+                       _source_hash=audio._source_hash)
+        if isinstance(audio, np.ndarray):
+            return cls(pcm=to_int16(audio) if low_memory is not None else audio, sample_rate=sample_rate)
+
+        source = audio if isinstance(audio, str) else None
+        # The hash of a file path is computed lazily unless the PCM cache needs it as the key
+        source_hash = get_audio_hash(audio) if source is None or _pcm_cache is not None else None
+        return cls(pcm=decode_pcm(audio, sample_rate, low_memory=low_memory, source_hash=source_hash),
+                   sample_rate=sample_rate, source=source, _source_hash=source_hash)
+
+
+def register_pcm_cache(cache: Optional[DiskLRUCache]):
+    """
+    Register the cache of the decoded PCM shared by the whole process, see `decode_pcm()`.
+    Use `NumpyDiskLRUCache` so the cached PCM is read as a memmap without copying it.
+    """
+    global _pcm_cache
+    _pcm_cache = cache
+
+
+def get_pcm_cache() -> Optional[DiskLRUCache]:
+    return _pcm_cache
+
+
+def decode_pcm(audio: Union[str, BinaryIO],
+               sample_rate: int = 16000,
+               *,
+               low_memory: Optional[LowMemoryOptions] = None,
+               source_hash: Optional[str] = None) -> np.ndarray:
+    """
+    Decode the audio to the mono waveform of the `sample_rate`, or to int16 PCM with `low_memory`.
+    If the PCM cache is registered, the decoded PCM is stored by the content hash of the audio and read back as a
+    read-only memmap, so the same content is never decoded again while it's in the cache.
+
+    Parameters
+    ----------
+    audio: Union[str, BinaryIO]
+        Audio file path or binary
+    sample_rate: int
+        Sample rate to resample the audio to
+    low_memory: Optional[LowMemoryOptions]
+        Options of the low-memory mode to decode to int16 PCM with
+    source_hash: Optional[str]
+        Content hash of the audio from `get_audio_hash()`, computed if it's not given
+
+    Returns
+    ----------
+    Decoded PCM. It's read-only if it's from the cache.
+    """
+    cache = _pcm_cache
+    if cache is None:
+        return _decode(audio, sample_rate, low_memory)
+
+    dtype = "int16" if low_memory is not None else "float32"
+    key = cache.make_key("pcm", source_hash or get_audio_hash(audio), sample_rate, dtype)
+    pcm = cache.get(key)
+    if pcm is not None:
+        return pcm
+
+    pcm = _decode(audio, sample_rate, low_memory)
+    cache.put(key, pcm)
+    # Read it back as the memmap, so the decoded copy is released. It's evicted at once if it's larger than the cache.
+    cached = cache.get(key)
+    return cached if cached is not None else pcm
+
+
+def _decode(audio: Union[str, BinaryIO],
+            sample_rate: int,
+            low_memory: Optional[LowMemoryOptions]) -> np.ndarray:
+    if low_memory is not None:
+        return decode_pcm16(audio, sample_rate, low_memory)
+    return decode_audio(audio, sampling_rate=sample_rate)
+
+
+def to_float32(pcm: np.ndarray) -> np.ndarray:
+    """Convert int16 PCM to the float32 waveform. Float32 waveforms are returned as is."""
+    if pcm.dtype == np.float32:
+        return pcm
+    if pcm.dtype != np.int16:
+        return pcm.astype(np.float32)
+    waveform = pcm.astype(np.float32)
+    waveform *= 1 / 32768
+    return waveform
+
+
+def to_int16(pcm: np.ndarray) -> np.ndarray:
+    """Convert the waveform to int16 PCM block by block, without a temporary float copy of the whole audio"""
+    if pcm.dtype == np.int16:
+        return pcm
+    converted = np.empty(pcm.shape, dtype=np.int16)
+    for start in range(0, pcm.shape[0], CONVERSION_BLOCK_SAMPLES):
+        block = pcm[start:start + CONVERSION_BLOCK_SAMPLES] * 32768
+        np.clip(block, -32768, 32767, out=block)
+        converted[start:start + CONVERSION_BLOCK_SAMPLES] = block
+    return converted
+
+
+def decode_pcm16(audio: Union[str, BinaryIO],
+                 sampling_rate: int = 16000,
+                 low_memory: Optional[LowMemoryOptions] = None) -> np.ndarray:
+    """
+    Decode the audio to mono int16 PCM, streaming the frames so no float32 copy of the whole audio is made.
+    When the decoded size is estimated to exceed `low_memory.memmap_threshold_mb`, the PCM is written to a
+    read-only memmap in `low_memory.memmap_dir` whose file is removed when the memmap is released.
+    """
+    low_memory = low_memory or LowMemoryOptions()
+    resampler = av.audio.resampler.AudioResampler(format="s16", layout="mono", rate=sampling_rate)
+
+    with av.open(audio, mode="r", metadata_errors="ignore") as container:
+        duration = container.duration / av.time_base if container.duration else 0
+        use_memmap = duration * sampling_rate * 2 > low_memory.memmap_threshold_mb * 1024 * 1024
+
+        if use_memmap:
+            os.makedirs(low_memory.memmap_dir, exist_ok=True)
+            fd, path = tempfile.mkstemp(suffix=".pcm", dir=low_memory.memmap_dir)
+            buffer = os.fdopen(fd, "wb")
+        else:
+            buffer = io.BytesIO()
+
+        with buffer:
+            for frame in itertools.chain(_ignore_invalid_frames(container.decode(audio=0)), [None]):
+                for resampled in resampler.resample(frame):
+                    buffer.write(resampled.to_ndarray().astype(np.int16, copy=False).tobytes())
+            if not use_memmap:
+                return np.frombuffer(buffer.getbuffer(), dtype=np.int16).copy()
+
+    if os.path.getsize(path) == 0:
+        os.remove(path)
+        return np.zeros(0, dtype=np.int16)
+    pcm = np.memmap(path, dtype=np.int16, mode="r")
+    try:
+        # The mapping keeps the file alive until the memmap is released
+        os.remove(path)
+    except OSError:
+        weakref.finalize(pcm, os.remove, path)
+    return pcm
+
+
+def _ignore_invalid_frames(frames):
+    iterator = iter(frames)
+    while True:
+        try:
+            yield next(iterator)
+        except StopIteration:
+            break
+        except av.error.InvalidDataError:
+            continue
+
+
+def validate_audio(audio: Union[str, BinaryIO, np.ndarray, DecodedAudio, None] = None):
+    """
+    Validate audio file and check if it's corrupted.
+    This only probes the container header for an audio stream, without decoding the whole file.
+    """
+    if isinstance(audio, (np.ndarray, DecodedAudio)):
         return True
 
-    if not os.path.exists(audio):
+    if isinstance(audio, str) and not os.path.exists(audio):
         logger.info(f"The file {audio} does not exist. Please check the path.")
         return False
 
+    position = None if isinstance(audio, str) else audio.tell()
     try:
-        audio = decode_audio(audio)
+        with av.open(audio, mode="r", metadata_errors="ignore") as container:
+            if not container.streams.audio:
+                logger.info(f"The file {audio} does not have any audio stream. Please check the file.")
+                return False
         return True
     except Exception as e:
         logger.info(f"The file {audio} is not able to open or corrupted. Please check the file. {e}")
         return False
+    finally:
+        if position is not None:
+            audio.seek(position)
+
+
+def get_audio_hash(audio: Union[str, BinaryIO, np.ndarray, DecodedAudio]) -> str:
+    """Get the sha256 hash of the audio content, used as a content address of the audio regardless of its path"""
+    if isinstance(audio, DecodedAudio):
+        return audio.source_hash
+
+    hasher = hashlib.sha256()
+    if isinstance(audio, np.ndarray):
+        hasher.update(f"{audio.dtype}{audio.shape}".encode("utf-8"))
+        for start in range(0, audio.shape[0], CONVERSION_BLOCK_SAMPLES):
+            hasher.update(np.ascontiguousarray(audio[start:start + CONVERSION_BLOCK_SAMPLES]).tobytes())
+    elif isinstance(audio, str):
+        with open(audio, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                hasher.update(block)
+    else:
+        position = audio.tell()
+        for block in iter(lambda: audio.read(1 << 20), b""):
+            hasher.update(block)
+        audio.seek(position)
+    return hasher.hexdigest()
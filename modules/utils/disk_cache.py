@@ -0,0 +1,125 @@
+import os
+import json
+import pickle
+import hashlib
+import threading
+from typing import Any, Optional
+
+import numpy as np
+
+from modules.utils.logger import get_logger
+
+logger = get_logger()
+
+
+class DiskLRUCache:
+    """
+    Persistent key-value cache on the disk. Each entry is stored as a single file, and the least recently used
+    entries are evicted when the total size of the entries exceeds `max_bytes`.
+    The modification time of the entry file is used as the last access time.
+    """
+    extension = ".pkl"
+
+    def __init__(self,
+                 cache_dir: str,
+                 max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Make a key from the json serializable parts"""
+        serialized = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.extension)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get the cached value, None if it doesn't exist"""
+        path = self.get_path(key)
+        try:
+            value = self.read(path)
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.info(f"Failed to read the cache {path}, removing it: {e}")
+            self.remove(key)
+            return None
+
+    def put(self, key: str, value: Any):
+        """Store the value and evict the least recently used entries if the cache is full"""
+        path = self.get_path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            self.write(temp_path, value)
+            os.replace(temp_path, path)
+        except Exception as e:
+            logger.info(f"Failed to write the cache {path}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self.evict()
+
+    def remove(self, key: str):
+        path = self.get_path(key)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.info(f"Failed to remove the cache {path}: {e}")
+
+    def evict(self):
+        """Remove the least recently used entries until the total size fits in `max_bytes`"""
+        with self._lock:
+            entries = []
+            for file_name in os.listdir(self.cache_dir):
+                if not file_name.endswith(self.extension):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, file_name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, file_name))
+
+            total_bytes = sum(size for _, size, _ in entries)
+            for _, size, file_name in sorted(entries):
+                if total_bytes <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, file_name))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    # An entry that is still memory-mapped can't be removed on Windows, it's evicted later instead
+                    logger.info(f"Failed to evict the cache {file_name}, skipping it: {e}")
+                    continue
+                total_bytes -= size
+
+    def read(self, path: str) -> Any:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def write(self, path: str, value: Any):
+        with open(path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class NumpyDiskLRUCache(DiskLRUCache):
+    """
+    Disk LRU cache of numpy arrays stored as `.npy` files. The arrays are read as read-only memmaps, so reading an
+    entry doesn't copy it into the memory until its pages are accessed.
+    """
+    extension = ".npy"
+
+    def read(self, path: str) -> np.ndarray:
+        return np.load(path, mmap_mode="r", allow_pickle=False)
+
+    def write(self, path: str, value: np.ndarray):
+        with open(path, "wb") as f:
+            np.save(f, value, allow_pickle=False)
@@ -0,0 +1,234 @@
+import gc
+import time
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Optional, Set
+
+from modules.utils.logger import get_logger
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = get_logger()
+
+
+def get_process_memory() -> Optional[int]:
+    """Get the resident memory of the current process in bytes, None if `psutil` is not installed"""
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+@dataclass
+class ModelEntry:
+    key: str
+    offload: Callable[[], None]
+    size_bytes: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class ModelRegistry:
+    """
+    Keeps track of the models that are resident in memory, so they can stay loaded between the requests and be
+    offloaded only when it's needed.
+
+    Models are registered when they're loaded, with the callback that offloads them. When the total memory of the
+    registered models exceeds the memory budget, the least recently used models that are not in use are offloaded.
+    Models that are not used for the idle timeout are offloaded as well.
+
+    The memory of a model is measured by the resident memory of the process before and after loading it, which
+    requires `psutil`. Without it, the memory budget is not applied and only the idle timeout is.
+
+    A model is offloaded outside the lock, so `use()` of a model that is being offloaded waits until the offload
+    has finished, and the owner loads the model again instead of using it while it's offloaded.
+    """
+    def __init__(self,
+                 memory_budget_bytes: Optional[int] = None,
+                 idle_timeout: Optional[float] = None):
+        self.memory_budget_bytes = None
+        self.idle_timeout = None
+        self._entries: Dict[str, ModelEntry] = {}
+        self._ref_counts: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        # Keys of the models that are being offloaded, `use()` waits for them with the condition
+        self._offloading: Set[str] = set()
+        self._offloaded = threading.Condition(self._lock)
+        self._idle_watcher: Optional[threading.Thread] = None
+        self.configure(memory_budget_bytes=memory_budget_bytes, idle_timeout=idle_timeout)
+
+    def configure(self,
+                  memory_budget_bytes: Optional[int] = None,
+                  idle_timeout: Optional[float] = None):
+        """
+        Set the memory budget and the idle timeout. None or 0 disables them.
+
+        Parameters
+        ----------
+        memory_budget_bytes: Optional[int]
+            Maximum total memory of the resident models in bytes
+        idle_timeout: Optional[float]
+            Seconds after the last use of a model to offload it
+        """
+        self.memory_budget_bytes = memory_budget_bytes or None
+        self.idle_timeout = idle_timeout or None
+
+        if self.memory_budget_bytes is not None and psutil is None:
+            logger.warning("psutil is not installed, the memory budget of the models will not be applied.")
+        if self.idle_timeout is not None and self._idle_watcher is None:
+            self._idle_watcher = threading.Thread(target=self._watch_idle_models, daemon=True)
+            self._idle_watcher.start()
+        self.evict()
+
+    @property
+    def is_enabled(self) -> bool:
+        """Whether the registry decides when to offload the models, with the memory budget or the idle timeout"""
+        return self.memory_budget_bytes is not None or self.idle_timeout is not None
+
+    def should_offload(self, enable_offload: bool) -> bool:
+        """
+        Whether to offload a model right after its use. When the registry is enabled, the models stay resident
+        and it offloads them by the memory budget and the idle timeout instead of the `enable_offload` flags.
+        """
+        return enable_offload and not self.is_enabled
+
+    @staticmethod
+    def make_key(owner: object, name: Optional[str] = None) -> str:
+        """Make a key of the model that is unique for the instance owning it"""
+        return f"{name or type(owner).__name__}@{id(owner):x}"
+
+    @contextmanager
+    def loading(self, key: str, offload: Callable[[], None]):
+        """
+        Register the model that is loaded in this context, with the memory it takes.
+
+        Parameters
+        ----------
+        key: str
+            Key of the model from `make_key()`
+        offload: Callable[[], None]
+            Callback to offload the model
+        """
+        self.evict_idle()
+        memory_before = get_process_memory()
+        yield
+        memory_after = get_process_memory()
+
+        size_bytes = 0
+        if memory_before is not None and memory_after is not None:
+            size_bytes = max(0, memory_after - memory_before)
+        self.register(key, offload, size_bytes)
+
+    def register(self,
+                 key: str,
+                 offload: Callable[[], None],
+                 size_bytes: int = 0):
+        """Register the loaded model and offload the others if the memory budget is exceeded"""
+        with self._lock:
+            self._entries[key] = ModelEntry(key=key, offload=offload, size_bytes=size_bytes)
+        self.evict(exclude=key)
+
+    def unregister(self, key: str):
+        """Remove the model from the registry, it should be called when the model is offloaded by its owner"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def touch(self, key: str):
+        """Mark the model as recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.last_used = time.monotonic()
+
+    @contextmanager
+    def use(self, key: str):
+        """
+        Mark the model as in use in this context, so it's not offloaded by the registry meanwhile.
+        If the registry is offloading the model, this waits until it's offloaded.
+        """
+        with self._offloaded:
+            while key in self._offloading:
+                self._offloaded.wait()
+            self._ref_counts[key] = self._ref_counts.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._ref_counts[key] -= 1
+                if self._ref_counts[key] <= 0:
+                    del self._ref_counts[key]
+            self.touch(key)
+
+    def get_total_memory(self) -> int:
+        with self._lock:
+            return sum(entry.size_bytes for entry in self._entries.values())
+
+    def evict(self, exclude: Optional[str] = None):
+        """Offload the least recently used models that are not in use until the total memory fits in the budget"""
+        if self.memory_budget_bytes is None:
+            return
+
+        while True:
+            with self._lock:
+                if self.get_total_memory() <= self.memory_budget_bytes:
+                    return
+                candidates = [entry for entry in self._entries.values()
+                              if entry.key != exclude and not self._ref_counts.get(entry.key)]
+                if not candidates:
+                    logger.info("The models exceed the memory budget, but all the other models are in use.")
+                    return
+                entry = min(candidates, key=lambda e: e.last_used)
+                del self._entries[entry.key]
+                self._offloading.add(entry.key)
+            self._offload_entries([entry])
+
+    def evict_idle(self):
+        """Offload the models that are not used for the idle timeout"""
+        if self.idle_timeout is None:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            idle_entries = [entry for entry in self._entries.values()
+                            if not self._ref_counts.get(entry.key) and now - entry.last_used > self.idle_timeout]
+            for entry in idle_entries:
+                del self._entries[entry.key]
+                self._offloading.add(entry.key)
+        self._offload_entries(idle_entries)
+
+    def _offload_entries(self, entries: Iterable[ModelEntry]):
+        """Offload the entries that are marked as offloading, and wake up `use()` waiting for them"""
+        for entry in entries:
+            try:
+                self._offload(entry)
+            finally:
+                with self._offloaded:
+                    self._offloading.discard(entry.key)
+                    self._offloaded.notify_all()
+
+    def _offload(self, entry: ModelEntry):
+        logger.info(f"Offloading the model {entry.key} ({entry.size_bytes / 1024 ** 2:.0f} MB) from the registry.")
+        try:
+            entry.offload()
+        except Exception as e:
+            logger.warning(f"Failed to offload the model {entry.key}: {e}")
+        gc.collect()
+
+    def _watch_idle_models(self):
+        while True:
+            idle_timeout = self.idle_timeout
+            if idle_timeout is None:
+                break
+            time.sleep(min(idle_timeout / 2, 60))
+            self.evict_idle()
+        self._idle_watcher = None
+
+
+_model_registry = ModelRegistry()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Get the model registry shared by the whole process"""
+    return _model_registry
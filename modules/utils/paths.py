@@ -18,6 +18,9 @@ UVR_INSTRUMENTAL_OUTPUT_DIR = os.path.join(UVR_OUTPUT_DIR, "instrumental")
 UVR_VOCALS_OUTPUT_DIR = os.path.join(UVR_OUTPUT_DIR, "vocals")
 KNOWLEDGE_BASE_DIR = os.path.join(WEBUI_DIR, "knowledge_base")
 RAG_STORE_DIR = os.path.join(OUTPUT_DIR, "rag_store")
+STAGE_CACHE_DIR = os.path.join(OUTPUT_DIR, "stage_cache")
+PCM_CACHE_DIR = os.path.join(OUTPUT_DIR, "pcm_cache")
+AUTOTUNE_RESULTS_PATH = os.path.join(OUTPUT_DIR, "autotune.yaml")
 BACKEND_DIR_PATH = os.path.join(WEBUI_DIR, "backend")
 SERVER_CONFIG_PATH = os.path.join(BACKEND_DIR_PATH, "configs", "config.yaml")
 SERVER_DOTENV_PATH = os.path.join(BACKEND_DIR_PATH, "configs", ".env")
@@ -0,0 +1,118 @@
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from modules.utils.logger import get_logger
+from modules.utils.model_registry import get_process_memory
+
+logger = get_logger()
+
+
+class StageProfile(BaseModel):
+    """Timings of a single stage of the transcription pipeline"""
+    stage: str = Field(..., description="Name of the stage")
+    wall_time: float = Field(0, description="Wall clock time of the stage in seconds")
+    cpu_time: float = Field(0, description="CPU time of the process during the stage in seconds")
+    peak_memory: Optional[int] = Field(
+        default=None,
+        description="Peak resident memory of the process during the stage in bytes, None if psutil is not installed"
+    )
+    rtf: Optional[float] = Field(
+        default=None,
+        description="Real-time factor, the wall time divided by the audio duration"
+    )
+
+
+class PipelineProfiler:
+    """
+    Records the wall time, CPU time and peak memory of each stage of a pipeline run.
+
+    The CPU time and the memory are measured for the whole process, so they include the other threads that run
+    meanwhile, such as the prefetching of the next file in `transcribe_file()`.
+    A stage that runs more than once in a run is accumulated into a single profile.
+    """
+    def __init__(self,
+                 audio_duration: Optional[float] = None,
+                 memory_sample_interval: float = 0.05):
+        self.audio_duration = audio_duration
+        self.memory_sample_interval = memory_sample_interval
+        self._profiles: Dict[str, StageProfile] = {}
+        self._lock = threading.Lock()
+
+    def set_audio_duration(self, audio_duration: Optional[float]):
+        """Set the duration of the audio in seconds to compute the real-time factor with"""
+        self.audio_duration = audio_duration
+
+    @contextmanager
+    def stage(self, name: str):
+        """Measure the stage that runs in this context"""
+        peak_memory = [get_process_memory()]
+        stop_sampling = threading.Event()
+        sampler = None
+        if peak_memory[0] is not None:
+            sampler = threading.Thread(
+                target=self._sample_memory, args=(peak_memory, stop_sampling), daemon=True
+            )
+            sampler.start()
+
+        start_wall_time, start_cpu_time = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start_wall_time
+            cpu_time = time.process_time() - start_cpu_time
+            if sampler is not None:
+                stop_sampling.set()
+                sampler.join()
+                peak_memory[0] = max(peak_memory[0], get_process_memory())
+            self._add(name, wall_time, cpu_time, peak_memory[0])
+
+    def _sample_memory(self, peak_memory: List[Optional[int]], stop_sampling: threading.Event):
+        while not stop_sampling.wait(self.memory_sample_interval):
+            peak_memory[0] = max(peak_memory[0], get_process_memory())
+
+    def _add(self, name: str, wall_time: float, cpu_time: float, peak_memory: Optional[int]):
+        with self._lock:
+            profile = self._profiles.get(name)
+            if profile is None:
+                self._profiles[name] = StageProfile(
+                    stage=name, wall_time=wall_time, cpu_time=cpu_time, peak_memory=peak_memory
+                )
+                return
+            profile.wall_time += wall_time
+            profile.cpu_time += cpu_time
+            if peak_memory is not None:
+                profile.peak_memory = max(profile.peak_memory or 0, peak_memory)
+
+    @property
+    def stages(self) -> List[StageProfile]:
+        """Profiles of the stages in the order they started, with the real-time factor"""
+        with self._lock:
+            profiles = [profile.model_copy() for profile in self._profiles.values()]
+        if self.audio_duration:
+            for profile in profiles:
+                profile.rtf = profile.wall_time / self.audio_duration
+        return profiles
+
+    def to_list(self) -> List[dict]:
+        return [profile.model_dump() for profile in self.stages]
+
+    def log_summary(self):
+        """Log the timings of the stages"""
+        for profile in self.stages:
+            summary = f"[Profile] {profile.stage}: wall {profile.wall_time:.3f}s, cpu {profile.cpu_time:.3f}s"
+            if profile.peak_memory is not None:
+                summary += f", peak memory {profile.peak_memory / 1024 ** 2:.0f} MB"
+            if profile.rtf is not None:
+                summary += f", RTF {profile.rtf:.3f}"
+            logger.info(summary)
+
+
+def profile_stage(profiler: Optional[PipelineProfiler], name: str):
+    """Measure the stage with the profiler, or do nothing if the profiler is None"""
+    if profiler is None:
+        return nullcontext()
+    return profiler.stage(name)
@@ -0,0 +1,159 @@
+import functools
+import math
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Union
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import firwin, upfirdn
+
+
+@dataclass(frozen=True)
+class ResampleKernel:
+    """Anti-aliasing filter for a pair of sample rates, applied with the polyphase `scipy.signal.upfirdn`"""
+    up: int
+    down: int
+    half_len: int
+    h: np.ndarray
+
+    @property
+    def taps(self) -> int:
+        """Number of the input samples that each output sample depends on"""
+        return -(-len(self.h) // self.up)
+
+
+@functools.lru_cache(maxsize=32)
+def get_resample_kernel(orig_sample_rate: int, new_sample_rate: int) -> ResampleKernel:
+    """
+    Design the filter for the sample rates once and cache it. The filter is the same as `scipy.signal.resample_poly`,
+    a Kaiser windowed FIR with 10 zero-crossings on each side of the lower of the two Nyquist frequencies.
+    """
+    gcd = math.gcd(orig_sample_rate, new_sample_rate)
+    up, down = new_sample_rate // gcd, orig_sample_rate // gcd
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    h = (firwin(2 * half_len + 1, 1 / max_rate, window=("kaiser", 5.0)) * up).astype(np.float32)
+    h.setflags(write=False)
+    return ResampleKernel(up=up, down=down, half_len=half_len, h=h)
+
+
+def downmix(audio: np.ndarray) -> np.ndarray:
+    """Downmix the audio of (samples, channels) to mono. This is a matrix-vector product, much faster than `mean()`"""
+    audio = audio.astype(np.float32, copy=False)
+    return audio @ np.full(audio.shape[1], 1 / audio.shape[1], dtype=np.float32)
+
+
+class StreamingResampler:
+    """
+    Resamples the audio chunk by chunk with the cached polyphase filter, so only a chunk and the filter history are in
+    memory at once. Multichannel chunks of (samples, channels), as read by `soundfile`, are downmixed to mono in the
+    same pass. The output is identical to resampling the whole audio at once.
+    """
+    def __init__(self,
+                 orig_sample_rate: int,
+                 new_sample_rate: int = 16000):
+        self.kernel = get_resample_kernel(orig_sample_rate, new_sample_rate)
+        # Input samples from the index `_buffer_start`, with the zeros before the audio as the initial history
+        self._buffer = np.zeros(self.kernel.taps - 1, dtype=np.float32)
+        self._buffer_start = -(self.kernel.taps - 1)
+        self._num_input = 0
+        self._num_output = 0
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        """Feed the next chunk of the audio and return the resampled audio that's available so far"""
+        if chunk.ndim >= 2:
+            chunk = downmix(chunk)
+        self._buffer = np.concatenate([self._buffer, chunk.astype(np.float32, copy=False)])
+        self._num_input += len(chunk)
+
+        kernel = self.kernel
+        last_index = self._num_input - 1
+        num_output = (last_index * kernel.up + kernel.up - 1 - kernel.half_len) // kernel.down + 1
+        return self._resample(max(num_output, self._num_output))
+
+    def flush(self) -> np.ndarray:
+        """Return the rest of the resampled audio, after all the chunks are fed"""
+        kernel = self.kernel
+        num_output = -(-self._num_input * kernel.up // kernel.down)
+        last_index = self._input_index(num_output - 1) if num_output > 0 else -1
+        num_padding = last_index - (self._buffer_start + len(self._buffer) - 1)
+        if num_padding > 0:
+            self._buffer = np.concatenate([self._buffer, np.zeros(num_padding, dtype=np.float32)])
+        return self._resample(num_output)
+
+    def _input_index(self, output_index: Union[int, np.ndarray]) -> Union[int, np.ndarray]:
+        """Index of the latest input sample that the output sample depends on"""
+        return (output_index * self.kernel.down + self.kernel.half_len) // self.kernel.up
+
+    def _resample(self, num_output: int) -> np.ndarray:
+        kernel = self.kernel
+        start = self._num_output
+        if num_output <= start:
+            return np.array([], dtype=np.float32)
+
+        first_index = self._input_index(start) - (kernel.taps - 1)
+        last_index = self._input_index(num_output - 1)
+        audio = self._buffer[first_index - self._buffer_start: last_index - self._buffer_start + 1]
+
+        # Output `m` is at `m * down + half_len` of the upsampled audio. Delay the filter so the first output falls
+        # on the decimation grid of `upfirdn` that starts from `first_index`.
+        position = start * kernel.down + kernel.half_len - first_index * kernel.up
+        delay = -position % kernel.down
+        h = np.concatenate([np.zeros(delay, dtype=np.float32), kernel.h]) if delay else kernel.h
+        offset = (position + delay) // kernel.down
+        result = upfirdn(h, audio, kernel.up, kernel.down)[offset: offset + num_output - start]
+        self._num_output = num_output
+
+        # Drop the input that's no longer needed by the next outputs
+        next_start = self._input_index(self._num_output) - (kernel.taps - 1)
+        if next_start > self._buffer_start:
+            self._buffer = self._buffer[next_start - self._buffer_start:]
+            self._buffer_start = next_start
+        return result.astype(np.float32, copy=False)
+
+
+def iter_resample(chunks: Iterable[np.ndarray],
+                  orig_sample_rate: int,
+                  new_sample_rate: int = 16000) -> Iterator[np.ndarray]:
+    """Resample the chunks of the audio one by one and yield the resampled chunks"""
+    resampler = StreamingResampler(orig_sample_rate, new_sample_rate)
+    for chunk in chunks:
+        yield resampler.process(chunk)
+    yield resampler.flush()
+
+
+def resample(audio: Union[str, np.ndarray],
+             orig_sample_rate: Optional[int] = None,
+             new_sample_rate: int = 16000,
+             chunk_size: int = 1_048_576) -> np.ndarray:
+    """
+    Resample the audio to mono of `new_sample_rate` with the cached polyphase filter.
+
+    Parameters
+    ----------
+    audio: Union[str, np.ndarray]
+        Audio path, or audio array of (samples,) or (samples, channels)
+    orig_sample_rate: Optional[int]
+        Sample rate of the audio array. It's read from the file if the audio is a path.
+    new_sample_rate: int
+        Sample rate to resample to
+    chunk_size: int
+        Number of the input samples to resample at once, which bounds the memory of the intermediate arrays
+
+    Returns
+    ----------
+    Resampled mono audio in float32
+    """
+    if isinstance(audio, str):
+        with sf.SoundFile(audio) as f:
+            return np.concatenate(list(iter_resample(
+                f.blocks(blocksize=chunk_size, dtype="float32"), f.samplerate, new_sample_rate
+            )))
+
+    if orig_sample_rate is None:
+        raise ValueError("orig_sample_rate must be provided when audio is numpy array.")
+    if orig_sample_rate == new_sample_rate:
+        return downmix(audio) if audio.ndim >= 2 else audio.astype(np.float32, copy=False)
+
+    chunks = (audio[start:start + chunk_size] for start in range(0, len(audio), chunk_size))
+    return np.concatenate(list(iter_resample(chunks, orig_sample_rate, new_sample_rate)))
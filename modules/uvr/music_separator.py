@@ -12,6 +12,8 @@ import traceback
 from modules.utils.paths import DEFAULT_PARAMETERS_CONFIG_PATH, UVR_MODELS_DIR, UVR_OUTPUT_DIR
 from modules.utils.files_manager import load_yaml, save_yaml, is_video
 from modules.diarize.audio_loader import load_audio
+from modules.utils.audio_manager import DecodedAudio
+from modules.utils.model_registry import ModelRegistry, get_model_registry
 from modules.utils.logger import get_logger
 logger = get_logger()
 
@@ -30,6 +32,7 @@ class MusicSeparator:
                  model_dir: Optional[str] = UVR_MODELS_DIR,
                  output_dir: Optional[str] = UVR_OUTPUT_DIR):
         self.model = None
+        self.registry_key = ModelRegistry.make_key(self, "uvr")
         self.device = self.get_device()
         self.available_devices = ["cpu", "cuda", "xpu", "mps"]
         self.model_dir = model_dir
@@ -67,14 +70,15 @@ class MusicSeparator:
             "segment": segment_size,
             "split": True
         }
-        self.model = MDX(name=model_name,
-                         other_metadata=self.model_config,
-                         device=self.device,
-                         logger=None,
-                         model_dir=self.model_dir)
+        with get_model_registry().loading(self.registry_key, self.offload):
+            self.model = MDX(name=model_name,
+                             other_metadata=self.model_config,
+                             device=self.device,
+                             logger=None,
+                             model_dir=self.model_dir)
 
     def separate(self,
-                 audio: Union[str, np.ndarray],
+                 audio: Union[str, np.ndarray, DecodedAudio],
                  model_name: str,
                  device: Optional[str] = None,
                  segment_size: int = 256,
@@ -84,7 +88,7 @@ class MusicSeparator:
         Separate the background music from the audio.
 
         Args:
-            audio (Union[str, np.ndarray]): Audio path or numpy array.
+            audio (Union[str, np.ndarray, DecodedAudio]): Audio path or numpy array or the decoded audio.
             model_name (str): Model name.
             device (str): Device to use for the model.
             segment_size (int): Segment size for the prediction.
@@ -97,6 +101,21 @@ class MusicSeparator:
             np.ndarray: Vocals numpy arrays.
             file_paths: List of file paths where the separated audio is saved. Return empty when save_file is False.
         """
+        self.audio_info = None
+        timestamp = datetime.now().strftime("%m%d%H%M%S")
+        output_filename, ext = f"UVR-{timestamp}", ".wav"
+        sample_rate = 16000
+
+        if isinstance(audio, DecodedAudio):
+            if audio.source is not None:
+                output_filename = os.path.splitext(os.path.basename(audio.source))[0]
+            # UVR separates the audio files at their original sample rate, so only the pcm of the others is reused
+            if audio.source is not None and not is_video(audio.source):
+                audio = audio.source
+            else:
+                sample_rate = audio.sample_rate
+                audio = audio.to_float32()
+
         if isinstance(audio, str):
             output_filename, ext = os.path.basename(audio), ".wav"
             output_filename, orig_ext = os.path.splitext(output_filename)
@@ -107,32 +126,29 @@ class MusicSeparator:
             else:
                 self.audio_info = torchaudio.info(audio)
                 sample_rate = self.audio_info.sample_rate
-        else:
-            timestamp = datetime.now().strftime("%m%d%H%M%S")
-            output_filename, ext = f"UVR-{timestamp}", ".wav"
-            sample_rate = 16000
 
         model_config = {
             "segment": segment_size,
             "split": True
         }
 
-        if (self.model is None or
-                self.current_model_size != model_name or
-                self.model_config != model_config or
-                self.model.sample_rate != sample_rate or
-                self.device != device):
-            progress(0, desc="Initializing UVR Model..")
-            self.update_model(
-                model_name=model_name,
-                device=device,
-                segment_size=segment_size
-            )
-            self.model.sample_rate = sample_rate
-
-        progress(0, desc="Separating background music from the audio.. "
-                         "(It will only display 0% until the job is complete.) ")
-        result = self.model(audio)
+        with get_model_registry().use(self.registry_key):
+            if (self.model is None or
+                    self.current_model_size != model_name or
+                    self.model_config != model_config or
+                    self.model.sample_rate != sample_rate or
+                    self.device != device):
+                progress(0, desc="Initializing UVR Model..")
+                self.update_model(
+                    model_name=model_name,
+                    device=device,
+                    segment_size=segment_size
+                )
+                self.model.sample_rate = sample_rate
+
+            progress(0, desc="Separating background music from the audio.. "
+                             "(It will only display 0% until the job is complete.) ")
+            result = self.model(audio)
         instrumental, vocals = result["instrumental"].T, result["vocals"].T
 
         file_paths = []
@@ -180,6 +196,7 @@ class MusicSeparator:
 
     def offload(self):
         """Offload the model and free up the memory"""
+        get_model_registry().unregister(self.registry_key)
         if self.model is not None:
             del self.model
             self.model = None
@@ -1,15 +1,38 @@
 # Adapted from https://github.com/SYSTRAN/faster-whisper/blob/master/faster_whisper/vad.py
 
 from faster_whisper.vad import VadOptions, get_vad_model
+from faster_whisper.utils import get_assets_path
 import numpy as np
-from typing import BinaryIO, Union, List, Optional, Tuple
+import functools
+import hashlib
+import os
+from typing import BinaryIO, Union, List, Optional, Tuple, Iterable, Generator
 import warnings
 import bisect
-import faster_whisper
+from contextlib import contextmanager
 from faster_whisper.transcribe import SpeechTimestampsMap
 import gradio as gr
 
 from modules.whisper.data_classes import *
+from modules.utils.audio_manager import DecodedAudio, decode_pcm, get_audio_hash
+from modules.utils.disk_cache import DiskLRUCache
+from modules.vad.vad_stream import (FAST_MODE_WINDOW_STRIDE, SpeechSegmenter, StreamingSileroModel,
+                                    pad_speech_chunk)
+from modules.vad.vad_session_pool import VadSessionPool
+
+# Speech probabilities are cached as uint8, 1/255 resolution is far below the threshold steps that matter
+PROBS_QUANTIZATION_LEVELS = 255
+
+
+@functools.lru_cache
+def get_vad_model_version() -> str:
+    """Hash of the Silero VAD model files, so the cached speech probabilities of another model are never used"""
+    hasher = hashlib.sha256()
+    for file_name in sorted(os.listdir(get_assets_path())):
+        if file_name.startswith("silero") and file_name.endswith(".onnx"):
+            with open(os.path.join(get_assets_path(), file_name), "rb") as f:
+                hasher.update(f.read())
+    return hasher.hexdigest()[:16]
 
 
 class SileroVAD:
@@ -17,23 +40,42 @@ class SileroVAD:
         self.sampling_rate = 16000
         self.window_size_samples = 512
         self.model = None
+        self.probs_cache: Optional[DiskLRUCache] = None
+        self.session_pool: Optional[VadSessionPool] = None
+
+    def register_probs_cache(self, cache: Optional[DiskLRUCache]):
+        """
+        Register a cache of the speech probabilities by the audio content and the model version. The probabilities
+        are the only expensive part of VAD, so re-running it with other options only replays the segmentation.
+        """
+        self.probs_cache = cache
+
+    def register_session_pool(self, pool: Optional[VadSessionPool]):
+        """
+        Register a pool of the model sessions, so each concurrent VAD call runs the model on a session of its own
+        instead of the shared `model`.
+        """
+        self.session_pool = pool
 
     def run(self,
-            audio: Union[str, BinaryIO, np.ndarray],
+            audio: Union[str, BinaryIO, np.ndarray, DecodedAudio],
             vad_parameters: VadOptions,
-            progress: gr.Progress = gr.Progress()
+            progress: gr.Progress = gr.Progress(),
+            fast_mode: bool = False,
             ) -> Tuple[np.ndarray, List[dict]]:
         """
         Run VAD
 
         Parameters
         ----------
-        audio: Union[str, BinaryIO, np.ndarray]
-            Audio path or file binary or Audio numpy array
+        audio: Union[str, BinaryIO, np.ndarray, DecodedAudio]
+            Audio path or file binary or Audio numpy array or the decoded audio
         vad_parameters:
             Options for VAD processing.
         progress: gr.Progress
             Indicator to show progress directly in gradio.
+        fast_mode: bool
+            Run the model on every other window for about half the time of VAD, with coarser speech chunks.
 
         Returns
         ----------
@@ -45,8 +87,18 @@ class SileroVAD:
 
         sampling_rate = self.sampling_rate
 
+        audio_hash = None
+        if isinstance(audio, DecodedAudio):
+            if audio.sample_rate != sampling_rate:
+                raise ValueError(f"VAD requires the audio of {sampling_rate} sample rate, got {audio.sample_rate}.")
+            if self.probs_cache is not None:
+                audio_hash = audio.source_hash
+            audio = audio.pcm
+        elif self.probs_cache is not None:
+            audio_hash = get_audio_hash(audio)
+
         if not isinstance(audio, np.ndarray):
-            audio = faster_whisper.decode_audio(audio, sampling_rate=sampling_rate)
+            audio = decode_pcm(audio, sampling_rate, source_hash=audio_hash)
 
         duration = audio.shape[0] / sampling_rate
         duration_after_vad = duration
@@ -58,7 +110,9 @@ class SileroVAD:
         speech_chunks = self.get_speech_timestamps(
             audio=audio,
             vad_options=vad_parameters,
-            progress=progress
+            progress=progress,
+            audio_hash=audio_hash,
+            fast_mode=fast_mode
         )
 
         audio = self.collect_chunks(audio, speech_chunks)
@@ -71,6 +125,8 @@ class SileroVAD:
         audio: np.ndarray,
         vad_options: Optional[VadOptions] = None,
         progress: gr.Progress = gr.Progress(),
+        audio_hash: Optional[str] = None,
+        fast_mode: bool = False,
         **kwargs,
     ) -> List[dict]:
         """This method is used for splitting long audios into speech chunks using silero VAD.
@@ -80,146 +136,191 @@ class SileroVAD:
           vad_options: Options for VAD processing.
           kwargs: VAD options passed as keyword arguments for backward compatibility.
           progress: Gradio progress to indicate progress.
+          audio_hash: Content hash of the audio to cache the speech probabilities by, see `register_probs_cache()`.
+          fast_mode: Run the model on every other window, see `get_speech_probs()`.
 
         Returns:
           List of dicts containing begin and end samples of each speech chunk.
         """
 
-        if self.model is None:
-            self.update_model()
-
         if vad_options is None:
             vad_options = VadOptions(**kwargs)
 
-        threshold = vad_options.threshold
-        neg_threshold = vad_options.neg_threshold
-        min_speech_duration_ms = vad_options.min_speech_duration_ms
-        max_speech_duration_s = vad_options.max_speech_duration_s
-        min_silence_duration_ms = vad_options.min_silence_duration_ms
-        window_size_samples = self.window_size_samples
-        speech_pad_ms = vad_options.speech_pad_ms
-        min_speech_samples = self.sampling_rate * min_speech_duration_ms / 1000
-        speech_pad_samples = self.sampling_rate * speech_pad_ms / 1000
-        max_speech_samples = (
-                self.sampling_rate * max_speech_duration_s
-                - window_size_samples
-                - 2 * speech_pad_samples
-        )
-        min_silence_samples = self.sampling_rate * min_silence_duration_ms / 1000
-        min_silence_samples_at_max_speech = self.sampling_rate * 98 / 1000
+        speech_probs = self.get_cached_speech_probs(audio, audio_hash, fast_mode)
+        return self.segment_speech_probs(speech_probs, len(audio), vad_options)
 
-        audio_length_samples = len(audio)
+    def get_cached_speech_probs(self,
+                                audio: np.ndarray,
+                                audio_hash: Optional[str] = None,
+                                fast_mode: bool = False) -> np.ndarray:
+        """
+        Get the speech probabilities from the probabilities cache, or run the model and cache them.
+        The cached probabilities are quantized to uint8, so they're dequantized even right after running the model,
+        to get the same speech chunks whether they're from the cache or not.
+        """
+        if self.probs_cache is None or audio_hash is None:
+            return self.get_speech_probs(audio, fast_mode=fast_mode)
 
-        padded_audio = np.pad(
-            audio, (0, window_size_samples - audio.shape[0] % window_size_samples)
+        key = self.probs_cache.make_key(
+            "vad_probs", audio_hash, get_vad_model_version(), self.sampling_rate, self.window_size_samples,
+            self.get_window_stride(fast_mode)
         )
-        speech_probs = self.model(padded_audio.reshape(1, -1)).squeeze(0)
-
-        triggered = False
-        speeches = []
-        current_speech = {}
-        if neg_threshold is None:
-            neg_threshold = max(threshold - 0.15, 0.01)
-
-        # to save potential segment end (and tolerate some silence)
-        temp_end = 0
-        # to save potential segment limits in case of maximum segment size reached
-        prev_end = next_start = 0
-
-        for i, speech_prob in enumerate(speech_probs):
-            if (speech_prob >= threshold) and temp_end:
-                temp_end = 0
-                if next_start < prev_end:
-                    next_start = window_size_samples * i
-
-            if (speech_prob >= threshold) and not triggered:
-                triggered = True
-                current_speech["start"] = window_size_samples * i
-                continue
-
-            if (
-                    triggered
-                    and (window_size_samples * i) - current_speech["start"] > max_speech_samples
-            ):
-                if prev_end:
-                    current_speech["end"] = prev_end
-                    speeches.append(current_speech)
-                    current_speech = {}
-                    # previously reached silence (< neg_thres) and is still not speech (< thres)
-                    if next_start < prev_end:
-                        triggered = False
-                    else:
-                        current_speech["start"] = next_start
-                    prev_end = next_start = temp_end = 0
-                else:
-                    current_speech["end"] = window_size_samples * i
-                    speeches.append(current_speech)
-                    current_speech = {}
-                    prev_end = next_start = temp_end = 0
-                    triggered = False
-                    continue
-
-            if (speech_prob < neg_threshold) and triggered:
-                if not temp_end:
-                    temp_end = window_size_samples * i
-                # condition to avoid cutting in very short silence
-                if (window_size_samples * i) - temp_end > min_silence_samples_at_max_speech:
-                    prev_end = temp_end
-                if (window_size_samples * i) - temp_end < min_silence_samples:
-                    continue
-                else:
-                    current_speech["end"] = temp_end
-                    if (
-                            current_speech["end"] - current_speech["start"]
-                    ) > min_speech_samples:
-                        speeches.append(current_speech)
-                    current_speech = {}
-                    prev_end = next_start = temp_end = 0
-                    triggered = False
-                    continue
-
-        if (
-                current_speech
-                and (audio_length_samples - current_speech["start"]) > min_speech_samples
-        ):
-            current_speech["end"] = audio_length_samples
-            speeches.append(current_speech)
-
-        for i, speech in enumerate(speeches):
-            if i == 0:
-                speech["start"] = int(max(0, speech["start"] - speech_pad_samples))
-            if i != len(speeches) - 1:
-                silence_duration = speeches[i + 1]["start"] - speech["end"]
-                if silence_duration < 2 * speech_pad_samples:
-                    speech["end"] += int(silence_duration // 2)
-                    speeches[i + 1]["start"] = int(
-                        max(0, speeches[i + 1]["start"] - silence_duration // 2)
-                    )
-                else:
-                    speech["end"] = int(
-                        min(audio_length_samples, speech["end"] + speech_pad_samples)
-                    )
-                    speeches[i + 1]["start"] = int(
-                        max(0, speeches[i + 1]["start"] - speech_pad_samples)
-                    )
-            else:
-                speech["end"] = int(
-                    min(audio_length_samples, speech["end"] + speech_pad_samples)
-                )
-
-        return speeches
+        quantized = self.probs_cache.get(key)
+        if quantized is None:
+            speech_probs = self.get_speech_probs(audio, fast_mode=fast_mode)
+            quantized = np.round(np.clip(speech_probs, 0, 1) * PROBS_QUANTIZATION_LEVELS).astype(np.uint8)
+            self.probs_cache.put(key, quantized)
+        return quantized.astype(np.float32) / PROBS_QUANTIZATION_LEVELS
+
+    def get_speech_probs(self,
+                         audio: np.ndarray,
+                         block_size_samples: int = 1 << 20,
+                         fast_mode: bool = False) -> np.ndarray:
+        """
+        Run the model on the audio and get the 1-D array of the speech probability of each window.
+        The audio is run block by block with `StreamingSileroModel`, so only a block of it is converted to float32
+        and fed to the model at once, with the same probabilities as running the whole audio at once.
+
+        The bundled Silero model only takes 16kHz audio, so the fast mode halves the windows per second of audio
+        instead of the sample rate. The model runs on every other window and the skipped windows get the probability
+        of the window before them, so the speech chunks stay in the samples of the 16kHz audio.
+        """
+        with self.checkout_model() as session:
+            model = StreamingSileroModel(session, self.window_size_samples,
+                                         window_stride=self.get_window_stride(fast_mode))
+            speech_probs = [model(audio[start:start + block_size_samples])
+                            for start in range(0, audio.shape[0], block_size_samples)]
+            speech_probs.append(model.flush())
+        return np.concatenate(speech_probs)
+
+    def segment_speech_probs(self,
+                             speech_probs: np.ndarray,
+                             audio_length_samples: int,
+                             vad_options: VadOptions) -> List[dict]:
+        """Get the padded speech chunks from the speech probabilities of the windows, see `SpeechSegmenter`"""
+        segmenter = SpeechSegmenter(vad_options, self.sampling_rate, self.window_size_samples)
+        segmenter.feed(speech_probs)
+        segmenter.finish(audio_length_samples)
+        return segmenter.pad_speeches(audio_length_samples)
+
+    def stream_speech_timestamps(self,
+                                 blocks: Iterable[np.ndarray],
+                                 vad_options: Optional[VadOptions] = None,
+                                 fast_mode: bool = False) -> Generator[dict, None, None]:
+        """
+        Streaming variant of `get_speech_timestamps()`. The audio is consumed block by block, carrying the model state
+        and the segmentation state across the blocks, so the memory doesn't grow with the length of the audio.
+        Each speech chunk is yielded as soon as its padded boundaries can't change anymore, which is when the next
+        chunk is found or the silence after it is longer than two paddings.
+        The chunks are the same as `get_speech_timestamps()` of the whole audio.
+
+        Parameters
+        ----------
+        blocks: Iterable[np.ndarray]
+            Consecutive blocks of the audio of any length, float32 waveform or int16 PCM of 16kHz
+        vad_options: Optional[VadOptions]
+            Options for VAD processing
+        fast_mode: bool
+            Run the model on every other window, see `get_speech_probs()`
+
+        Yields
+        ----------
+        Speech chunk with the "start" and "end" samples
+        """
+        if vad_options is None:
+            vad_options = VadOptions()
+
+        segmenter = SpeechSegmenter(vad_options, self.sampling_rate, self.window_size_samples)
+        speeches = segmenter.speeches
+        pad_samples = segmenter.speech_pad_samples
+        audio_length_samples = 0
+        num_yielded = 0
+
+        with self.checkout_model() as session:
+            model = StreamingSileroModel(session, self.window_size_samples,
+                                         window_stride=self.get_window_stride(fast_mode))
+            for block in blocks:
+                audio_length_samples += len(block)
+                segmenter.feed(model(block))
+                # A chunk is final once the next one is found, or when any next one is at least two paddings away
+                while num_yielded < len(speeches) and (
+                        num_yielded + 1 < len(speeches)
+                        or segmenter.next_speech_start_bound - speeches[num_yielded]["end"] >= 2 * pad_samples):
+                    following = speeches[num_yielded + 1] if num_yielded + 1 < len(speeches) else None
+                    previous = speeches[num_yielded - 1] if num_yielded > 0 else None
+                    yield pad_speech_chunk(previous, speeches[num_yielded], following, pad_samples,
+                                           audio_length_samples)
+                    num_yielded += 1
+
+            segmenter.feed(model.flush())
+        segmenter.finish(audio_length_samples)
+        for speech in segmenter.pad_speeches(audio_length_samples)[num_yielded:]:
+            yield speech
 
     def update_model(self):
         self.model = get_vad_model()
 
+    @contextmanager
+    def checkout_model(self):
+        """Check out a session from the session pool if it's registered, otherwise use the shared model"""
+        if self.session_pool is not None:
+            with self.session_pool.checkout() as session:
+                yield session
+            return
+
+        if self.model is None:
+            self.update_model()
+        yield self.model
+
+    @staticmethod
+    def get_window_stride(fast_mode: bool) -> int:
+        return FAST_MODE_WINDOW_STRIDE if fast_mode else 1
+
     @staticmethod
     def collect_chunks(audio: np.ndarray, chunks: List[dict]) -> np.ndarray:
-        """Collects and concatenates audio chunks."""
+        """Collects and concatenates audio chunks. A single chunk is returned as a view of the audio."""
         if not chunks:
             return np.array([], dtype=np.float32)
+        if len(chunks) == 1:
+            return audio[chunks[0]["start"]: chunks[0]["end"]]
 
         return np.concatenate([audio[chunk["start"]: chunk["end"]] for chunk in chunks])
 
+    @staticmethod
+    def split_speech_chunks(chunks: List[dict], num_shards: int) -> List[List[dict]]:
+        """
+        Split speech chunks into at most `num_shards` contiguous groups with balanced speech duration.
+        Every group contains at least one chunk, so the audio is only ever split at the chunk boundaries.
+        """
+        if not chunks:
+            return []
+
+        num_shards = max(1, min(num_shards, len(chunks)))
+        total_samples = sum(chunk["end"] - chunk["start"] for chunk in chunks)
+
+        shards = []
+        current_shard = []
+        accumulated_samples = 0
+        for i, chunk in enumerate(chunks):
+            chunk_samples = chunk["end"] - chunk["start"]
+            remaining_shards = num_shards - len(shards) - 1
+
+            if current_shard and remaining_shards > 0:
+                # Cut at the boundary closest to the target, leaving at least one chunk for each remaining shard
+                target_samples = total_samples * (len(shards) + 1) / num_shards
+                overshoot = accumulated_samples + chunk_samples - target_samples
+                undershoot = target_samples - accumulated_samples
+                if overshoot > undershoot or len(chunks) - i == remaining_shards:
+                    shards.append(current_shard)
+                    current_shard = []
+
+            current_shard.append(chunk)
+            accumulated_samples += chunk_samples
+
+        if current_shard:
+            shards.append(current_shard)
+        return shards
+
     @staticmethod
     def format_timestamp(
         seconds: float,
@@ -249,29 +350,79 @@ class SileroVAD:
         speech_chunks: List[dict],
         sampling_rate: Optional[int] = None,
     ) -> List[Segment]:
+        """
+        Restore the timestamps of the segments and their words in the audio after VAD to the original audio.
+        The times are gathered into arrays and mapped at once, with the same results as mapping each time with
+        `SpeechTimestampsMap`.
+
+        Parameters
+        ----------
+        segments: List[Segment]
+            Segments transcribed from the audio after VAD, updated in place
+        speech_chunks: List[dict]
+            Speech chunks that the audio after VAD was collected from
+        sampling_rate: Optional[int]
+            Sample rate of the speech chunks, the sample rate of VAD by default
+
+        Returns
+        ----------
+        List[Segment]
+            The segments with the restored timestamps
+        """
         if sampling_rate is None:
             sampling_rate = self.sampling_rate
 
         ts_map = SpeechTimestampsMap(speech_chunks, sampling_rate)
 
-        for segment in segments:
-            if segment.words:
-                words = []
-                for word in segment.words:
-                    # Ensure the word start and end times are resolved to the same chunk.
-                    middle = (word.start + word.end) / 2
-                    chunk_index = ts_map.get_chunk_index(middle)
-                    word.start = ts_map.get_original_time(word.start, chunk_index)
-                    word.end = ts_map.get_original_time(word.end, chunk_index)
-                    words.append(word)
-
-                segment.start = words[0].start
-                segment.end = words[-1].end
-                segment.words = words
-
-            else:
-                segment.start = ts_map.get_original_time(segment.start)
-                segment.end = ts_map.get_original_time(segment.end)
+        word_segments = [segment for segment in segments if segment.words]
+        plain_segments = [segment for segment in segments if not segment.words]
+        words = [word for segment in word_segments for word in segment.words]
+
+        if words:
+            starts = np.array([word.start for word in words], dtype=np.float64)
+            ends = np.array([word.end for word in words], dtype=np.float64)
+            # Ensure the word start and end times are resolved to the same chunk.
+            chunk_indices = self.get_chunk_indices(ts_map, (starts + ends) / 2)
+            starts = self.get_original_times(ts_map, starts, chunk_indices)
+            ends = self.get_original_times(ts_map, ends, chunk_indices)
+            for word, start, end in zip(words, starts, ends):
+                word.start = start
+                word.end = end
+
+            for segment in word_segments:
+                segment.start = segment.words[0].start
+                segment.end = segment.words[-1].end
+
+        if plain_segments:
+            starts = np.array([segment.start for segment in plain_segments], dtype=np.float64)
+            ends = np.array([segment.end for segment in plain_segments], dtype=np.float64)
+            starts = self.get_original_times(ts_map, starts, self.get_chunk_indices(ts_map, starts))
+            ends = self.get_original_times(ts_map, ends, self.get_chunk_indices(ts_map, ends))
+            for segment, start, end in zip(plain_segments, starts, ends):
+                segment.start = start
+                segment.end = end
 
         return segments
 
+    @staticmethod
+    def get_chunk_indices(ts_map: SpeechTimestampsMap, times: np.ndarray) -> np.ndarray:
+        """Vectorized `SpeechTimestampsMap.get_chunk_index()`"""
+        samples = (times * ts_map.sampling_rate).astype(np.int64)
+        chunk_indices = np.searchsorted(np.asarray(ts_map.chunk_end_sample), samples, side="right")
+        return np.minimum(chunk_indices, len(ts_map.chunk_end_sample) - 1)
+
+    @staticmethod
+    def get_original_times(ts_map: SpeechTimestampsMap,
+                           times: np.ndarray,
+                           chunk_indices: np.ndarray) -> List[float]:
+        """
+        Vectorized `SpeechTimestampsMap.get_original_time()`, rounded the same as the built-in `round()`.
+        `np.round()` scales the times before rounding them, which can round the times close to halfway to the other
+        side, so those are rounded with the built-in `round()`.
+        """
+        original_times = np.asarray(ts_map.total_silence_before, dtype=np.float64)[chunk_indices] + times
+        scaled = original_times * 10 ** ts_map.time_precision
+        rounded = np.round(scaled) / 10 ** ts_map.time_precision
+        near_halfway = np.flatnonzero(np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) < 1e-6)
+        rounded[near_halfway] = [round(time, ts_map.time_precision) for time in original_times[near_halfway].tolist()]
+        return rounded.tolist()
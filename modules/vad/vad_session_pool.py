@@ -0,0 +1,94 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Generator
+
+from faster_whisper.utils import get_assets_path
+
+
+class SileroVADSession:
+    """
+    ONNX sessions of the Silero VAD encoder and decoder, the same model as `faster_whisper.vad.SileroVADModel` but
+    with the given number of the intra-op threads instead of a single thread.
+    """
+
+    def __init__(self, intra_op_num_threads: int = 1):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise RuntimeError(
+                "Applying the VAD filter requires the onnxruntime package"
+            ) from e
+
+        opts = onnxruntime.SessionOptions()
+        opts.inter_op_num_threads = 1
+        opts.intra_op_num_threads = intra_op_num_threads
+        opts.enable_cpu_mem_arena = False
+        opts.log_severity_level = 4
+
+        self.encoder_session = onnxruntime.InferenceSession(
+            os.path.join(get_assets_path(), "silero_encoder_v5.onnx"),
+            providers=["CPUExecutionProvider"],
+            sess_options=opts,
+        )
+        self.decoder_session = onnxruntime.InferenceSession(
+            os.path.join(get_assets_path(), "silero_decoder_v5.onnx"),
+            providers=["CPUExecutionProvider"],
+            sess_options=opts,
+        )
+
+
+class VadSessionPool:
+    """
+    Pool of Silero VAD sessions for concurrent VAD calls. Each call checks out a session of its own with `checkout()`
+    instead of sharing one session, and waits for a session to be returned when all of them are checked out.
+    The sessions are created on the first checkouts that need them.
+    """
+
+    def __init__(self,
+                 num_sessions: int = 1,
+                 intra_op_num_threads: int = 0):
+        """
+        Parameters
+        ----------
+        num_sessions: int
+            Number of the sessions, which is the number of the VAD calls that run in parallel
+        intra_op_num_threads: int
+            Number of the threads of each session. 0 divides the CPU cores between the sessions, so the sessions
+            running in parallel don't oversubscribe the cores.
+        """
+        self.num_sessions = max(1, num_sessions)
+        self.intra_op_num_threads = intra_op_num_threads or max(1, (os.cpu_count() or 1) // self.num_sessions)
+        self._idle_sessions: "queue.LifoQueue[SileroVADSession]" = queue.LifoQueue()
+        self._num_created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def checkout(self) -> Generator[SileroVADSession, None, None]:
+        """Check out a session for the duration of the context, and return it to the pool afterwards"""
+        session = self._acquire()
+        try:
+            yield session
+        finally:
+            self._idle_sessions.put(session)
+
+    def _acquire(self) -> SileroVADSession:
+        try:
+            return self._idle_sessions.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._num_created < self.num_sessions
+            if can_create:
+                self._num_created += 1
+        if not can_create:
+            return self._idle_sessions.get()
+
+        try:
+            return SileroVADSession(self.intra_op_num_threads)
+        except Exception:
+            with self._lock:
+                self._num_created -= 1
+            raise
@@ -0,0 +1,301 @@
+import bisect
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+from faster_whisper.vad import VadOptions
+
+from modules.utils.audio_manager import to_float32
+
+# Number of the windows that the encoder runs at once, same as faster-whisper
+ENCODER_BATCH_SIZE = 10000
+# The fast mode runs the model on every other window, which is the half of the windows per second of audio
+FAST_MODE_WINDOW_STRIDE = 2
+
+
+def get_true_runs(mask: np.ndarray) -> Tuple[List[int], List[int]]:
+    """Run-length encoding of the mask, the start and end indices of the runs of True"""
+    padded = np.concatenate(([False], mask, [False]))
+    changes = np.flatnonzero(padded[1:] != padded[:-1])
+    return changes[0::2].tolist(), changes[1::2].tolist()
+
+
+def get_next_true_index(runs: Tuple[List[int], List[int]], index: int, default: int) -> int:
+    """Index of the first True at or after the index, from the runs of `get_true_runs()`, `default` if there's none"""
+    starts, ends = runs
+    run = bisect.bisect_right(ends, index)
+    return max(index, starts[run]) if run < len(starts) else default
+
+
+def pad_speech_chunk(previous: Optional[dict],
+                     speech: dict,
+                     following: Optional[dict],
+                     speech_pad_samples: float,
+                     audio_length_samples: int) -> dict:
+    """
+    Pad the speech chunk with the rules of Silero VAD. The padding only depends on the unpadded neighboring chunks,
+    a silence shorter than two paddings is split in the middle.
+    """
+    start = speech["start"]
+    silence_before = start - previous["end"] if previous is not None else None
+    if silence_before is not None and silence_before < 2 * speech_pad_samples:
+        start = int(max(0, start - silence_before // 2))
+    else:
+        start = int(max(0, start - speech_pad_samples))
+
+    end = speech["end"]
+    silence_after = following["start"] - end if following is not None else None
+    if silence_after is not None and silence_after < 2 * speech_pad_samples:
+        end += int(silence_after // 2)
+    else:
+        end = int(min(audio_length_samples, end + speech_pad_samples))
+    return {"start": start, "end": end}
+
+
+class StreamingSileroModel:
+    """
+    Runs the Silero VAD model on the audio block by block, carrying the context samples of the previous window and
+    the decoder state across the blocks. The probabilities are the same as running the model on the whole audio at
+    once, while only a block of the audio is held in float32.
+
+    With `window_stride` above 1, the model only runs on the first window of every `window_stride` windows, with the
+    context samples right before it, and its probability is used for the skipped windows. The probabilities keep one
+    value per window, so the speech chunks are still in the samples of the audio.
+    """
+
+    def __init__(self,
+                 model,
+                 window_size_samples: int = 512,
+                 context_size_samples: int = 64,
+                 window_stride: int = 1):
+        self.model = model
+        self.window_size_samples = window_size_samples
+        self.context_size_samples = context_size_samples
+        self.window_stride = window_stride
+        self.state = np.zeros((2, 1, 128), dtype=np.float32)
+        self.context = np.zeros(context_size_samples, dtype=np.float32)
+        self.pending = np.zeros(0, dtype=np.float32)
+
+    def __call__(self, audio: np.ndarray) -> np.ndarray:
+        """Feed the samples and get the speech probabilities of the windows completed by them"""
+        audio = np.concatenate([self.pending, to_float32(audio)]) if len(self.pending) else to_float32(audio)
+        num_samples = len(audio) - len(audio) % (self.window_size_samples * self.window_stride)
+        self.pending = np.array(audio[num_samples:], dtype=np.float32)
+        return self._run(audio[:num_samples])
+
+    def flush(self) -> np.ndarray:
+        """
+        Get the speech probabilities of the last window, padded with zeros. Like running the whole audio at once,
+        a full window of zeros is added if the audio ends at a window boundary, and the last context-size samples
+        of the last window are zeroed.
+        """
+        padded = np.zeros(len(self.pending) - len(self.pending) % self.window_size_samples + self.window_size_samples,
+                          dtype=np.float32)
+        padded[:len(self.pending)] = self.pending
+        padded[-self.context_size_samples:] = 0
+        self.pending = np.zeros(0, dtype=np.float32)
+        return self._run(padded)
+
+    def _run(self, audio: np.ndarray) -> np.ndarray:
+        windows = audio.reshape(-1, self.window_size_samples)
+        if not len(windows):
+            return np.zeros(0, dtype=np.float32)
+
+        contexts = np.concatenate([self.context[None], windows[:-1, -self.context_size_samples:]])
+        self.context = np.array(windows[-1, -self.context_size_samples:])
+        inputs = np.concatenate([contexts[::self.window_stride], windows[::self.window_stride]], axis=1)
+
+        speech_probs = np.empty(len(inputs), dtype=np.float32)
+        for start in range(0, len(inputs), ENCODER_BATCH_SIZE):
+            encoder_output = self.model.encoder_session.run(
+                None, {"input": inputs[start:start + ENCODER_BATCH_SIZE]}
+            )[0].reshape(-1, 128)
+            for i, window in enumerate(encoder_output):
+                out, self.state = self.model.decoder_session.run(
+                    None, {"input": window[None], "state": self.state}
+                )
+                speech_probs[start + i] = out.reshape(-1)[0]
+        if self.window_stride > 1:
+            speech_probs = np.repeat(speech_probs, self.window_stride)[:len(windows)]
+        return speech_probs
+
+
+class SpeechSegmenter:
+    """
+    Hysteresis, minimum silence and maximum speech rules of Silero VAD over the speech probabilities, which can be
+    fed by blocks. The chunks are unpadded, see `pad_speech_chunk()`.
+
+    The rules only change their state at a few windows, such as the first window above the threshold or the window
+    where a silence becomes long enough. The windows of a block are thresholded at once with NumPy, and the loop jumps
+    between those windows with the runs of the speech and silence windows instead of visiting every window.
+    The chunks are the same as visiting every window.
+    """
+
+    def __init__(self,
+                 vad_options: VadOptions,
+                 sampling_rate: int = 16000,
+                 window_size_samples: int = 512):
+        self.window_size_samples = window_size_samples
+        self.threshold = vad_options.threshold
+        self.neg_threshold = vad_options.neg_threshold
+        if self.neg_threshold is None:
+            self.neg_threshold = max(self.threshold - 0.15, 0.01)
+        self.speech_pad_samples = sampling_rate * vad_options.speech_pad_ms / 1000
+        self.min_speech_samples = sampling_rate * vad_options.min_speech_duration_ms / 1000
+        self.max_speech_samples = (
+                sampling_rate * vad_options.max_speech_duration_s
+                - window_size_samples
+                - 2 * self.speech_pad_samples
+        )
+        self.min_silence_samples = sampling_rate * vad_options.min_silence_duration_ms / 1000
+        self.min_silence_samples_at_max_speech = sampling_rate * 98 / 1000
+
+        self.speeches: List[dict] = []
+        self.num_windows = 0
+        self.triggered = False
+        self.current_speech = {}
+        # to save potential segment end (and tolerate some silence)
+        self.temp_end = 0
+        # to save potential segment limits in case of maximum segment size reached
+        self.prev_end = self.next_start = 0
+
+    @property
+    def next_speech_start_bound(self) -> int:
+        """Sample that the start of any speech chunk not in `speeches` yet is at or after"""
+        if self.triggered:
+            return self.current_speech["start"]
+        return self.num_windows * self.window_size_samples
+
+    def feed(self, speech_probs: np.ndarray):
+        """Run the rules on the probabilities of the next windows, the finished chunks are added to `speeches`"""
+        speech_probs = np.asarray(speech_probs).reshape(-1)
+        offset = self.num_windows
+        num_windows = offset + len(speech_probs)
+        window_size_samples = self.window_size_samples
+        max_speech_samples = self.max_speech_samples
+        min_silence_samples = self.min_silence_samples
+        min_silence_samples_at_max_speech = self.min_silence_samples_at_max_speech
+        min_speech_samples = self.min_speech_samples
+
+        is_speech = speech_probs >= self.threshold
+        is_silence = speech_probs < self.neg_threshold
+        speech_runs, silence_runs = get_true_runs(is_speech), get_true_runs(is_silence)
+
+        def next_speech(index: int) -> int:
+            return get_next_true_index(speech_runs, index - offset, num_windows - offset) + offset
+
+        def next_silence(index: int) -> int:
+            return get_next_true_index(silence_runs, index - offset, num_windows - offset) + offset
+
+        def window_before(samples: float) -> int:
+            """Index of a window that starts before the windows starting at `samples` or later, or `num_windows`"""
+            if not math.isfinite(samples):
+                return num_windows
+            return min(num_windows, max(0, math.floor(samples / window_size_samples)))
+
+        speeches = self.speeches
+        triggered, current_speech = self.triggered, self.current_speech
+        temp_end, prev_end, next_start = self.temp_end, self.prev_end, self.next_start
+
+        i = offset
+        while i < num_windows:
+            # Jump to the next window that may change the state
+            if not triggered:
+                i = next_speech(i)
+            else:
+                candidates = [max(i, window_before(current_speech["start"] + max_speech_samples))]
+                if temp_end:
+                    candidates.append(next_speech(i))
+                    if prev_end != temp_end:
+                        prev_end_window = window_before(temp_end + min_silence_samples_at_max_speech)
+                        candidates.append(next_silence(max(i, prev_end_window)))
+                    candidates.append(next_silence(max(i, window_before(temp_end + min_silence_samples))))
+                else:
+                    candidates.append(next_silence(i))
+                i = min(candidates)
+            if i >= num_windows:
+                break
+
+            window_start = window_size_samples * i
+            speech, silence = bool(is_speech[i - offset]), bool(is_silence[i - offset])
+            i += 1
+
+            if speech and temp_end:
+                temp_end = 0
+                if next_start < prev_end:
+                    next_start = window_start
+
+            if speech and not triggered:
+                triggered = True
+                current_speech["start"] = window_start
+                continue
+
+            if (
+                    triggered
+                    and window_start - current_speech["start"] > max_speech_samples
+            ):
+                if prev_end:
+                    current_speech["end"] = prev_end
+                    speeches.append(current_speech)
+                    current_speech = {}
+                    # previously reached silence (< neg_thres) and is still not speech (< thres)
+                    if next_start < prev_end:
+                        triggered = False
+                    else:
+                        current_speech["start"] = next_start
+                    prev_end = next_start = temp_end = 0
+                else:
+                    current_speech["end"] = window_start
+                    speeches.append(current_speech)
+                    current_speech = {}
+                    prev_end = next_start = temp_end = 0
+                    triggered = False
+                    continue
+
+            if silence and triggered:
+                if not temp_end:
+                    temp_end = window_start
+                # condition to avoid cutting in very short silence
+                if window_start - temp_end > min_silence_samples_at_max_speech:
+                    prev_end = temp_end
+                if window_start - temp_end < min_silence_samples:
+                    continue
+                else:
+                    current_speech["end"] = temp_end
+                    if (
+                            current_speech["end"] - current_speech["start"]
+                    ) > min_speech_samples:
+                        speeches.append(current_speech)
+                    current_speech = {}
+                    prev_end = next_start = temp_end = 0
+                    triggered = False
+                    continue
+
+        self.num_windows = num_windows
+        self.triggered, self.current_speech = triggered, current_speech
+        self.temp_end, self.prev_end, self.next_start = temp_end, prev_end, next_start
+
+    def finish(self, audio_length_samples: int):
+        """End the speech in progress at the end of the audio"""
+        if (
+                self.current_speech
+                and (audio_length_samples - self.current_speech["start"]) > self.min_speech_samples
+        ):
+            self.current_speech["end"] = audio_length_samples
+            self.speeches.append(self.current_speech)
+        self.current_speech = {}
+        self.triggered = False
+
+    def pad_speeches(self, audio_length_samples: int) -> List[dict]:
+        """Padded chunks of all the finished speeches"""
+        speeches = self.speeches
+        return [
+            pad_speech_chunk(
+                speeches[i - 1] if i > 0 else None,
+                speech,
+                speeches[i + 1] if i + 1 < len(speeches) else None,
+                self.speech_pad_samples,
+                audio_length_samples
+            )
+            for i, speech in enumerate(speeches)
+        ]
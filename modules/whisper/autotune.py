@@ -0,0 +1,193 @@
+import gc
+import os
+import platform
+import socket
+import threading
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import ctranslate2
+import numpy as np
+
+from modules.utils.files_manager import load_yaml, save_yaml
+from modules.utils.logger import get_logger
+from modules.utils.paths import AUTOTUNE_RESULTS_PATH, WEBUI_DIR
+
+logger = get_logger()
+
+AUTO_COMPUTE_TYPE = "auto"
+CALIBRATION_AUDIO_PATH = os.path.join(WEBUI_DIR, "tests", "jfk.wav")
+# Compute types in the order of preference when they're equally fast
+AUTOTUNE_COMPUTE_TYPES = ["int8", "int8_float32", "int8_float16", "int8_bfloat16", "float16", "bfloat16", "float32"]
+
+_results_lock = threading.Lock()
+
+
+@dataclass
+class AutotuneResult:
+    """Fastest settings of a model size on a host"""
+    compute_type: str
+    cpu_threads: int
+    rtf: float
+    tuned_at: str
+
+
+def get_host_key(device: str) -> str:
+    """Key of the host that the settings are tuned on, so the hosts sharing the results file keep their own settings"""
+    return f"{socket.gethostname()}-{platform.machine()}-{os.cpu_count()}cpu-{device}"
+
+
+def load_autotune_result(model_size: str,
+                         device: str,
+                         path: str = AUTOTUNE_RESULTS_PATH) -> Optional[AutotuneResult]:
+    """Load the tuned settings of the model size on this host, None if it's not tuned yet"""
+    with _results_lock:
+        results = load_yaml(path) if os.path.exists(path) else None
+    result = ((results or {}).get(get_host_key(device)) or {}).get(model_size)
+    return AutotuneResult(**result) if result else None
+
+
+def save_autotune_result(model_size: str,
+                         device: str,
+                         result: AutotuneResult,
+                         path: str = AUTOTUNE_RESULTS_PATH):
+    """Save the tuned settings of the model size on this host, keeping the results of the others"""
+    with _results_lock:
+        results = (load_yaml(path) if os.path.exists(path) else None) or {}
+        results.setdefault(get_host_key(device), {})[model_size] = asdict(result)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        save_yaml(results, path)
+
+
+def get_candidate_compute_types(device: str) -> List[str]:
+    """Compute types supported by CTranslate2 on the device, in the order of preference"""
+    supported = ctranslate2.get_supported_compute_types("cuda" if device == "cuda" else "cpu")
+    return [compute_type for compute_type in AUTOTUNE_COMPUTE_TYPES if compute_type in supported]
+
+
+def get_candidate_cpu_threads(device: str, num_workers: int = 1) -> List[int]:
+    """Thread counts of a worker to try, from all the cores shared by the workers down to a quarter of them"""
+    if device == "cuda":
+        return [0]
+    cores = max(1, (os.cpu_count() or 1) // max(1, num_workers))
+    return sorted({max(1, cores // 4), max(1, cores // 2), cores}, reverse=True)
+
+
+def get_calibration_audio(path: str = CALIBRATION_AUDIO_PATH,
+                          duration: float = 10,
+                          sample_rate: int = 16000) -> np.ndarray:
+    """Calibration clip for the autotune. Speech is read from `path`, otherwise a speech-like tone is synthesized."""
+    if path and os.path.exists(path):
+        from faster_whisper.audio import decode_audio
+        return decode_audio(path, sampling_rate=sample_rate)[:int(duration * sample_rate)]
+
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    phase = 2 * np.pi * np.cumsum(140 + 40 * np.sin(2 * np.pi * 0.5 * t)) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = np.clip(np.sin(2 * np.pi * 3 * t), 0, None)
+    return (0.1 * voiced * envelope).astype(np.float32)
+
+
+def measure_rtf(model_path: str,
+                device: str,
+                compute_type: str,
+                cpu_threads: int,
+                audio: np.ndarray,
+                download_root: Optional[str] = None,
+                local_files_only: bool = False,
+                repeats: int = 2) -> float:
+    """
+    Load the model with the settings and measure its real-time factor on the audio.
+    The first transcription warms up the model and isn't measured, the fastest of the `repeats` runs is reported.
+    """
+    import faster_whisper
+
+    model = faster_whisper.WhisperModel(
+        model_size_or_path=model_path,
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+        download_root=download_root,
+        local_files_only=local_files_only
+    )
+    try:
+        elapsed_times = []
+        for i in range(repeats + 1):
+            start_time = time.perf_counter()
+            segments, info = model.transcribe(audio, language="en", beam_size=5, vad_filter=False)
+            list(segments)
+            if i > 0:
+                elapsed_times.append(time.perf_counter() - start_time)
+        return min(elapsed_times) / (len(audio) / 16000)
+    finally:
+        del model
+        gc.collect()
+
+
+def autotune(model_path: str,
+             device: str,
+             audio: Optional[np.ndarray] = None,
+             num_workers: int = 1,
+             cpu_threads: int = 0,
+             download_root: Optional[str] = None,
+             local_files_only: bool = False,
+             measure: Callable[..., float] = measure_rtf) -> AutotuneResult:
+    """
+    Find the fastest compute type and thread count of the model on this host.
+    The compute types are compared with the most threads first, then the thread counts are compared with the fastest
+    compute type, so it loads the model `len(compute_types) + len(cpu_threads) - 1` times instead of for every pair.
+
+    Parameters
+    ----------
+    model_path: str
+        Model name or directory path to load with faster-whisper
+    device: str
+        Device to run the model on
+    audio: Optional[np.ndarray]
+        Calibration clip of 16kHz. See `get_calibration_audio()` for the default.
+    num_workers: int
+        Number of the workers of the model, the cores are shared by them
+    cpu_threads: int
+        Thread count of a worker to use as is. 0 tunes it too.
+    download_root: Optional[str]
+        Directory of the downloaded models
+    local_files_only: bool
+        Whether the model is already downloaded or not
+    measure: Callable[..., float]
+        Function that returns the real-time factor of the settings, with the same parameters as `measure_rtf()`
+
+    Returns
+    ----------
+    Fastest settings
+    """
+    audio = get_calibration_audio() if audio is None else audio
+    thread_candidates = [cpu_threads] if cpu_threads else get_candidate_cpu_threads(device, num_workers)
+
+    def try_settings(compute_type: str, threads: int) -> float:
+        try:
+            rtf = measure(model_path, device, compute_type, threads, audio,
+                          download_root=download_root, local_files_only=local_files_only)
+        except Exception as e:
+            logger.info(f"[Autotune] {compute_type} with {threads} threads failed: {e}")
+            return float("inf")
+        logger.info(f"[Autotune] {compute_type} with {threads} threads: RTF {rtf:.3f}")
+        return rtf
+
+    rtfs = {}
+    for compute_type in get_candidate_compute_types(device):
+        rtfs[(compute_type, thread_candidates[0])] = try_settings(compute_type, thread_candidates[0])
+    best_compute_type = min(rtfs, key=rtfs.get)[0]
+    for threads in thread_candidates[1:]:
+        rtfs[(best_compute_type, threads)] = try_settings(best_compute_type, threads)
+
+    (compute_type, threads), rtf = min(rtfs.items(), key=lambda item: item[1])
+    if rtf == float("inf"):
+        raise RuntimeError(f"None of the compute types could run the model \"{model_path}\" on {device}.")
+    return AutotuneResult(
+        compute_type=compute_type,
+        cpu_threads=threads,
+        rtf=rtf,
+        tuned_at=datetime.now().isoformat()
+    )
@@ -2,16 +2,20 @@ import os
 import whisper
 import ctranslate2
 import gradio as gr
-import torchaudio
 from abc import ABC, abstractmethod
-from typing import BinaryIO, Union, Tuple, List, Callable, TYPE_CHECKING, Optional, Dict, Any
+from typing import BinaryIO, Union, Tuple, List, Callable, TYPE_CHECKING, Optional, Dict, Any, Generator
 import numpy as np
 from datetime import datetime
 from faster_whisper.vad import VadOptions
 import gc
-from copy import deepcopy
+import math
 import time
+import threading
 from uuid import uuid4
+from contextlib import nullcontext
+from collections import OrderedDict
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 
 from modules.uvr.music_separator import MusicSeparator
 from modules.utils.paths import (WHISPER_MODELS_DIR, DIARIZATION_MODELS_DIR, OUTPUT_DIR, DEFAULT_PARAMETERS_CONFIG_PATH,
@@ -21,8 +25,16 @@ from modules.utils.logger import get_logger
 from modules.utils.subtitle_manager import *
 from modules.utils.youtube_manager import get_ytdata, get_ytaudio
 from modules.utils.files_manager import get_media_files, format_gradio_files, load_yaml, save_yaml, read_file
-from modules.utils.audio_manager import validate_audio
+from modules.utils.audio_manager import (validate_audio, get_audio_hash, DecodedAudio, LowMemoryOptions, decode_pcm,
+                                         to_float32)
+from modules.utils.disk_cache import DiskLRUCache
+from modules.utils.resampler import resample
+from modules.utils.model_registry import ModelRegistry, get_model_registry
+from modules.utils.profiler import PipelineProfiler, profile_stage
 from modules.whisper.data_classes import *
+from modules.whisper.pipeline_planner import PipelinePlanner, PipelinePlan
+from modules.whisper.incremental import (MAX_STATE_HEADS, IncrementalState, get_prefix_hash, find_matching_state,
+                                         find_stable_boundary, update_states)
 from modules.diarize.diarizer import Diarizer
 from modules.vad.silero_vad import SileroVAD
 
@@ -31,9 +43,24 @@ if TYPE_CHECKING:
 
 
 logger = get_logger()
+_cache_parameters_lock = threading.Lock()
+
+
+@dataclass
+class PreparedAudio:
+    """Audio that passed the pre-processing stages of the pipeline, ready to be transcribed"""
+    params: TranscriptionPipelineParams
+    audio: np.ndarray
+    origin_audio: DecodedAudio
+    speech_chunks: Optional[List[dict]]
+    audio_hash: Optional[str] = None
+    elapsed_time: float = 0
+    plan: Optional[PipelinePlan] = None
 
 
 class BaseTranscriptionPipeline(ABC):
+    stage_cache_excluded_fields = {"enable_offload", "save_file", "hf_token"}
+
     def __init__(self,
                  model_dir: str = WHISPER_MODELS_DIR,
                  diarization_model_dir: str = DIARIZATION_MODELS_DIR,
@@ -54,6 +81,7 @@ class BaseTranscriptionPipeline(ABC):
         )
 
         self.model = None
+        self.registry_key = ModelRegistry.make_key(self, "whisper")
         self.current_model_size = None
         self.available_models = whisper.available_models()
         self.available_langs = sorted(list(whisper.tokenizer.LANGUAGES.values()))
@@ -61,6 +89,13 @@ class BaseTranscriptionPipeline(ABC):
         self.available_compute_types = self.get_available_compute_type()
         self.current_compute_type = self.get_compute_type()
         self.text_corrector: Optional["TextCorrectionRAG"] = None
+        self.stage_cache: Optional[DiskLRUCache] = None
+        self.draft_pipeline: Optional["BaseTranscriptionPipeline"] = None
+        self.planner: Optional[PipelinePlanner] = None
+        self.low_memory: Optional[LowMemoryOptions] = None
+        # States of the incremental transcription, used when the stage cache is not registered
+        self.incremental_states: "OrderedDict[str, List[IncrementalState]]" = OrderedDict()
+        self._incremental_states_lock = threading.Lock()
 
     @staticmethod
     def _normalize_progress(progress):
@@ -78,6 +113,41 @@ class BaseTranscriptionPipeline(ABC):
     def register_text_corrector(self, corrector: "TextCorrectionRAG"):
         self.text_corrector = corrector
 
+    def register_stage_cache(self, cache: Optional[DiskLRUCache]):
+        """
+        Register a cache to memoize the results of each stage (BGM separation, VAD, transcription and diarization)
+        by the audio content and the parameters of the stage, so re-running the same audio skips the finished stages.
+        The speech probabilities of VAD are cached in it too, so VAD with other parameters doesn't re-run the model.
+        """
+        self.stage_cache = cache
+        self.vad.register_probs_cache(cache)
+
+    def register_draft_pipeline(self, pipeline: Optional["BaseTranscriptionPipeline"]):
+        """
+        Register the pipeline that drafts the transcription with the small model in the cascade.
+        If it's not registered, a pipeline of the same implementation is created when the cascade is first used.
+        """
+        self.draft_pipeline = pipeline
+
+    def register_planner(self, planner: Optional[PipelinePlanner]):
+        """
+        Register the planner that analyzes the decoded audio and turns off the stages it doesn't need, such as the
+        transcription of a silent audio or the BGM separation of an audio without music.
+        """
+        self.planner = planner
+
+    def register_low_memory(self, options: Optional[LowMemoryOptions]):
+        """
+        Register the options of the low-memory mode for long archives. The audio is kept as int16 PCM, on the disk
+        above the memmap threshold, and converted to float32 only per VAD block and per transcription window.
+        """
+        self.low_memory = options
+
+    def get_draft_pipeline(self) -> "BaseTranscriptionPipeline":
+        if self.draft_pipeline is None:
+            self.draft_pipeline = type(self)(model_dir=self.model_dir, output_dir=self.output_dir)
+        return self.draft_pipeline
+
     @abstractmethod
     def transcribe(self,
                    audio: Union[str, BinaryIO, np.ndarray],
@@ -98,12 +168,16 @@ class BaseTranscriptionPipeline(ABC):
         pass
 
     def run(self,
-            audio: Union[str, BinaryIO, np.ndarray],
+            audio: Union[str, BinaryIO, np.ndarray, DecodedAudio],
             progress: gr.Progress = gr.Progress(),
             file_format: str = "SRT",
             add_timestamp: bool = True,
             progress_callback: Optional[Callable] = None,
             *pipeline_params,
+            num_shards: int = 1,
+            profiler: Optional[PipelineProfiler] = None,
+            params: Optional[TranscriptionPipelineParams] = None,
+            cascade_params: Optional[CascadeParams] = None,
             ) -> Tuple[List[Segment], float]:
         """
         Run transcription with conditional pre-processing and post-processing.
@@ -113,8 +187,8 @@ class BaseTranscriptionPipeline(ABC):
 
         Parameters
         ----------
-        audio: Union[str, BinaryIO, np.ndarray]
-            Audio input. This can be file path or binary type.
+        audio: Union[str, BinaryIO, np.ndarray, DecodedAudio]
+            Audio input. This can be file path or binary type. It's decoded only once and shared by all the stages.
         progress: gr.Progress
             Indicator to show progress directly in gradio.
         file_format: str
@@ -128,6 +202,20 @@ class BaseTranscriptionPipeline(ABC):
             Parameters for the transcription pipeline. This will be dealt with "TranscriptionPipelineParams" data class.
             This must be provided as a List with * wildcard because of the integration with gradio.
             See more info at : https://github.com/gradio-app/gradio/issues/2471
+        num_shards: int
+            Number of shards to split the audio into along the VAD boundaries. When it's larger than 1, the shards are
+            transcribed in parallel with `transcribe_sharded()`, which is useful for long audio on CPU.
+            Otherwise, if the VAD is enabled and `WhisperParams.batch_size` is larger than 1, the speech chunks are
+            decoded as a batch with `transcribe_batched()` when the implementation supports it.
+        profiler: Optional[PipelineProfiler]
+            Profiler to record the time and the memory of each stage (decoding, BGM separation, VAD, transcription and
+            diarization) with. The audio duration is set to it to compute the real-time factor.
+        params: Optional[TranscriptionPipelineParams]
+            Parameters to run the pipeline with, instead of the defaults. Unlike `*pipeline_params`, these are not
+            mapped from the gradio components, so they can be used to run the pipeline from code.
+        cascade_params: Optional[CascadeParams]
+            If the cascade is enabled, the audio is transcribed with the draft model first and only the segments that
+            fail the confidence thresholds are re-decoded with the main model. See `_transcribe_cascade()`.
 
         Returns
         ----------
@@ -136,62 +224,641 @@ class BaseTranscriptionPipeline(ABC):
         elapsed_time: float
             elapsed time for running
         """
-        start_time = time.time()
+        progress = self._normalize_progress(progress)
 
-        if not validate_audio(audio):
+        prepared = self.prepare(audio, progress, profiler=profiler, params=params)
+        if prepared is None:
             return [Segment()], 0
 
+        return self.run_prepared(
+            prepared,
+            progress,
+            file_format,
+            add_timestamp,
+            progress_callback,
+            num_shards=num_shards,
+            profiler=profiler,
+            cascade_params=cascade_params
+        )
+
+    def prepare(self,
+                audio: Union[str, BinaryIO, np.ndarray, DecodedAudio],
+                progress: gr.Progress = gr.Progress(),
+                *,
+                profiler: Optional[PipelineProfiler] = None,
+                params: Optional[TranscriptionPipelineParams] = None,
+                ) -> Optional[PreparedAudio]:
+        """
+        Validate and decode the audio, then run the pre-processing stages (BGM separation and VAD) of the pipeline.
+        This is separated from `run_prepared()` so the next audio can be prepared while the current one is transcribed.
+
+        Parameters
+        ----------
+        audio: Union[str, BinaryIO, np.ndarray, DecodedAudio]
+            Audio input. This can be file path or binary type.
+        progress: gr.Progress
+            Indicator to show progress directly in gradio.
+        profiler: Optional[PipelineProfiler]
+            Profiler to record the pre-processing stages with.
+        params: Optional[TranscriptionPipelineParams]
+            Parameters to run the pipeline with. The defaults are used if it's None.
+
+        Returns
+        ----------
+        Pre-processed audio to pass to `run_prepared()`, None if the audio is not valid.
+        If a planner is registered, the parameters are adjusted by its plan, see `register_planner()`.
+        """
+        start_time = time.time()
+
+        with profile_stage(profiler, "decode"):
+            if not validate_audio(audio):
+                return None
+            audio = DecodedAudio.from_source(audio, sample_rate=self.vad.sampling_rate, low_memory=self.low_memory)
+        if profiler is not None:
+            profiler.set_audio_duration(audio.duration)
+
         progress = self._normalize_progress(progress)
 
         # 使用默认参数，忽略前端传入，避免参数映射错误
-        params = TranscriptionPipelineParams()
+        params = TranscriptionPipelineParams() if params is None else params.model_copy(deep=True)
         params = self.validate_gradio_values(params)
-        bgm_params, vad_params, whisper_params, diarization_params = params.bgm_separation, params.vad, params.whisper, params.diarization
 
-        if bgm_params.is_separate_bgm:
-            music, audio, _ = self.music_separator.separate(
-                audio=audio,
-                model_name=bgm_params.uvr_model_size,
-                device=bgm_params.uvr_device,
-                segment_size=bgm_params.segment_size,
-                save_file=bgm_params.save_file,
-                progress=progress
+        plan = None
+        if self.planner is not None:
+            with profile_stage(profiler, "analysis"):
+                plan = self.planner.plan(audio, params)
+            params = self.planner.apply(plan, params)
+            if not plan.transcribe:
+                return PreparedAudio(
+                    params=params,
+                    audio=np.array([], dtype=np.float32),
+                    origin_audio=audio,
+                    speech_chunks=[],
+                    elapsed_time=time.time() - start_time,
+                    plan=plan
+                )
+        bgm_params, vad_params = params.bgm_separation, params.vad
+
+        audio_hash = self.get_source_hash(audio, bgm_params) if self.stage_cache is not None else None
+        audio, origin_audio, speech_chunks = self._preprocess_audio(
+            audio=audio,
+            bgm_params=bgm_params,
+            vad_params=vad_params,
+            progress=progress,
+            audio_hash=audio_hash,
+            profiler=profiler
+        )
+
+        return PreparedAudio(
+            params=params,
+            audio=audio,
+            origin_audio=origin_audio,
+            speech_chunks=speech_chunks,
+            audio_hash=audio_hash,
+            elapsed_time=time.time() - start_time,
+            plan=plan
+        )
+
+    def run_prepared(self,
+                     prepared: PreparedAudio,
+                     progress: gr.Progress = gr.Progress(),
+                     file_format: str = "SRT",
+                     add_timestamp: bool = True,
+                     progress_callback: Optional[Callable] = None,
+                     *,
+                     num_shards: int = 1,
+                     profiler: Optional[PipelineProfiler] = None,
+                     cascade_params: Optional[CascadeParams] = None,
+                     ) -> Tuple[List[Segment], float]:
+        """
+        Run the transcription and the post-processing of the audio from `prepare()`.
+        See `run()` for the parameters. The returned elapsed time includes the time to prepare the audio.
+        """
+        start_time = time.time()
+        progress = self._normalize_progress(progress)
+
+        params, audio_hash = prepared.params, prepared.audio_hash
+        audio, origin_audio, speech_chunks = prepared.audio, prepared.origin_audio, prepared.speech_chunks
+        vad_params, whisper_params, diarization_params = params.vad, params.whisper, params.diarization
+
+        if cascade_params is not None and not cascade_params.enable_cascade:
+            cascade_params = None
+        if prepared.plan is not None and num_shards == 1:
+            num_shards = prepared.plan.num_shards
+
+        whisper_key = None
+        if audio_hash is not None:
+            whisper_key = self.get_stage_key(
+                audio_hash, vad_params if vad_params.vad_filter else None, whisper_params, num_shards, cascade_params
             )
+        with profile_stage(profiler, "transcription"):
+            result = self.stage_cache.get(whisper_key) if whisper_key is not None else None
+
+            if speech_chunks is not None and not speech_chunks:
+                logger.info("No speech is detected in the audio, skipping the transcription.")
+                result = []
+            elif result is None and cascade_params is not None:
+                result = self._transcribe_cascade(
+                    audio=audio,
+                    origin_audio=origin_audio,
+                    speech_chunks=speech_chunks,
+                    whisper_params=whisper_params,
+                    cascade_params=cascade_params,
+                    progress=progress,
+                    progress_callback=progress_callback,
+                    num_shards=num_shards
+                )
+                if whisper_key is not None:
+                    self.stage_cache.put(whisper_key, result)
+            elif result is None:
+                with get_model_registry().use(self.registry_key):
+                    result = self._transcribe_preprocessed(
+                        audio=audio,
+                        origin_audio=origin_audio,
+                        speech_chunks=speech_chunks,
+                        whisper_params=whisper_params,
+                        progress=progress,
+                        progress_callback=progress_callback,
+                        num_shards=num_shards
+                    )
+                if get_model_registry().should_offload(whisper_params.enable_offload):
+                    self.offload()
+                if whisper_key is not None:
+                    self.stage_cache.put(whisper_key, result)
 
-            if audio.ndim >= 2:
-                audio = audio.mean(axis=1)
-                if self.music_separator.audio_info is None:
-                    origin_sample_rate = 16000
-                else:
-                    origin_sample_rate = self.music_separator.audio_info.sample_rate
-                audio = self.resample_audio(audio=audio, original_sample_rate=origin_sample_rate)
+        if result and diarization_params.is_diarize:
+            progress(0.99, desc="Diarizing speakers..")
+            with profile_stage(profiler, "diarization"):
+                result, elapsed_time_diarization = self._diarize(
+                    audio=origin_audio,
+                    segments=result,
+                    diarization_params=diarization_params,
+                    audio_hash=audio_hash
+                )
 
-            if bgm_params.enable_offload:
-                self.music_separator.offload()
-            elapsed_time_bgm_sep = time.time() - start_time
+        self.cache_parameters(
+            params=params,
+            file_format=file_format,
+            add_timestamp=add_timestamp
+        )
 
-        origin_audio = deepcopy(audio)
+        if not result:
+            logger.info(f"Whisper did not detected any speech segments in the audio.")
+            result = [Segment()]
 
-        if vad_params.vad_filter:
-            progress(0, desc="Filtering silent parts from audio..")
-            vad_options = VadOptions(
-                threshold=vad_params.threshold,
-                min_speech_duration_ms=vad_params.min_speech_duration_ms,
-                max_speech_duration_s=vad_params.max_speech_duration_s,
-                min_silence_duration_ms=vad_params.min_silence_duration_ms,
-                speech_pad_ms=vad_params.speech_pad_ms
+        progress(1.0, desc="Finished.")
+        total_elapsed_time = prepared.elapsed_time + time.time() - start_time
+        return result, total_elapsed_time
+
+    def run_incremental(self,
+                        audio: Union[str, BinaryIO, np.ndarray, DecodedAudio],
+                        progress: gr.Progress = gr.Progress(),
+                        file_format: str = "SRT",
+                        add_timestamp: bool = True,
+                        progress_callback: Optional[Callable] = None,
+                        *,
+                        incremental_params: IncrementalParams,
+                        profiler: Optional[PipelineProfiler] = None,
+                        params: Optional[TranscriptionPipelineParams] = None,
+                        ) -> Tuple[List[Segment], float]:
+        """
+        Transcribe a recording that grows between the uploads, such as a meeting that is re-uploaded while it's
+        recorded. If the audio starts with the finalized prefix of a previous upload, the segments of the prefix are
+        reused and only the tail after it is decoded, so the cost of an update scales with the new audio.
+
+        The prefix is finalized up to the last stable boundary, a silence between the VAD speech chunks that no segment
+        spans and that is at least `stable_margin_s` before the end of the audio. The segments after it are decoded
+        again with the next upload, since the recording may continue the speech there. The uploads are matched by the
+        hash of the decoded audio, so a re-encoded recording is transcribed from scratch.
+        The diarization, if enabled, runs on the whole audio with the merged segments.
+
+        Parameters
+        ----------
+        incremental_params: IncrementalParams
+            Parameters of the incremental transcription
+        See `run()` for the other parameters.
+
+        Returns
+        ----------
+        segments_result: List[Segment]
+            Finalized segments of the previous uploads followed by the segments of the new tail
+        elapsed_time: float
+            elapsed time for running
+        """
+        start_time = time.time()
+        progress = self._normalize_progress(progress)
+
+        with profile_stage(profiler, "decode"):
+            if not validate_audio(audio):
+                return [Segment()], 0
+            audio = DecodedAudio.from_source(audio, sample_rate=self.vad.sampling_rate, low_memory=self.low_memory)
+        if profiler is not None:
+            profiler.set_audio_duration(audio.duration)
+
+        params = TranscriptionPipelineParams() if params is None else params.model_copy(deep=True)
+        pcm, sample_rate = audio.pcm, audio.sample_rate
+        head_samples = int(incremental_params.head_duration_s * sample_rate)
+
+        state_key, states, previous = None, [], None
+        if len(pcm) > head_samples:
+            state_key = self.get_stage_key(
+                get_prefix_hash(pcm, head_samples), "incremental", params.whisper, params.vad, params.bgm_separation
             )
+            states = self._get_incremental_states(state_key)
+            previous = find_matching_state(states, pcm)
+
+        offset = previous.stable_end if previous is not None else 0
+        finalized = [segment.model_copy(deep=True) for segment in previous.segments] if previous is not None else []
+        if previous is not None:
+            logger.info(f"Reusing the transcription of the first {offset / sample_rate:.1f}s, "
+                        f"decoding the new {(len(pcm) - offset) / sample_rate:.1f}s.")
+
+        tail_segments, speech_chunks = [], []
+        if offset < len(pcm):
+            tail_params = params.model_copy(deep=True)
+            tail_params.diarization.is_diarize = False
+            prepared = self.prepare(
+                DecodedAudio(pcm=pcm[offset:], sample_rate=sample_rate), progress, profiler=profiler,
+                params=tail_params
+            )
+            tail_segments, _ = self.run_prepared(prepared, progress, file_format, add_timestamp, progress_callback,
+                                                 profiler=profiler)
+            tail_segments = [segment for segment in tail_segments if segment.text is not None]
+            if offset > 0:
+                tail_segments = self.vad.restore_speech_timestamps(
+                    segments=tail_segments,
+                    speech_chunks=[{"start": offset, "end": len(pcm)}],
+                    sampling_rate=sample_rate
+                )
+            speech_chunks = prepared.speech_chunks
+            if speech_chunks is None and state_key is not None:
+                with profile_stage(profiler, "vad"):
+                    speech_chunks = self.vad.get_speech_timestamps(prepared.origin_audio.pcm)
 
-            vad_processed, speech_chunks = self.vad.run(
-                audio=audio,
-                vad_parameters=vad_options,
-                progress=progress
+        if state_key is not None:
+            boundary = offset + find_stable_boundary(
+                speech_chunks=speech_chunks,
+                segments=[segment.model_copy(update={"start": segment.start - offset / sample_rate,
+                                                     "end": segment.end - offset / sample_rate})
+                          for segment in tail_segments],
+                num_samples=len(pcm) - offset,
+                sample_rate=sample_rate,
+                stable_margin_s=incremental_params.stable_margin_s
             )
+            state = IncrementalState(
+                stable_end=boundary,
+                prefix_hash=get_prefix_hash(pcm, boundary),
+                segments=finalized + [segment for segment in tail_segments if segment.end * sample_rate <= boundary]
+            )
+            self._update_incremental_states(state_key, previous, state)
 
-            if vad_processed.size > 0:
-                audio = vad_processed
-            else:
-                vad_params.vad_filter = False
+        result = finalized + tail_segments
+        for i, segment in enumerate(result):
+            segment.id = i + 1
+
+        if result and params.diarization.is_diarize:
+            progress(0.99, desc="Diarizing speakers..")
+            with profile_stage(profiler, "diarization"):
+                result, elapsed_time_diarization = self._diarize(
+                    audio=audio,
+                    segments=result,
+                    diarization_params=params.diarization,
+                    audio_hash=audio.source_hash if self.stage_cache is not None else None
+                )
+
+        if not result:
+            result = [Segment()]
+        return result, time.time() - start_time
+
+    def _get_incremental_states(self, key: str) -> List[IncrementalState]:
+        with self._incremental_states_lock:
+            if self.stage_cache is not None:
+                return self.stage_cache.get(key) or []
+            if key not in self.incremental_states:
+                return []
+            self.incremental_states.move_to_end(key)
+            return list(self.incremental_states[key])
+
+    def _update_incremental_states(self,
+                                   key: str,
+                                   previous: Optional[IncrementalState],
+                                   state: IncrementalState):
+        """
+        Replace the state of the previous upload with the new one. The states are read again under the lock, so the
+        states that the concurrent uploads of the same head have stored in the meantime are kept.
+        """
+        with self._incremental_states_lock:
+            if self.stage_cache is not None:
+                self.stage_cache.put(key, update_states(self.stage_cache.get(key) or [], previous, state))
+                return
+
+            self.incremental_states[key] = update_states(self.incremental_states.get(key, []), previous, state)
+            self.incremental_states.move_to_end(key)
+            while len(self.incremental_states) > MAX_STATE_HEADS:
+                self.incremental_states.popitem(last=False)
+
+    def run_stream(self,
+                   audio: Union[str, BinaryIO, np.ndarray, DecodedAudio],
+                   progress: gr.Progress = gr.Progress(),
+                   file_format: str = "SRT",
+                   add_timestamp: bool = True,
+                   progress_callback: Optional[Callable] = None,
+                   *pipeline_params,
+                   convert_t2s: bool = False,
+                   params: Optional[TranscriptionPipelineParams] = None,
+                   ) -> Generator[Tuple[int, Segment], None, None]:
+        """
+        Streaming variant of `run()`. Segments are yielded with their original (VAD-restored) timestamps as soon as
+        the whisper model decodes them, instead of after the whole audio is transcribed.
+
+        Post-processing that needs the complete result, such as diarization and the Traditional to Simplified Chinese
+        conversion, is yielded afterwards as follow-up updates that reuse the index of the segment they replace.
+
+        Parameters
+        ----------
+        audio: Union[str, BinaryIO, np.ndarray, DecodedAudio]
+            Audio input. This can be file path or binary type. It's decoded only once and shared by all the stages.
+        progress: gr.Progress
+            Indicator to show progress directly in gradio.
+        file_format: str
+            Subtitle file format between ["SRT", "WebVTT", "txt", "lrc"]
+        add_timestamp: bool
+            Whether to add a timestamp at the end of the filename.
+        progress_callback: Optional[Callable]
+            callback function to show progress. Can be used to update progress in the backend.
+        *pipeline_params: tuple
+            Parameters for the transcription pipeline. This will be dealt with "TranscriptionPipelineParams" data class.
+        convert_t2s: bool
+            Whether to convert Traditional Chinese to Simplified Chinese as a follow-up update.
+        params: Optional[TranscriptionPipelineParams]
+            Parameters of the pipeline, same as `run()`. The default parameters are used if it's not given.
+
+        Yields
+        ----------
+        index: int
+            Index of the segment in the final result. A follow-up update yields the same index again.
+        segment: Segment
+            Segment that includes start, end timestamps and transcribed text
+        """
+        progress = self._normalize_progress(progress)
+
+        prepared = self.prepare(audio, progress, params=params)
+        if prepared is None:
+            return
+
+        params, audio_hash = prepared.params, prepared.audio_hash
+        audio, origin_audio, speech_chunks = prepared.audio, prepared.origin_audio, prepared.speech_chunks
+        whisper_params, diarization_params = params.whisper, params.diarization
+
+        if speech_chunks is not None and not speech_chunks:
+            logger.info("No speech is detected in the audio, skipping the transcription.")
+            progress(1.0, desc="Finished.")
+            return
+
+        if origin_audio.is_low_memory:
+            # Only a window is converted to float32 at once, the same as `_transcribe_preprocessed()`
+            windows = self.get_low_memory_windows(origin_audio, speech_chunks)
+        else:
+            windows = [speech_chunks]
+
+        result = []
+        try:
+            with get_model_registry().use(self.registry_key):
+                for i, chunks in enumerate(windows):
+                    window_progress_callback = None
+                    if progress_callback is not None:
+                        def window_progress_callback(progress_n, i=i):
+                            progress_callback((i + progress_n) / len(windows))
+
+                    for segment in self.transcribe_stream(
+                        self.get_stream_window(audio, origin_audio, chunks),
+                        progress,
+                        window_progress_callback,
+                        *whisper_params.to_list()
+                    ):
+                        if chunks is not None:
+                            segment = self.vad.restore_speech_timestamps(
+                                segments=[segment],
+                                speech_chunks=chunks,
+                            )[0]
+                        segment.id = len(result) + 1
+                        result.append(segment)
+                        yield len(result) - 1, segment
+        finally:
+            if get_model_registry().should_offload(whisper_params.enable_offload):
+                self.offload()
+
+        updated_result = result
+        if result and diarization_params.is_diarize:
+            progress(0.99, desc="Diarizing speakers..")
+            updated_result, elapsed_time_diarization = self._diarize(
+                audio=origin_audio,
+                segments=[seg.model_copy(deep=True) for seg in result],
+                diarization_params=diarization_params,
+                audio_hash=audio_hash
+            )
+
+        if updated_result and convert_t2s:
+            try:
+                from modules.utils.zh_convert import convert_segments_to_simplified
+                updated_result = convert_segments_to_simplified(updated_result)
+            except Exception as e:
+                logger.info(f"Failed to convert the result to Simplified Chinese: {e}")
+
+        if updated_result is not result:
+            for index, segment in enumerate(updated_result):
+                yield index, segment
+
+        self.cache_parameters(
+            params=params,
+            file_format=file_format,
+            add_timestamp=add_timestamp
+        )
+        progress(1.0, desc="Finished.")
+
+    def transcribe_stream(self,
+                          audio: Union[str, BinaryIO, np.ndarray],
+                          progress: gr.Progress = gr.Progress(),
+                          progress_callback: Optional[Callable] = None,
+                          *whisper_params,
+                          ) -> Generator[Segment, None, None]:
+        """
+        Yield segments as they are decoded. Implementations that can't decode incrementally fall back to
+        yielding the result of `transcribe()` at once.
+        """
+        segments, elapsed_time = self.transcribe(
+            audio,
+            progress,
+            progress_callback,
+            *whisper_params
+        )
+        yield from segments
+
+    def transcribe_batched(self,
+                           audio: Union[str, BinaryIO, np.ndarray],
+                           speech_chunks: List[dict],
+                           progress: gr.Progress = gr.Progress(),
+                           progress_callback: Optional[Callable] = None,
+                           *whisper_params,
+                           ) -> Optional[List[Segment]]:
+        """
+        Decode the speech chunks of the audio as a batch, with the timestamps of the original audio.
+        Returns None if the implementation doesn't support it, then the VAD-filtered audio is decoded sequentially.
+        """
+        return None
+
+    def transcribe_sharded(self,
+                           audio: np.ndarray,
+                           shards: List[List[dict]],
+                           progress: gr.Progress = gr.Progress(),
+                           progress_callback: Optional[Callable] = None,
+                           *whisper_params,
+                           ) -> List[Segment]:
+        """
+        Transcribe the shards and merge the results with the restored timestamps.
+        This transcribes the shards one by one, implementations override this to transcribe them in parallel.
+        """
+        segments_result = []
+        for i, chunks in enumerate(shards):
+            segments, elapsed_time = self.transcribe(
+                to_float32(self.vad.collect_chunks(audio, chunks)),
+                progress,
+                None,
+                *whisper_params
+            )
+            segments_result += self.vad.restore_speech_timestamps(
+                segments=segments,
+                speech_chunks=chunks
+            )
+            if progress_callback is not None:
+                progress_callback((i + 1) / len(shards))
+        return segments_result
+
+    def get_shards(self,
+                   audio: Union[str, BinaryIO, np.ndarray],
+                   speech_chunks: Optional[List[dict]],
+                   num_shards: int,
+                   ) -> Optional[Tuple[np.ndarray, List[List[dict]]]]:
+        """
+        Split the audio into balanced shards along the speech boundaries of Silero VAD.
+
+        Parameters
+        ----------
+        audio: Union[str, BinaryIO, np.ndarray]
+            Audio before VAD
+        speech_chunks: Optional[List[dict]]
+            Speech chunks from the VAD. If it's None, the VAD filter is disabled and the shards cover the whole audio,
+            split in the silence right before the speech chunks.
+        num_shards: int
+            Maximum number of the shards
+
+        Returns
+        ----------
+        Tuple of the decoded audio and the speech chunks of each shard, None if the audio can't be split.
+        """
+        if not isinstance(audio, np.ndarray):
+            audio = decode_pcm(audio, self.vad.sampling_rate)
+
+        if speech_chunks is not None:
+            shards = self.vad.split_speech_chunks(speech_chunks, num_shards)
+        else:
+            boundaries = self.vad.split_speech_chunks(self.vad.get_speech_timestamps(audio), num_shards)
+            starts = [0] + [chunks[0]["start"] for chunks in boundaries[1:]]
+            ends = starts[1:] + [audio.shape[0]]
+            shards = [[{"start": start, "end": end}] for start, end in zip(starts, ends)]
+
+        if len(shards) <= 1:
+            return None
+        return audio, shards
+
+    def get_stream_window(self,
+                          audio: np.ndarray,
+                          origin_audio: DecodedAudio,
+                          chunks: Optional[List[dict]]) -> np.ndarray:
+        """
+        Float32 waveform of a window of `run_stream()`. Without the low-memory mode, the window is the whole
+        pre-processed audio. In the low-memory mode, only the speech chunks of the window are converted.
+        """
+        if not origin_audio.is_low_memory:
+            return to_float32(audio)
+        if len(chunks) == 1:
+            return origin_audio.window(chunks[0]["start"], chunks[0]["end"])
+        return to_float32(self.vad.collect_chunks(origin_audio.pcm, chunks))
+
+    def get_low_memory_windows(self,
+                               audio: DecodedAudio,
+                               speech_chunks: Optional[List[dict]]) -> List[List[dict]]:
+        """
+        Split the audio into the windows of at most `low_memory.window_s` of speech along the speech boundaries,
+        in the same format as the shards of `get_shards()`.
+        """
+        window_s = (self.low_memory or LowMemoryOptions()).window_s
+        if speech_chunks is not None:
+            num_samples = sum(chunk["end"] - chunk["start"] for chunk in speech_chunks)
+        else:
+            num_samples = audio.pcm.shape[0]
+        num_windows = math.ceil(num_samples / (window_s * audio.sample_rate))
+
+        windows = self.get_shards(audio.pcm, speech_chunks, num_windows) if num_windows > 1 else None
+        if windows is not None:
+            return windows[1]
+        return [speech_chunks if speech_chunks is not None else [{"start": 0, "end": audio.pcm.shape[0]}]]
+
+    def _transcribe_preprocessed(self,
+                                 audio: np.ndarray,
+                                 origin_audio: DecodedAudio,
+                                 speech_chunks: Optional[List[dict]],
+                                 whisper_params: WhisperParams,
+                                 progress: gr.Progress = gr.Progress(),
+                                 progress_callback: Optional[Callable] = None,
+                                 num_shards: int = 1,
+                                 ) -> List[Segment]:
+        """
+        Transcribe the pre-processed audio with the sharded, batched or sequential decoding,
+        and return the segments with the timestamps of the original audio.
+        """
+        if speech_chunks is not None and not speech_chunks:
+            return []
+
+        if origin_audio.is_low_memory:
+            # Only a window is converted to float32 at once, so the windows are transcribed one by one instead of
+            # the parallel shards or the batch that need the whole audio
+            result = BaseTranscriptionPipeline.transcribe_sharded(
+                self,
+                origin_audio.pcm,
+                self.get_low_memory_windows(origin_audio, speech_chunks),
+                progress,
+                progress_callback,
+                *whisper_params.to_list()
+            )
+            for i, segment in enumerate(result):
+                segment.id = i + 1
+            return result
+
+        sharded_audio = self.get_shards(origin_audio.pcm, speech_chunks, num_shards) if num_shards > 1 else None
+        if sharded_audio is not None:
+            full_audio, shards = sharded_audio
+            result = self.transcribe_sharded(
+                full_audio,
+                shards,
+                progress,
+                progress_callback,
+                *whisper_params.to_list()
+            )
+            for i, segment in enumerate(result):
+                segment.id = i + 1
+            return result
+
+        if speech_chunks is not None and whisper_params.batch_size > 1:
+            result = self.transcribe_batched(
+                origin_audio.pcm,
+                speech_chunks,
+                progress,
+                progress_callback,
+                *whisper_params.to_list()
+            )
+            if result is not None:
+                return result
 
         result, elapsed_time_transcription = self.transcribe(
             audio,
@@ -199,10 +866,8 @@ class BaseTranscriptionPipeline(ABC):
             progress_callback,
             *whisper_params.to_list()
         )
-        if whisper_params.enable_offload:
-            self.offload()
 
-        if vad_params.vad_filter:
+        if speech_chunks is not None:
             restored_result = self.vad.restore_speech_timestamps(
                 segments=result,
                 speech_chunks=speech_chunks,
@@ -211,31 +876,249 @@ class BaseTranscriptionPipeline(ABC):
                 result = restored_result
             else:
                 logger.info("VAD detected no speech segments in the audio.")
+        return result
+
+    def _transcribe_cascade(self,
+                            audio: np.ndarray,
+                            origin_audio: DecodedAudio,
+                            speech_chunks: Optional[List[dict]],
+                            whisper_params: WhisperParams,
+                            cascade_params: CascadeParams,
+                            progress: gr.Progress = gr.Progress(),
+                            progress_callback: Optional[Callable] = None,
+                            num_shards: int = 1,
+                            ) -> List[Segment]:
+        """
+        Transcribe the pre-processed audio with the draft model, then re-decode the regions of the weak draft segments
+        with the main model and splice the refined segments into the draft.
+        The regions are decoded like VAD speech chunks of the original audio, so they're batched when the
+        implementation supports it.
+        """
+        draft_pipeline = self.get_draft_pipeline()
+        draft_params = whisper_params.model_copy(update={"model_size": cascade_params.draft_model_size})
+        with get_model_registry().use(draft_pipeline.registry_key):
+            draft = draft_pipeline._transcribe_preprocessed(
+                audio=audio,
+                origin_audio=origin_audio,
+                speech_chunks=speech_chunks,
+                whisper_params=draft_params,
+                progress=progress,
+                progress_callback=progress_callback,
+                num_shards=num_shards
+            )
+        if get_model_registry().should_offload(whisper_params.enable_offload):
+            draft_pipeline.offload()
 
-        if diarization_params.is_diarize:
-            progress(0.99, desc="Diarizing speakers..")
-            result, elapsed_time_diarization = self.diarizer.run(
-                audio=origin_audio,
+        regions, weak_indices = self.get_weak_regions(
+            draft, cascade_params, origin_audio.duration, origin_audio.sample_rate
+        )
+        if not regions:
+            return draft
+
+        progress(0, desc="Re-decoding low confidence segments..")
+        with get_model_registry().use(self.registry_key):
+            refined = self._transcribe_preprocessed(
+                audio=self.vad.collect_chunks(origin_audio.pcm, regions),
+                origin_audio=origin_audio,
+                speech_chunks=regions,
+                whisper_params=whisper_params,
+                progress=progress,
+            )
+        if get_model_registry().should_offload(whisper_params.enable_offload):
+            self.offload()
+
+        refined_samples = sum(region["end"] - region["start"] for region in regions)
+        logger.info(f"Cascade re-decoded {len(weak_indices)}/{len(draft)} segments, "
+                    f"{refined_samples / origin_audio.sample_rate:.1f}s of {origin_audio.duration:.1f}s audio.")
+
+        result = [segment for i, segment in enumerate(draft) if i not in weak_indices]
+        result += [segment for segment in refined if segment.text]
+        result.sort(key=lambda segment: segment.start)
+        for i, segment in enumerate(result):
+            segment.id = i + 1
+        return result
+
+    @staticmethod
+    def get_weak_regions(segments: List[Segment],
+                         cascade_params: CascadeParams,
+                         duration: float,
+                         sampling_rate: int = 16000,
+                         ) -> Tuple[List[dict], set]:
+        """
+        Get the regions of the consecutive weak segments to re-decode, padded within the neighboring segments.
+
+        Returns
+        ----------
+        regions: List[dict]
+            Regions with the "start" and "end" samples, in the same format as the VAD speech chunks
+        weak_indices: set
+            Indices of the weak segments that the regions replace
+        """
+        regions, weak_indices = [], set()
+        i = 0
+        while i < len(segments):
+            if not cascade_params.is_weak(segments[i]):
+                i += 1
+                continue
+            j = i
+            while j + 1 < len(segments) and cascade_params.is_weak(segments[j + 1]):
+                j += 1
+
+            lower = min(segments[i - 1].end, segments[i].start) if i > 0 else 0
+            upper = max(segments[j + 1].start, segments[j].end) if j + 1 < len(segments) else duration
+            start = max(lower, segments[i].start - cascade_params.padding_s)
+            end = min(upper, segments[j].end + cascade_params.padding_s)
+            regions.append({"start": int(start * sampling_rate), "end": int(end * sampling_rate)})
+            weak_indices.update(range(i, j + 1))
+            i = j + 1
+        return regions, weak_indices
+
+    def _preprocess_audio(self,
+                          audio: DecodedAudio,
+                          bgm_params: BGMSeparationParams,
+                          vad_params: VadParams,
+                          progress: gr.Progress = gr.Progress(),
+                          audio_hash: Optional[str] = None,
+                          profiler: Optional[PipelineProfiler] = None,
+                          ) -> Tuple[np.ndarray, DecodedAudio, Optional[List[dict]]]:
+        """
+        Run the pre-processing stages (BGM separation and VAD) of the pipeline.
+        If `audio_hash` from `get_source_hash()` is given, the results of the stages are memoized in the stage cache.
+
+        Returns
+        ----------
+        audio: np.ndarray
+            Audio to be passed to the whisper model
+        origin_audio: DecodedAudio
+            Audio before VAD, used for diarization
+        speech_chunks: Optional[List[dict]]
+            Speech chunks to restore the timestamps with. None if VAD is not applied, empty if VAD detected no speech.
+        """
+        bgm_key = audio_hash if bgm_params.is_separate_bgm else None
+        vad_key = self.get_stage_key(audio_hash, vad_params) if audio_hash is not None else None
+
+        with profile_stage(profiler, "bgm_separation") if bgm_params.is_separate_bgm else nullcontext():
+            vocals = self.stage_cache.get(bgm_key) if bgm_key is not None else None
+            if vocals is not None:
+                audio = DecodedAudio.from_source(vocals, sample_rate=self.vad.sampling_rate,
+                                                 low_memory=self.low_memory)
+            elif bgm_params.is_separate_bgm:
+                music, vocals, _ = self.music_separator.separate(
+                    audio=audio,
+                    model_name=bgm_params.uvr_model_size,
+                    device=bgm_params.uvr_device,
+                    segment_size=bgm_params.segment_size,
+                    save_file=bgm_params.save_file,
+                    progress=progress
+                )
+
+                if self.music_separator.audio_info is None:
+                    origin_sample_rate = 16000
+                else:
+                    origin_sample_rate = self.music_separator.audio_info.sample_rate
+                if vocals.ndim >= 2 or origin_sample_rate != self.vad.sampling_rate:
+                    vocals = self.resample_audio(audio=vocals, original_sample_rate=origin_sample_rate)
+
+                if get_model_registry().should_offload(bgm_params.enable_offload):
+                    self.music_separator.offload()
+                if bgm_key is not None:
+                    self.stage_cache.put(bgm_key, vocals)
+                audio = DecodedAudio.from_source(vocals, sample_rate=self.vad.sampling_rate,
+                                                 low_memory=self.low_memory)
+
+        # The pcm is read-only, so the audio before VAD is shared with the stages instead of being copied
+        origin_audio = audio
+        audio = audio.pcm
+        speech_chunks = None
+
+        if vad_params.vad_filter:
+            progress(0, desc="Filtering silent parts from audio..")
+            vad_options = VadOptions(
+                threshold=vad_params.threshold,
+                min_speech_duration_ms=vad_params.min_speech_duration_ms,
+                max_speech_duration_s=vad_params.max_speech_duration_s,
+                min_silence_duration_ms=vad_params.min_silence_duration_ms,
+                speech_pad_ms=vad_params.speech_pad_ms
+            )
+
+            with profile_stage(profiler, "vad"):
+                vad_speech_chunks = self.stage_cache.get(vad_key) if vad_key is not None else None
+                if vad_speech_chunks is not None:
+                    vad_processed = self.vad.collect_chunks(audio, vad_speech_chunks)
+                else:
+                    vad_processed, vad_speech_chunks = self.vad.run(
+                        audio=origin_audio,
+                        vad_parameters=vad_options,
+                        progress=progress,
+                        fast_mode=vad_params.fast_mode
+                    )
+                    if vad_key is not None:
+                        self.stage_cache.put(vad_key, vad_speech_chunks)
+
+            # An empty list of the speech chunks means there's no speech, so the transcription is skipped instead of
+            # falling back to the whole audio
+            audio = vad_processed
+            speech_chunks = vad_speech_chunks
+
+        return audio, origin_audio, speech_chunks
+
+    def _diarize(self,
+                 audio: DecodedAudio,
+                 segments: List[Segment],
+                 diarization_params: DiarizationParams,
+                 audio_hash: Optional[str] = None,
+                 ) -> Tuple[List[Segment], float]:
+        """
+        Assign speakers to the segments and offload the diarization model if needed.
+        If `audio_hash` from `get_source_hash()` is given, the diarization frames are memoized in the stage cache.
+        """
+        start_time = time.time()
+
+        diarization_key = None
+        if audio_hash is not None and self.stage_cache is not None:
+            diarization_key = self.get_stage_key(audio_hash, diarization_params)
+        diarization_segments = self.stage_cache.get(diarization_key) if diarization_key is not None else None
+
+        if diarization_segments is None:
+            diarization_segments = self.diarizer.diarize(
+                audio=audio,
                 use_auth_token=diarization_params.hf_token if diarization_params.hf_token else os.environ.get("HF_TOKEN"),
-                transcribed_result=result,
                 device=diarization_params.diarization_device
             )
-            if diarization_params.enable_offload:
+            if get_model_registry().should_offload(diarization_params.enable_offload):
                 self.diarizer.offload()
+            if diarization_key is not None:
+                self.stage_cache.put(diarization_key, diarization_segments)
 
-        self.cache_parameters(
-            params=params,
-            file_format=file_format,
-            add_timestamp=add_timestamp
+        result = self.diarizer.assign_speakers(
+            diarization_segments=diarization_segments,
+            transcribed_result=segments
         )
+        return result, time.time() - start_time
 
-        if not result:
-            logger.info(f"Whisper did not detected any speech segments in the audio.")
-            result = [Segment()]
+    def get_source_hash(self,
+                        audio: DecodedAudio,
+                        bgm_params: BGMSeparationParams) -> str:
+        """
+        Get the hash of the audio that the stages after the BGM separation are applied to.
+        This is the content hash of the audio, combined with the BGM separation parameters if the separation is enabled.
+        """
+        audio_hash = get_audio_hash(audio)
+        if bgm_params.is_separate_bgm:
+            return self.get_stage_key(audio_hash, bgm_params)
+        return audio_hash
 
-        progress(1.0, desc="Finished.")
-        total_elapsed_time = time.time() - start_time
-        return result, total_elapsed_time
+    def get_stage_key(self, audio_hash: str, *stage_params: Union[BaseParams, Any]) -> str:
+        """
+        Get the key of the stage cache from the audio hash and the parameters that affect the result of the stage.
+        Parameters that don't change the result, such as the offload flags, are excluded from the key.
+        """
+        parts = [audio_hash]
+        for params in stage_params:
+            if isinstance(params, BaseParams):
+                params = {type(params).__name__: params.model_dump(exclude=self.stage_cache_excluded_fields)}
+            parts.append(params)
+        return DiskLRUCache.make_key(*parts)
 
     def transcribe_file(self,
                         files: Optional[List] = None,
@@ -306,16 +1189,19 @@ class BaseTranscriptionPipeline(ABC):
             if files and isinstance(files[0], gr.utils.NamedString):
                 files = [file.name for file in files]
 
-            files_info: Dict[str, Dict[str, Any]] = {}
-            for file in files:
-                transcribed_segments, time_for_task = self.run(
-                    file,
-                    progress,
-                    file_format,
-                    add_timestamp,
-                    None,
-                    *pipeline_params,
-                )
+            def write_result(file: str,
+                             transcribed_segments: List[Segment],
+                             time_for_task: float,
+                             profiler: PipelineProfiler) -> Tuple[str, Dict[str, Any]]:
+                with profiler.stage("subtitle"):
+                    file_name, file_info = write_subtitle(file, transcribed_segments, time_for_task)
+                profiler.log_summary()
+                file_info["profile"] = profiler.to_list()
+                return file_name, file_info
+
+            def write_subtitle(file: str,
+                               transcribed_segments: List[Segment],
+                               time_for_task: float) -> Tuple[str, Dict[str, Any]]:
                 raw_segments = [seg.model_copy(deep=True) for seg in transcribed_segments] if transcribed_segments else []
 
                 file_name, file_ext = os.path.splitext(os.path.basename(file))
@@ -348,7 +1234,7 @@ class BaseTranscriptionPipeline(ABC):
                     add_timestamp=add_timestamp,
                     **writer_options
                 )
-                files_info[file_name] = {
+                return file_name, {
                     "subtitle": read_file(file_path),
                     "time_for_task": time_for_task,
                     "path": file_path,
@@ -356,6 +1242,43 @@ class BaseTranscriptionPipeline(ABC):
                     "raw_text": raw_text_display
                 }
 
+            # While a file is in the whisper model, the next file is decoded and pre-processed and the subtitle of the
+            # previous file is written in the background, so the model doesn't wait for them.
+            files_info: Dict[str, Dict[str, Any]] = {}
+            with ThreadPoolExecutor(max_workers=1) as prefetcher, ThreadPoolExecutor(max_workers=1) as writer:
+                written_results = []
+                next_prepared = None
+                profilers = [PipelineProfiler() for _ in files]
+                for i, file in enumerate(files):
+                    if next_prepared is not None:
+                        prepared = next_prepared.result()
+                    else:
+                        prepared = self.prepare(file, progress, profiler=profilers[i])
+                    next_prepared = None
+                    if i + 1 < len(files):
+                        next_prepared = prefetcher.submit(
+                            self.prepare, files[i + 1], lambda *args, **kwargs: None, profiler=profilers[i + 1]
+                        )
+
+                    if prepared is None:
+                        transcribed_segments, time_for_task = [Segment()], 0
+                    else:
+                        transcribed_segments, time_for_task = self.run_prepared(
+                            prepared,
+                            progress,
+                            file_format,
+                            add_timestamp,
+                            None,
+                            profiler=profilers[i]
+                        )
+                    written_results.append(
+                        writer.submit(write_result, file, transcribed_segments, time_for_task, profilers[i])
+                    )
+
+                for written_result in written_results:
+                    file_name, file_info = written_result.result()
+                    files_info[file_name] = file_info
+
             chat_payload: Optional[Dict[str, Any]] = None
 
             total_whisper_text = ''
@@ -537,6 +1460,7 @@ class BaseTranscriptionPipeline(ABC):
 
     def offload(self):
         """Offload the model and free up the memory"""
+        get_model_registry().unregister(self.registry_key)
         if self.model is not None:
             del self.model
             self.model = None
@@ -653,6 +1577,16 @@ class BaseTranscriptionPipeline(ABC):
         add_timestamp: bool = True
     ):
         """Cache parameters to the yaml file"""
+        # The concurrent runs share the yaml file, so it's read and written by one of them at a time
+        with _cache_parameters_lock:
+            BaseTranscriptionPipeline._cache_parameters(params, file_format, add_timestamp)
+
+    @staticmethod
+    def _cache_parameters(
+        params: TranscriptionPipelineParams,
+        file_format: str,
+        add_timestamp: bool
+    ):
         cached_params = load_yaml(DEFAULT_PARAMETERS_CONFIG_PATH)
         param_to_cache = params.to_dict()
 
@@ -680,16 +1614,11 @@ class BaseTranscriptionPipeline(ABC):
     def resample_audio(audio: Union[str, np.ndarray],
                        new_sample_rate: int = 16000,
                        original_sample_rate: Optional[int] = None,) -> np.ndarray:
-        """Resamples audio to 16k sample rate, standard on Whisper model"""
-        if isinstance(audio, str):
-            audio, original_sample_rate = torchaudio.load(audio)
-        else:
-            if original_sample_rate is None:
-                raise ValueError("original_sample_rate must be provided when audio is numpy array.")
-            audio = torch.from_numpy(audio)
-        resampler = torchaudio.transforms.Resample(orig_freq=original_sample_rate, new_freq=new_sample_rate)
-        resampled_audio = resampler(audio).numpy()
-        return resampled_audio
+        """
+        Resamples audio to 16k sample rate, standard on Whisper model.
+        Audio of (samples, channels) is downmixed to mono in the same pass. See `modules.utils.resampler.resample()`.
+        """
+        return resample(audio, orig_sample_rate=original_sample_rate, new_sample_rate=new_sample_rate)
 
     @staticmethod
     def _segments_to_display_text(segments: List[Segment]) -> str:
@@ -132,6 +132,10 @@ class VadParams(BaseParams):
         ge=0,
         description="Padding added to each side of speech chunks"
     )
+    fast_mode: bool = Field(
+        default=False,
+        description="Run the VAD model on every other window for about half the time of VAD, with coarser speech chunks"
+    )
 
     @classmethod
     def to_gradio_inputs(cls, defaults: Optional[Dict] = None) -> List[gr.components.base.FormComponent]:
@@ -166,6 +170,11 @@ class VadParams(BaseParams):
                 label="Speech Padding (ms)", precision=0,
                 value=defaults.get("speech_pad_ms", cls.__fields__["speech_pad_ms"].default),
                 info="Final speech chunks are padded by this time each side"
+            ),
+            gr.Checkbox(
+                label="Fast VAD",
+                value=defaults.get("fast_mode", cls.__fields__["fast_mode"].default),
+                info="Run VAD in about half the time, with coarser speech boundaries"
             )
         ]
 
@@ -352,7 +361,12 @@ class WhisperParams(BaseParams):
         gt=0,
         description="Number of segments for language detection"
     )
-    batch_size: int = Field(default=24, gt=0, description="Batch size for processing")
+    batch_size: int = Field(
+        default=24,
+        gt=0,
+        description="Batch size for processing. Faster-whisper decodes VAD speech chunks as a batch if it's larger than 1 "
+                    "and neither condition_on_previous_text nor hallucination_silence_threshold is set"
+    )
     enable_offload: bool = Field(
         default=True,
         description="Offload Whisper model after transcription"
@@ -561,12 +575,13 @@ class WhisperParams(BaseParams):
             )
         ]
 
-        insanely_fast_whisper_inputs = [
+        batched_inputs = [
             gr.Number(
                 label="Batch Size",
                 value=defaults.get("batch_size", cls.__fields__["batch_size"].default),
                 precision=0,
-                info="Batch size for processing"
+                info="Batch size for processing. In faster-whisper, VAD speech chunks are decoded as a batch if it's larger than 1"
+                     " and 'Condition On Previous Text' and 'Hallucination Silence Threshold' are off"
             )
         ]
 
@@ -574,11 +589,11 @@ class WhisperParams(BaseParams):
             for input_component in faster_whisper_inputs:
                 input_component.visible = False
 
-        if whisper_type != WhisperImpl.INSANELY_FAST_WHISPER.value:
-            for input_component in insanely_fast_whisper_inputs:
+        if whisper_type not in (WhisperImpl.FASTER_WHISPER.value, WhisperImpl.INSANELY_FAST_WHISPER.value):
+            for input_component in batched_inputs:
                 input_component.visible = False
 
-        inputs += faster_whisper_inputs + insanely_fast_whisper_inputs
+        inputs += faster_whisper_inputs + batched_inputs
 
         inputs += [
             gr.Checkbox(
@@ -590,6 +605,58 @@ class WhisperParams(BaseParams):
         return inputs
 
 
+class CascadeParams(BaseParams):
+    """Parameters of the cascade, which drafts with a small model and re-decodes only the weak segments"""
+    enable_cascade: bool = Field(default=False, description="Enable the cascade of the draft and the main model")
+    draft_model_size: str = Field(default="small", description="Whisper model size for the draft transcription")
+    min_avg_logprob: float = Field(
+        default=-0.7,
+        description="Draft segments with the average log probability below this are re-decoded"
+    )
+    max_no_speech_prob: float = Field(
+        default=0.5,
+        ge=0.0,
+        le=1.0,
+        description="Draft segments with the no speech probability above this are re-decoded"
+    )
+    max_compression_ratio: float = Field(
+        default=2.2,
+        gt=0,
+        description="Draft segments with the compression ratio above this are re-decoded"
+    )
+    padding_s: float = Field(
+        default=0.5,
+        ge=0,
+        description="Padding in seconds added to each side of the re-decoded regions, within the neighboring segments"
+    )
+
+    def is_weak(self, segment: "Segment") -> bool:
+        """Whether the draft segment fails any threshold. Metrics that the implementation doesn't provide are ignored"""
+        return ((segment.avg_logprob is not None and segment.avg_logprob < self.min_avg_logprob) or
+                (segment.no_speech_prob is not None and segment.no_speech_prob > self.max_no_speech_prob) or
+                (segment.compression_ratio is not None and
+                 segment.compression_ratio > self.max_compression_ratio))
+
+
+class IncrementalParams(BaseParams):
+    """Parameters of the incremental transcription of the recordings that grow between the uploads"""
+    enable_incremental: bool = Field(
+        default=False,
+        description="Reuse the transcription of the previous upload of the recording and decode only the new tail"
+    )
+    stable_margin_s: float = Field(
+        default=10.0,
+        ge=0,
+        description="Audio within this many seconds from the end is never finalized, since the recording may "
+                    "continue the speech there"
+    )
+    head_duration_s: float = Field(
+        default=5.0,
+        gt=0,
+        description="Duration in seconds of the beginning of the recording that identifies it between the uploads"
+    )
+
+
 class TranscriptionPipelineParams(BaseModel):
     """Transcription pipeline parameters"""
     whisper: WhisperParams = Field(default_factory=WhisperParams)
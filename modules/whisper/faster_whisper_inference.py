@@ -1,9 +1,10 @@
 import os
 import time
+import threading
 import huggingface_hub
 import numpy as np
 import torch
-from typing import BinaryIO, Union, Tuple, List, Callable
+from typing import BinaryIO, Union, Tuple, List, Callable, Generator, Iterator
 import faster_whisper
 from faster_whisper.vad import VadOptions
 import ast
@@ -11,19 +12,52 @@ import ctranslate2
 import whisper
 import gradio as gr
 from argparse import Namespace
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from modules.utils.paths import (FASTER_WHISPER_MODELS_DIR, DIARIZATION_MODELS_DIR, UVR_MODELS_DIR, OUTPUT_DIR)
 from modules.whisper.data_classes import *
 from modules.whisper.base_transcription_pipeline import BaseTranscriptionPipeline
+from modules.utils.model_registry import get_model_registry
+from modules.whisper.shard_worker import init_worker, transcribe_shard
+from modules.whisper.autotune import (AUTO_COMPUTE_TYPE, AutotuneResult, autotune, load_autotune_result,
+                                      save_autotune_result)
+from modules.utils.logger import get_logger
+from modules.vad.silero_vad import SileroVAD
+from modules.utils.audio_manager import decode_pcm, to_float32
+
+logger = get_logger()
 
 
 class FasterWhisperInference(BaseTranscriptionPipeline):
+    """
+    Transcription pipeline with faster-whisper.
+
+    The pipeline can be used by several requests at once. The loaded model is leased to each request for the
+    decoding with `acquire_model()`, and CTranslate2 decodes up to `num_workers` of them in parallel on the same model.
+    A request that needs another model size or compute type waits until the current model is no longer leased before
+    reloading it, and offloading the model is deferred until the last lease is returned.
+    """
     def __init__(self,
                  model_dir: str = FASTER_WHISPER_MODELS_DIR,
                  diarization_model_dir: str = DIARIZATION_MODELS_DIR,
                  uvr_model_dir: str = UVR_MODELS_DIR,
                  output_dir: str = OUTPUT_DIR,
+                 num_workers: int = 1,
+                 cpu_threads: int = 0,
                  ):
+        """
+        Parameters
+        ----------
+        num_workers: int
+            Number of the requests that the model decodes in parallel, passed to CTranslate2. Each worker keeps its
+            own copy of the decoding state, so the memory grows with it, but the model weights are shared.
+        cpu_threads: int
+            Number of the threads of each worker on CPU. 0 uses the tuned thread count with the "auto" compute type,
+            otherwise the default of CTranslate2. When the workers run in parallel, `num_workers * cpu_threads` should
+            not exceed the CPU cores.
+        """
         super().__init__(
             model_dir=model_dir,
             diarization_model_dir=diarization_model_dir,
@@ -36,6 +70,19 @@ class FasterWhisperInference(BaseTranscriptionPipeline):
         self.model_paths = self.get_model_paths()
         self.device = self.get_device()
         self.available_models = self.model_paths.keys()
+        self.shard_pool: Optional[ProcessPoolExecutor] = None
+        self.shard_pool_key = None
+        self._shard_pool_lock = threading.Lock()
+
+        self.num_workers = num_workers
+        self.cpu_threads = cpu_threads
+        # Model path, compute type and thread count that the model is loaded with, see `resolve_model_key()`
+        self.loaded_model_key: Optional[Tuple[str, str, int]] = None
+        self._model_condition = threading.Condition(threading.RLock())
+        self._active_leases = 0
+        # Number of the requests waiting for the leases to be returned to load another model
+        self._pending_reloads = 0
+        self._offload_pending = False
 
     def transcribe(self,
                    audio: Union[str, BinaryIO, np.ndarray],
@@ -66,53 +113,56 @@ class FasterWhisperInference(BaseTranscriptionPipeline):
         """
         start_time = time.time()
 
-        params = WhisperParams.from_list(list(whisper_params))
+        segments_result = list(self.transcribe_stream(
+            audio,
+            progress,
+            progress_callback,
+            *whisper_params
+        ))
 
-        if params.model_size != self.current_model_size or self.model is None or self.current_compute_type != params.compute_type:
-            self.update_model(params.model_size, params.compute_type, progress)
+        elapsed_time = time.time() - start_time
+        return segments_result, elapsed_time
 
-        segments, info = self.model.transcribe(
-            audio=audio,
-            language=params.lang,
-            task="translate" if params.is_translate else "transcribe",
-            beam_size=params.beam_size,
-            log_prob_threshold=params.log_prob_threshold,
-            no_speech_threshold=params.no_speech_threshold,
-            best_of=params.best_of,
-            patience=params.patience,
-            temperature=params.temperature,
-            initial_prompt=params.initial_prompt,
-            compression_ratio_threshold=params.compression_ratio_threshold,
-            length_penalty=params.length_penalty,
-            repetition_penalty=params.repetition_penalty,
-            no_repeat_ngram_size=params.no_repeat_ngram_size,
-            prefix=params.prefix,
-            suppress_blank=params.suppress_blank,
-            suppress_tokens=params.suppress_tokens,
-            max_initial_timestamp=params.max_initial_timestamp,
-            word_timestamps=True,  # Set it to always True as it reduces hallucinations
-            prepend_punctuations=params.prepend_punctuations,
-            append_punctuations=params.append_punctuations,
-            max_new_tokens=params.max_new_tokens,
-            chunk_length=params.chunk_length,
-            hallucination_silence_threshold=params.hallucination_silence_threshold,
-            hotwords=params.hotwords,
-            language_detection_threshold=params.language_detection_threshold,
-            language_detection_segments=params.language_detection_segments,
-            prompt_reset_on_temperature=params.prompt_reset_on_temperature,
-        )
-        progress(0, desc="Loading audio..")
+    def transcribe_stream(self,
+                          audio: Union[str, BinaryIO, np.ndarray],
+                          progress: gr.Progress = gr.Progress(),
+                          progress_callback: Optional[Callable] = None,
+                          *whisper_params,
+                          ) -> Generator[Segment, None, None]:
+        """
+        Yield segments one by one as faster-whisper decodes them.
 
-        segments_result = []
-        for segment in segments:
-            progress_n = segment.start / info.duration
-            progress(progress_n, desc="Transcribing..")
-            if progress_callback is not None:
-                progress_callback(progress_n)
-            segments_result.append(Segment.from_faster_whisper(segment))
+        Parameters
+        ----------
+        audio: Union[str, BinaryIO, np.ndarray]
+            Audio path or file binary or Audio numpy array
+        progress: gr.Progress
+            Indicator to show progress directly in gradio.
+        progress_callback: Optional[Callable]
+            callback function to show progress. Can be used to update progress in the backend.
+        *whisper_params: tuple
+            Parameters related with whisper. This will be dealt with "WhisperParameters" data class
 
-        elapsed_time = time.time() - start_time
-        return segments_result, elapsed_time
+        Yields
+        ----------
+        segment: Segment
+            Segment that includes start, end timestamps and transcribed text
+        """
+        params = WhisperParams.from_list(list(whisper_params))
+
+        with self.acquire_model(params.model_size, params.compute_type, progress) as model:
+            segments, info = model.transcribe(
+                audio=audio,
+                **self.get_transcribe_options(params)
+            )
+            progress(0, desc="Loading audio..")
+
+            for segment in segments:
+                progress_n = segment.start / info.duration
+                progress(progress_n, desc="Transcribing..")
+                if progress_callback is not None:
+                    progress_callback(progress_n)
+                yield Segment.from_faster_whisper(segment)
 
     def update_model(self,
                      model_size: str,
@@ -128,13 +178,322 @@ class FasterWhisperInference(BaseTranscriptionPipeline):
             Size of whisper model. If you enter the huggingface repo id, it will try to download the model
             automatically from huggingface.
         compute_type: str
-            Compute type for transcription.
+            Compute type for transcription. "auto", or a compute type that the device doesn't support, uses the
+            fastest settings measured by `autotune()`.
             see more info : https://opennmt.net/CTranslate2/quantization.html
         progress: gr.Progress
             Indicator to show progress directly in gradio.
         """
-        progress(0, desc="Initializing Model..")
+        with self._model_condition:
+            # Never replace the model under the requests that are decoding with it
+            while self._active_leases > 0:
+                self._model_condition.wait()
+
+            progress(0, desc="Initializing Model..")
+
+            self.current_model_size, local_files_only = self.resolve_model_path(model_size)
+            self.current_compute_type, cpu_threads = self.get_tuned_settings(model_size, compute_type)
+            with get_model_registry().loading(self.registry_key, self.offload):
+                self.model = faster_whisper.WhisperModel(
+                    device=self.device,
+                    model_size_or_path=self.current_model_size,
+                    download_root=self.model_dir,
+                    compute_type=self.current_compute_type,
+                    cpu_threads=cpu_threads,
+                    num_workers=self.num_workers,
+                    local_files_only=local_files_only
+                )
+            self.loaded_model_key = (self.current_model_size, self.current_compute_type, cpu_threads)
+
+    def resolve_model_key(self,
+                          model_size: str,
+                          compute_type: str) -> Tuple[str, str, int]:
+        """
+        Get the model path, compute type and thread count that the model size and compute type are loaded with.
+        The requests that resolve to the same settings share the loaded model, even if they ask for it differently,
+        such as "auto" and a compute type that the device doesn't support.
+        """
+        model_path, _ = self.resolve_model_path(model_size)
+        resolved_compute_type, cpu_threads = self.get_tuned_settings(model_size, compute_type)
+        return model_path, resolved_compute_type, cpu_threads
+
+    def get_tuned_settings(self,
+                           model_size: str,
+                           compute_type: str) -> Tuple[str, int]:
+        """
+        Get the compute type and the thread count to load the model with. The requested compute type is used as is if
+        the device supports it, otherwise the tuned settings of the model size are used.
+        """
+        if compute_type != AUTO_COMPUTE_TYPE and compute_type in self.available_compute_types:
+            return compute_type, self.cpu_threads
+        if compute_type != AUTO_COMPUTE_TYPE:
+            logger.info(f"Compute type \"{compute_type}\" is not supported on this device, using the tuned one.")
+
+        result = self.autotune(model_size)
+        return result.compute_type, self.cpu_threads or result.cpu_threads
+
+    def autotune(self,
+                 model_size: str,
+                 force: bool = False) -> AutotuneResult:
+        """
+        Get the fastest compute type and thread count of the model size on this host. They're measured on a short
+        calibration clip the first time and persisted per host and model size, see `modules.whisper.autotune`.
+
+        Parameters
+        ----------
+        model_size: str
+            Size of whisper model
+        force: bool
+            Whether to measure the settings again even if they're already tuned
+        """
+        result = None if force else load_autotune_result(model_size, self.device)
+        if result is None:
+            logger.info(f"Tuning the compute type and the threads of \"{model_size}\" on this host..")
+            model_path, local_files_only = self.resolve_model_path(model_size)
+            result = autotune(
+                model_path=model_path,
+                device=self.device,
+                num_workers=self.num_workers,
+                cpu_threads=self.cpu_threads,
+                download_root=self.model_dir,
+                local_files_only=local_files_only
+            )
+            save_autotune_result(model_size, self.device, result)
+        logger.info(f"Using {result.compute_type} with {result.cpu_threads} threads for \"{model_size}\", "
+                    f"RTF {result.rtf:.3f}.")
+        return result
+
+    @contextmanager
+    def acquire_model(self,
+                      model_size: str,
+                      compute_type: str,
+                      progress: gr.Progress = gr.Progress()
+                      ) -> Iterator[faster_whisper.WhisperModel]:
+        """
+        Lease the model of the size and the compute type for the decoding in this context, loading it if needed.
+        The leased model is neither reloaded nor offloaded until the context exits, so the requests that share it
+        only decode with the model they're given instead of reading `self.model`.
+        While a request waits to load another model, new leases of the loaded model wait too, so the leases run out
+        and the request isn't starved by a steady load on the loaded model.
+        """
+        model_key = self.resolve_model_key(model_size, compute_type)
+        with self._model_condition:
+            is_pending = False
+            try:
+                while True:
+                    if self.model is not None and self.loaded_model_key == model_key:
+                        if is_pending or self._pending_reloads == 0:
+                            break
+                        self._model_condition.wait()
+                    elif self._active_leases == 0:
+                        self.update_model(model_size, compute_type, progress)
+                        break
+                    else:
+                        if not is_pending:
+                            is_pending = True
+                            self._pending_reloads += 1
+                        self._model_condition.wait()
+            finally:
+                if is_pending:
+                    self._pending_reloads -= 1
+                    self._model_condition.notify_all()
+            self._active_leases += 1
+            model = self.model
+
+        try:
+            yield model
+        finally:
+            with self._model_condition:
+                self._active_leases -= 1
+                if self._active_leases == 0:
+                    if self._offload_pending:
+                        self.offload()
+                    self._model_condition.notify_all()
+
+    def transcribe_batched(self,
+                           audio: Union[str, BinaryIO, np.ndarray],
+                           speech_chunks: List[dict],
+                           progress: gr.Progress = gr.Progress(),
+                           progress_callback: Optional[Callable] = None,
+                           *whisper_params,
+                           ) -> Optional[List[Segment]]:
+        """
+        Decode the speech chunks as a batch with faster-whisper's batched inference pipeline.
+        The chunks are passed as clip timestamps of the original audio, so the timestamps don't need to be restored.
+        The batched pipeline ignores some of the options, so if any of them is set, this returns None and the audio
+        is decoded sequentially instead. See `get_unbatchable_options()`.
+
+        Parameters
+        ----------
+        audio: Union[str, BinaryIO, np.ndarray]
+            Audio path or file binary or Audio numpy array before VAD
+        speech_chunks: List[dict]
+            Speech chunks from the VAD
+        progress: gr.Progress
+            Indicator to show progress directly in gradio.
+        progress_callback: Optional[Callable]
+            callback function to show progress. Can be used to update progress in the backend.
+        *whisper_params: tuple
+            Parameters related with whisper. This will be dealt with "WhisperParameters" data class
+
+        Returns
+        ----------
+        segments_result: Optional[List[Segment]]
+            list of Segment that includes start, end timestamps and transcribed text, None if it's not batched
+        """
+        params = WhisperParams.from_list(list(whisper_params))
+        unbatchable_options = self.get_unbatchable_options(params)
+        if unbatchable_options:
+            logger.info(f"Decoding the speech chunks sequentially, since the batched decoding ignores "
+                        f"{', '.join(unbatchable_options)}.")
+            return None
+
+        with self.acquire_model(params.model_size, params.compute_type, progress) as model:
+            sampling_rate = model.feature_extractor.sampling_rate
+            if not isinstance(audio, np.ndarray):
+                audio = decode_pcm(audio, sampling_rate)
+
+            chunk_length = params.chunk_length or model.feature_extractor.chunk_length
+            clip_timestamps = self.get_clip_timestamps(speech_chunks, chunk_length * sampling_rate)
+
+            batched_model = faster_whisper.BatchedInferencePipeline(model=model)
+            segments, info = batched_model.transcribe(
+                audio=audio,
+                vad_filter=False,
+                clip_timestamps=clip_timestamps,
+                batch_size=params.batch_size,
+                **self.get_transcribe_options(params)
+            )
+            progress(0, desc="Transcribing in batches..")
+
+            segments_result = []
+            for segment in segments:
+                progress_n = min(segment.end / info.duration, 1.0)
+                progress(progress_n, desc="Transcribing in batches..")
+                if progress_callback is not None:
+                    progress_callback(progress_n)
+                segments_result.append(Segment.from_faster_whisper(segment))
+        return segments_result
+
+    def transcribe_sharded(self,
+                           audio: np.ndarray,
+                           shards: List[List[dict]],
+                           progress: gr.Progress = gr.Progress(),
+                           progress_callback: Optional[Callable] = None,
+                           *whisper_params,
+                           ) -> List[Segment]:
+        """
+        Transcribe the shards in parallel. Each shard is decoded in its own worker process with its own CPU model,
+        and the results are restored to the original timestamps and merged in order.
+
+        Parameters
+        ----------
+        audio: np.ndarray
+            Audio numpy array before VAD
+        shards: List[List[dict]]
+            Speech chunks of each shard. See `SileroVAD.split_speech_chunks()`.
+        progress: gr.Progress
+            Indicator to show progress directly in gradio.
+        progress_callback: Optional[Callable]
+            callback function to show progress. Can be used to update progress in the backend.
+        *whisper_params: tuple
+            Parameters related with whisper. This will be dealt with "WhisperParameters" data class
+
+        Returns
+        ----------
+        segments_result: List[Segment]
+            list of Segment that includes start, end timestamps and transcribed text
+        """
+        params = WhisperParams.from_list(list(whisper_params))
+        model_path, local_files_only = self.resolve_model_path(params.model_size)
+        pool = self.get_shard_pool(
+            model_path=model_path,
+            local_files_only=local_files_only,
+            num_workers=len(shards)
+        )
+
+        progress(0, desc="Transcribing shards..")
+        transcribe_options = self.get_transcribe_options(params)
+        futures = {
+            pool.submit(transcribe_shard, to_float32(SileroVAD.collect_chunks(audio, chunks)), transcribe_options): i
+            for i, chunks in enumerate(shards)
+        }
+
+        shard_results = [[] for _ in shards]
+        for n_done, future in enumerate(as_completed(futures), 1):
+            shard_results[futures[future]] = [Segment.from_faster_whisper(seg) for seg in future.result()]
+            progress_n = n_done / len(shards)
+            progress(progress_n, desc="Transcribing shards..")
+            if progress_callback is not None:
+                progress_callback(progress_n)
+
+        segments_result = []
+        for segments, chunks in zip(shard_results, shards):
+            segments_result += self.vad.restore_speech_timestamps(
+                segments=segments,
+                speech_chunks=chunks
+            )
+        return segments_result
+
+    def get_shard_pool(self,
+                       model_path: str,
+                       local_files_only: bool,
+                       num_workers: int) -> ProcessPoolExecutor:
+        """Get the worker pool for the sharded transcription, re-creating it if the model or the size has changed"""
+        compute_type = "int8" if "int8" in ctranslate2.get_supported_compute_types("cpu") else "float32"
+        pool_key = (model_path, compute_type, num_workers)
+        with self._shard_pool_lock:
+            if self.shard_pool is not None and self.shard_pool_key == pool_key:
+                return self.shard_pool
+
+            self.shutdown_shard_pool()
+            self.shard_pool = ProcessPoolExecutor(
+                max_workers=num_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(
+                    model_path,
+                    self.model_dir,
+                    compute_type,
+                    max(1, (os.cpu_count() or 1) // num_workers),
+                    local_files_only
+                )
+            )
+            self.shard_pool_key = pool_key
+            return self.shard_pool
+
+    def shutdown_shard_pool(self):
+        if self.shard_pool is not None:
+            self.shard_pool.shutdown(wait=True, cancel_futures=True)
+            self.shard_pool = None
+            self.shard_pool_key = None
+
+    def offload(self):
+        """
+        Offload the model and the shard workers and free up the memory.
+        If the model is leased to the requests, it's offloaded when the last of them returns it.
+        """
+        with self._model_condition:
+            if self._active_leases > 0:
+                self._offload_pending = True
+                return
+            self._offload_pending = False
+            self.loaded_model_key = None
+            with self._shard_pool_lock:
+                self.shutdown_shard_pool()
+            super().offload()
 
+    def resolve_model_path(self, model_size: str) -> Tuple[str, bool]:
+        """
+        Get the model path of the model size, downloading it from huggingface if it's not detected.
+
+        Returns
+        ----------
+        model_path: str
+            Model name or directory path to load with faster-whisper
+        local_files_only: bool
+            Whether the model is already downloaded or not
+        """
         model_size_dirname = model_size.replace("/", "--") if "/" in model_size else model_size
         if model_size not in self.model_paths and model_size_dirname not in self.model_paths:
             print(f"Model is not detected. Trying to download \"{model_size}\" from huggingface to "
@@ -146,23 +505,15 @@ class FasterWhisperInference(BaseTranscriptionPipeline):
             self.model_paths = self.get_model_paths()
             gr.Info(f"Model is downloaded with the name \"{model_size_dirname}\"")
 
-        self.current_model_size = self.model_paths[model_size_dirname]
+        model_path = self.model_paths[model_size_dirname]
 
         local_files_only = False
         hf_prefix = "models--Systran--faster-whisper-"
         official_model_path = os.path.join(self.model_dir, hf_prefix+model_size)
-        if ((os.path.isdir(self.current_model_size) and os.path.exists(self.current_model_size)) or
+        if ((os.path.isdir(model_path) and os.path.exists(model_path)) or
             (model_size in faster_whisper.available_models() and os.path.exists(official_model_path))):
             local_files_only = True
-
-        self.current_compute_type = compute_type
-        self.model = faster_whisper.WhisperModel(
-            device=self.device,
-            model_size_or_path=self.current_model_size,
-            download_root=self.model_dir,
-            compute_type=self.current_compute_type,
-            local_files_only=local_files_only
-        )
+        return model_path, local_files_only
 
     def get_model_paths(self):
         """
@@ -187,6 +538,77 @@ class FasterWhisperInference(BaseTranscriptionPipeline):
                 model_paths[model_name] = os.path.join(self.model_dir, model_name)
         return model_paths
 
+    @staticmethod
+    def get_unbatchable_options(params: WhisperParams) -> List[str]:
+        """Names of the options set in the parameters that faster-whisper's batched inference pipeline ignores"""
+        options = []
+        if params.condition_on_previous_text:
+            options.append("condition_on_previous_text")
+        if params.hallucination_silence_threshold is not None:
+            options.append("hallucination_silence_threshold")
+        return options
+
+    @staticmethod
+    def get_clip_timestamps(speech_chunks: List[dict], max_clip_samples: int) -> List[dict]:
+        """
+        Convert the speech chunks into clips that fit in a single window of the model.
+        Long chunks are split evenly, and adjacent chunks are merged as long as the merged clip still fits.
+        """
+        clips = []
+        for chunk in speech_chunks:
+            chunk_samples = chunk["end"] - chunk["start"]
+            n_pieces = max(1, -(-chunk_samples // max_clip_samples))
+            piece_samples = -(-chunk_samples // n_pieces)
+            for piece_start in range(chunk["start"], chunk["end"], piece_samples):
+                piece_end = min(piece_start + piece_samples, chunk["end"])
+                if clips and piece_end - clips[-1]["start"] <= max_clip_samples:
+                    clips[-1]["end"] = piece_end
+                else:
+                    clips.append({"start": piece_start, "end": piece_end})
+        return clips
+
+    @staticmethod
+    def get_transcribe_options(params: WhisperParams) -> dict:
+        """Get the keyword arguments for `faster_whisper.WhisperModel.transcribe()` from the whisper parameters"""
+        return dict(
+            language=params.lang,
+            task="translate" if params.is_translate else "transcribe",
+            beam_size=params.beam_size,
+            log_prob_threshold=params.log_prob_threshold,
+            no_speech_threshold=params.no_speech_threshold,
+            best_of=params.best_of,
+            patience=params.patience,
+            temperature=params.temperature,
+            initial_prompt=params.initial_prompt,
+            compression_ratio_threshold=params.compression_ratio_threshold,
+            length_penalty=params.length_penalty,
+            repetition_penalty=params.repetition_penalty,
+            no_repeat_ngram_size=params.no_repeat_ngram_size,
+            prefix=params.prefix,
+            suppress_blank=params.suppress_blank,
+            suppress_tokens=params.suppress_tokens,
+            max_initial_timestamp=params.max_initial_timestamp,
+            word_timestamps=True,  # Set it to always True as it reduces hallucinations
+            prepend_punctuations=params.prepend_punctuations,
+            append_punctuations=params.append_punctuations,
+            max_new_tokens=params.max_new_tokens,
+            chunk_length=params.chunk_length,
+            hallucination_silence_threshold=params.hallucination_silence_threshold,
+            hotwords=params.hotwords,
+            language_detection_threshold=params.language_detection_threshold,
+            language_detection_segments=params.language_detection_segments,
+            prompt_reset_on_temperature=params.prompt_reset_on_temperature,
+        )
+
+    def get_compute_type(self):
+        # float16 is the best fit on CUDA, but the fastest compute type on CPU depends on the host
+        if self.device == "cuda":
+            return super().get_compute_type()
+        return AUTO_COMPUTE_TYPE
+
+    def get_available_compute_type(self):
+        return [AUTO_COMPUTE_TYPE] + super().get_available_compute_type()
+
     @staticmethod
     def get_device():
         if torch.cuda.is_available():
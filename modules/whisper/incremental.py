@@ -0,0 +1,90 @@
+import hashlib
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+from modules.whisper.data_classes import Segment
+
+MAX_STATES_PER_HEAD = 8
+# Number of the recordings whose states are kept in memory without the stage cache, the least recently used are dropped
+MAX_STATE_HEADS = 256
+
+
+@dataclass
+class IncrementalState:
+    """Finalized transcription of a recording up to its last stable boundary"""
+    stable_end: int
+    prefix_hash: str
+    segments: List[Segment] = field(default_factory=list)
+
+
+def get_prefix_hash(pcm: np.ndarray, num_samples: int) -> str:
+    """Hash of the first `num_samples` samples of the decoded audio"""
+    return hashlib.sha256(np.ascontiguousarray(pcm[:num_samples]).tobytes()).hexdigest()
+
+
+def find_matching_state(states: List[IncrementalState], pcm: np.ndarray) -> Optional[IncrementalState]:
+    """Get the state with the longest finalized prefix that the audio starts with, None if there's none"""
+    for state in sorted(states, key=lambda s: s.stable_end, reverse=True):
+        if 0 < state.stable_end <= len(pcm) and get_prefix_hash(pcm, state.stable_end) == state.prefix_hash:
+            return state
+    return None
+
+
+def find_stable_boundary(speech_chunks: List[dict],
+                         segments: List[Segment],
+                         num_samples: int,
+                         sample_rate: int = 16000,
+                         stable_margin_s: float = 10.0) -> int:
+    """
+    Get the last boundary of the audio before which the transcription is final. This is the middle of the latest
+    silence between the speech chunks that no segment spans, at least `stable_margin_s` before the end of the audio.
+
+    Parameters
+    ----------
+    speech_chunks: List[dict]
+        Speech chunks of the audio from the VAD
+    segments: List[Segment]
+        Transcribed segments of the audio
+    num_samples: int
+        Number of the samples of the audio
+    sample_rate: int
+        Sample rate of the audio
+    stable_margin_s: float
+        Audio within this many seconds from the end is never finalized
+
+    Returns
+    ----------
+    Boundary in samples, 0 if there's none
+    """
+    latest = num_samples - int(stable_margin_s * sample_rate)
+    if not speech_chunks:
+        return max(latest, 0)
+
+    silence_ends = [chunk["start"] for chunk in speech_chunks]
+    silence_starts = [0] + [chunk["end"] for chunk in speech_chunks[:-1]]
+    candidates = [(start + end) // 2 for start, end in zip(silence_starts, silence_ends) if end > start]
+
+    spans = [(round(segment.start * sample_rate), round(segment.end * sample_rate))
+             for segment in segments if segment.start is not None and segment.end is not None]
+    for boundary in sorted(candidates, reverse=True):
+        if 0 < boundary <= latest and not any(start < boundary < end for start, end in spans):
+            return boundary
+    return 0
+
+
+def update_states(states: List[IncrementalState],
+                  previous: Optional[IncrementalState],
+                  new: IncrementalState) -> List[IncrementalState]:
+    """
+    Replace the state of the previous upload with the new one, keeping the states of the other recordings.
+    The states are matched by their finalized prefix, since they may be read again from the stage cache.
+    """
+    removed = {new.prefix_hash}
+    if previous is not None:
+        removed.add(previous.prefix_hash)
+    states = [state for state in states if state.prefix_hash not in removed]
+    if new.stable_end > 0:
+        states.append(new)
+    return states[-MAX_STATES_PER_HEAD:]
@@ -14,6 +14,7 @@ from argparse import Namespace
 from modules.utils.paths import (INSANELY_FAST_WHISPER_MODELS_DIR, DIARIZATION_MODELS_DIR, UVR_MODELS_DIR, OUTPUT_DIR)
 from modules.whisper.data_classes import *
 from modules.whisper.base_transcription_pipeline import BaseTranscriptionPipeline
+from modules.utils.model_registry import get_model_registry
 from modules.utils.logger import get_logger
 
 logger = get_logger()
@@ -142,13 +143,14 @@ class InsanelyFastWhisperInference(BaseTranscriptionPipeline):
 
         self.current_compute_type = compute_type
         self.current_model_size = model_size
-        self.model = pipeline(
-            "automatic-speech-recognition",
-            model=os.path.join(self.model_dir, model_size),
-            torch_dtype=self.current_compute_type,
-            device=self.device,
-            model_kwargs={"attn_implementation": "flash_attention_2"} if is_flash_attn_2_available() else {"attn_implementation": "sdpa"},
-        )
+        with get_model_registry().loading(self.registry_key, self.offload):
+            self.model = pipeline(
+                "automatic-speech-recognition",
+                model=os.path.join(self.model_dir, model_size),
+                torch_dtype=self.current_compute_type,
+                device=self.device,
+                model_kwargs={"attn_implementation": "flash_attention_2"} if is_flash_attn_2_available() else {"attn_implementation": "sdpa"},
+            )
 
     def get_model_paths(self):
         """
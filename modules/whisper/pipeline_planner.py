@@ -0,0 +1,100 @@
+import math
+from dataclasses import dataclass, field
+from typing import List
+
+from modules.utils.audio_analysis import AudioAnalysis, analyze_audio
+from modules.utils.audio_manager import DecodedAudio
+from modules.utils.logger import get_logger
+from modules.whisper.data_classes import *
+
+logger = get_logger()
+
+
+@dataclass
+class PipelinePlan:
+    """Stages to run for an audio, decided from its analysis"""
+    analysis: AudioAnalysis
+    transcribe: bool = True
+    separate_bgm: bool = False
+    vad_filter: bool = False
+    num_shards: int = 1
+    reasons: List[str] = field(default_factory=list)
+
+
+class PipelinePlanner:
+    """
+    Plans the stages of the pipeline from a cheap analysis of the decoded audio, so the audio doesn't pay for the
+    stages it doesn't need. The plan only ever turns the enabled stages off, except for the VAD, which is turned on
+    for mostly silent audio since it shortens the audio to transcribe.
+
+    The analysis is a heuristic on the signal energy and the spectral stationarity, not a model. The thresholds are
+    conservative, so an audio is only skipped when it's near-silent and the BGM separation is only skipped when
+    there's no sustained tonal sound. Quiet music under loud speech may still be missed.
+    """
+    def __init__(self,
+                 min_speech_ratio: float = 0.01,
+                 min_music_ratio: float = 0.2,
+                 vad_silence_ratio: float = 0.5,
+                 shard_duration_s: float = 600,
+                 max_shards: int = 1):
+        """
+        Parameters
+        ----------
+        min_speech_ratio: float
+            Ratio of the active frames below which the audio is considered to have no speech, and isn't transcribed
+        min_music_ratio: float
+            Ratio of the stationary active frames below which the audio is considered to have no music bed, and the
+            BGM separation is skipped
+        vad_silence_ratio: float
+            Ratio of the silence above which the VAD is enabled, even if it's disabled in the parameters
+        shard_duration_s: float
+            Duration of the audio in seconds per shard, when the audio is split into shards
+        max_shards: int
+            Maximum number of the shards to transcribe in parallel. 1 keeps the audio in a single shard.
+        """
+        self.min_speech_ratio = min_speech_ratio
+        self.min_music_ratio = min_music_ratio
+        self.vad_silence_ratio = vad_silence_ratio
+        self.shard_duration_s = shard_duration_s
+        self.max_shards = max_shards
+
+    def plan(self,
+             audio: DecodedAudio,
+             params: TranscriptionPipelineParams) -> PipelinePlan:
+        """Analyze the audio and plan the stages, starting from the stages enabled in the parameters"""
+        analysis = analyze_audio(audio.pcm, sample_rate=audio.sample_rate)
+        plan = PipelinePlan(
+            analysis=analysis,
+            separate_bgm=params.bgm_separation.is_separate_bgm,
+            vad_filter=params.vad.vad_filter,
+        )
+
+        if analysis.speech_ratio < self.min_speech_ratio:
+            plan.transcribe = False
+            plan.separate_bgm = False
+            plan.reasons.append(f"no speech (speech ratio {analysis.speech_ratio:.2f})")
+            return plan
+
+        if plan.separate_bgm and analysis.music_ratio < self.min_music_ratio:
+            plan.separate_bgm = False
+            plan.reasons.append(f"no music bed (music ratio {analysis.music_ratio:.2f}), skipping BGM separation")
+
+        if not plan.vad_filter and analysis.silence_ratio >= self.vad_silence_ratio:
+            plan.vad_filter = True
+            plan.reasons.append(f"mostly silent (silence ratio {analysis.silence_ratio:.2f}), enabling VAD")
+
+        if self.max_shards > 1:
+            plan.num_shards = max(1, min(self.max_shards, math.ceil(analysis.duration / self.shard_duration_s)))
+            if plan.num_shards > 1:
+                plan.reasons.append(f"long audio ({analysis.duration:.0f}s), {plan.num_shards} shards")
+        return plan
+
+    @staticmethod
+    def apply(plan: PipelinePlan,
+              params: TranscriptionPipelineParams) -> TranscriptionPipelineParams:
+        """Update the parameters in place with the stages of the plan"""
+        params.bgm_separation.is_separate_bgm = plan.separate_bgm
+        params.vad.vad_filter = plan.vad_filter
+        for reason in plan.reasons:
+            logger.info(f"[Plan] {reason}")
+        return params
@@ -0,0 +1,31 @@
+# Workers for the sharded faster-whisper transcription. This module is imported by every spawned process,
+# so it is kept free of the pipeline imports (gradio, pyannote, uvr ..) to keep the worker start-up cheap.
+from typing import List, Optional
+import numpy as np
+import faster_whisper
+
+_model: Optional[faster_whisper.WhisperModel] = None
+
+
+def init_worker(model_size_or_path: str,
+                download_root: str,
+                compute_type: str,
+                cpu_threads: int,
+                local_files_only: bool):
+    """Load a dedicated CPU model for this worker process"""
+    global _model
+    _model = faster_whisper.WhisperModel(
+        model_size_or_path=model_size_or_path,
+        device="cpu",
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+        download_root=download_root,
+        local_files_only=local_files_only
+    )
+
+
+def transcribe_shard(audio: np.ndarray,
+                     transcribe_options: dict) -> List[faster_whisper.transcribe.Segment]:
+    """Transcribe a single shard with the model of this worker process"""
+    segments, info = _model.transcribe(audio=audio, **transcribe_options)
+    return list(segments)
@@ -9,6 +9,7 @@ from argparse import Namespace
 
 from modules.utils.paths import (WHISPER_MODELS_DIR, DIARIZATION_MODELS_DIR, OUTPUT_DIR, UVR_MODELS_DIR)
 from modules.whisper.base_transcription_pipeline import BaseTranscriptionPipeline
+from modules.utils.model_registry import get_model_registry
 from modules.whisper.data_classes import *
 
 
@@ -107,8 +108,9 @@ class WhisperInference(BaseTranscriptionPipeline):
         progress(0, desc="Initializing Model..")
         self.current_compute_type = compute_type
         self.current_model_size = model_size
-        self.model = whisper.load_model(
-            name=model_size,
-            device=self.device,
-            download_root=self.model_dir
-        )
\ No newline at end of file
+        with get_model_registry().loading(self.registry_key, self.offload):
+            self.model = whisper.load_model(
+                name=model_size,
+                device=self.device,
+                download_root=self.model_dir
+            )
\ No newline at end of file
@@ -0,0 +1,66 @@
+import os
+import numpy as np
+import soundfile as sf
+
+from modules.utils import audio_manager
+from modules.utils.audio_manager import (DecodedAudio, LowMemoryOptions, validate_audio, get_audio_hash, decode_pcm,
+                                         register_pcm_cache)
+from modules.utils.disk_cache import NumpyDiskLRUCache
+from modules.vad.silero_vad import SileroVAD
+
+
+def test_decoded_audio(tmp_path):
+    audio_path = os.path.join(str(tmp_path), "audio.wav")
+    sf.write(audio_path, np.zeros(16000 * 2, dtype=np.float32), 16000)
+
+    assert validate_audio(audio_path)
+    decoded_audio = DecodedAudio.from_source(audio_path)
+    assert decoded_audio.pcm.dtype == np.float32
+    assert decoded_audio.duration == 2
+    assert decoded_audio.source_hash == get_audio_hash(audio_path)
+    assert DecodedAudio.from_source(decoded_audio) is decoded_audio
+    assert validate_audio(decoded_audio)
+
+
+def test_validate_corrupted_audio(tmp_path):
+    audio_path = os.path.join(str(tmp_path), "corrupted.wav")
+    with open(audio_path, "wb") as f:
+        f.write(b"not an audio")
+
+    assert not validate_audio(audio_path)
+    assert not validate_audio(os.path.join(str(tmp_path), "missing.wav"))
+
+
+def test_decoded_audio_shares_memory():
+    pcm = np.zeros(16000, dtype=np.float32)
+    decoded_audio = DecodedAudio(pcm=pcm)
+
+    assert np.shares_memory(decoded_audio.pcm, pcm)
+    assert not decoded_audio.pcm.flags.writeable
+    assert pcm.flags.writeable
+
+    speech = SileroVAD.collect_chunks(decoded_audio.pcm, [{"start": 100, "end": 8000}])
+    assert np.shares_memory(speech, pcm)
+
+
+def test_pcm_cache_skips_decoding(tmp_path, monkeypatch):
+    audio_path = os.path.join(str(tmp_path), "audio.wav")
+    sf.write(audio_path, np.linspace(-0.5, 0.5, 16000, dtype=np.float32), 16000)
+
+    decoded = []
+    decode = audio_manager._decode
+    monkeypatch.setattr(audio_manager, "_decode", lambda *args: decoded.append(args) or decode(*args))
+    register_pcm_cache(NumpyDiskLRUCache(cache_dir=str(tmp_path / "pcm_cache"), max_bytes=1024 ** 2))
+    try:
+        first = DecodedAudio.from_source(audio_path)
+        with open(audio_path, "rb") as f:
+            second = DecodedAudio.from_source(f)
+        assert len(decoded) == 1
+        assert isinstance(second.pcm, np.memmap)
+        np.testing.assert_array_equal(first.pcm, second.pcm)
+        assert first.source_hash == second.source_hash
+
+        assert decode_pcm(audio_path, low_memory=LowMemoryOptions()).dtype == np.int16
+        assert len(decoded) == 2
+    finally:
+        register_pcm_cache(None)
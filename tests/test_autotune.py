@@ -0,0 +1,35 @@
+import numpy as np
+
+from modules.whisper.autotune import (AutotuneResult, autotune, get_candidate_compute_types, load_autotune_result,
+                                      save_autotune_result)
+
+
+def test_autotune_picks_the_fastest_settings():
+    measured = []
+
+    def measure(model_path, device, compute_type, cpu_threads, audio, **kwargs):
+        measured.append((compute_type, cpu_threads))
+        if compute_type == "float32":
+            raise RuntimeError("unsupported")
+        return (0.1 if compute_type == "int8" else 0.2) * (1 + abs(cpu_threads - 2))
+
+    result = autotune("tiny", "cpu", audio=np.zeros(16000, dtype=np.float32), cpu_threads=0, measure=measure)
+    compute_types = get_candidate_compute_types("cpu")
+
+    assert result.compute_type == "int8"
+    assert len(measured) == len(compute_types) + len({cpu_threads for _, cpu_threads in measured}) - 1
+    assert result.cpu_threads == min((cpu_threads for _, cpu_threads in measured), key=lambda t: abs(t - 2))
+
+
+def test_autotune_results_are_kept_per_model_size(tmp_path):
+    path = str(tmp_path / "autotune.yaml")
+    assert load_autotune_result("tiny", "cpu", path=path) is None
+
+    tiny = AutotuneResult(compute_type="int8", cpu_threads=4, rtf=0.05, tuned_at="2024-01-01T00:00:00")
+    base = AutotuneResult(compute_type="float32", cpu_threads=8, rtf=0.1, tuned_at="2024-01-01T00:00:00")
+    save_autotune_result("tiny", "cpu", tiny, path=path)
+    save_autotune_result("base", "cpu", base, path=path)
+
+    assert load_autotune_result("tiny", "cpu", path=path) == tiny
+    assert load_autotune_result("base", "cpu", path=path) == base
+    assert load_autotune_result("tiny", "cuda", path=path) is None
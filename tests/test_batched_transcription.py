@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+import faster_whisper
+
+from modules.whisper.data_classes import WhisperParams
+from modules.whisper.faster_whisper_inference import FasterWhisperInference
+
+
+class StubWhisperModel:
+    """Records the loads instead of loading the weights"""
+    loads = []
+
+    def __init__(self, model_size_or_path, compute_type, **kwargs):
+        StubWhisperModel.loads.append((model_size_or_path, compute_type))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_clips_fit_the_window_and_cover_the_chunks(seed: int):
+    rng = np.random.default_rng(seed)
+    max_clip_samples = 16000 * 30
+    boundaries = np.cumsum(rng.integers(1, 16000 * 80, size=2 * int(rng.integers(1, 30))))
+    speech_chunks = [{"start": int(start), "end": int(end)} for start, end in boundaries.reshape(-1, 2)]
+
+    clips = FasterWhisperInference.get_clip_timestamps(speech_chunks, max_clip_samples)
+
+    assert all(0 < clip["end"] - clip["start"] <= max_clip_samples for clip in clips)
+    assert all(previous["end"] <= clip["start"] for previous, clip in zip(clips, clips[1:]))
+    for chunk in speech_chunks:
+        assert any(clip["start"] <= chunk["start"] < clip["end"] for clip in clips)
+        covered = sum(max(0, min(clip["end"], chunk["end"]) - max(clip["start"], chunk["start"])) for clip in clips)
+        assert covered == chunk["end"] - chunk["start"]
+
+
+@pytest.mark.parametrize("options", [
+    dict(condition_on_previous_text=True),
+    dict(condition_on_previous_text=False, hallucination_silence_threshold=2.0),
+])
+def test_options_ignored_by_batching_decode_sequentially(monkeypatch, tmp_path, options):
+    StubWhisperModel.loads = []
+    monkeypatch.setattr(faster_whisper, "WhisperModel", StubWhisperModel)
+    pipeline = FasterWhisperInference(model_dir=str(tmp_path / "models"), output_dir=str(tmp_path / "outputs"))
+    params = WhisperParams(model_size="tiny", compute_type="float32", batch_size=8, **options)
+
+    result = pipeline.transcribe_batched(np.zeros(16000, dtype=np.float32), [{"start": 0, "end": 16000}],
+                                         None, None, *params.to_list())
+    assert result is None
+    assert StubWhisperModel.loads == []
+    assert FasterWhisperInference.get_unbatchable_options(
+        WhisperParams(condition_on_previous_text=False)) == []
@@ -0,0 +1,18 @@
+from modules.whisper.base_transcription_pipeline import BaseTranscriptionPipeline
+from modules.whisper.data_classes import CascadeParams, Segment
+
+
+def test_weak_regions_are_padded_within_neighbors():
+    segments = [
+        Segment(text="a", start=0.0, end=1.0, avg_logprob=-0.1),
+        Segment(text="b", start=1.2, end=2.0, avg_logprob=-1.5),
+        Segment(text="c", start=2.1, end=3.0, compression_ratio=3.0),
+        Segment(text="d", start=5.0, end=6.0, avg_logprob=-0.1),
+        Segment(text="e", start=6.5, end=7.0, no_speech_prob=0.9),
+    ]
+    regions, weak_indices = BaseTranscriptionPipeline.get_weak_regions(
+        segments, CascadeParams(enable_cascade=True, padding_s=0.5), duration=7.2, sampling_rate=10
+    )
+
+    assert weak_indices == {1, 2, 4}
+    assert regions == [{"start": 10, "end": 35}, {"start": 60, "end": 72}]
@@ -0,0 +1,124 @@
+import threading
+import time
+
+import faster_whisper
+
+from modules.whisper.autotune import AutotuneResult
+from modules.whisper.faster_whisper_inference import FasterWhisperInference
+
+
+class StubWhisperModel:
+    """Records the loads instead of loading the weights, the leasing doesn't depend on the model itself"""
+    loads = []
+
+    def __init__(self, model_size_or_path, compute_type, num_workers, **kwargs):
+        self.model_size = model_size_or_path
+        self.num_workers = num_workers
+        StubWhisperModel.loads.append((model_size_or_path, compute_type))
+
+
+def make_pipeline(monkeypatch, tmp_path, num_workers=4) -> FasterWhisperInference:
+    StubWhisperModel.loads = []
+    monkeypatch.setattr(faster_whisper, "WhisperModel", StubWhisperModel)
+    return FasterWhisperInference(model_dir=str(tmp_path / "models"), output_dir=str(tmp_path / "outputs"),
+                                  num_workers=num_workers)
+
+
+def test_leases_share_the_loaded_model(monkeypatch, tmp_path):
+    pipeline = make_pipeline(monkeypatch, tmp_path)
+    active, max_active = [0], [0]
+    lock = threading.Lock()
+
+    def decode():
+        with pipeline.acquire_model("tiny", "float32") as model:
+            assert model.num_workers == 4
+            with lock:
+                active[0] += 1
+                max_active[0] = max(max_active[0], active[0])
+            time.sleep(0.1)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=decode) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert StubWhisperModel.loads == [("tiny", "float32")]
+    assert max_active[0] == 4
+
+
+def test_reload_and_offload_wait_for_the_leases(monkeypatch, tmp_path):
+    pipeline = make_pipeline(monkeypatch, tmp_path)
+    events = []
+
+    def reload():
+        with pipeline.acquire_model("base", "float32") as model:
+            events.append(("reloaded", model.model_size))
+
+    with pipeline.acquire_model("tiny", "float32") as model:
+        thread = threading.Thread(target=reload)
+        thread.start()
+        time.sleep(0.1)
+        pipeline.offload()
+        assert pipeline.model is model
+        events.append(("released", model.model_size))
+    thread.join()
+
+    assert events == [("released", "tiny"), ("reloaded", "base")]
+    assert StubWhisperModel.loads == [("tiny", "float32"), ("base", "float32")]
+
+
+def test_reload_is_not_starved_by_new_leases(monkeypatch, tmp_path):
+    pipeline = make_pipeline(monkeypatch, tmp_path)
+    stop = threading.Event()
+    events = []
+
+    def steady_load(delay: float):
+        # The leases of the two workers overlap, so the count of the leases never drops to zero by itself
+        time.sleep(delay)
+        while not stop.is_set():
+            with pipeline.acquire_model("tiny", "float32"):
+                time.sleep(0.1)
+
+    def reload():
+        with pipeline.acquire_model("base", "float32") as model:
+            events.append(("reloaded", model.model_size))
+
+    with pipeline.acquire_model("tiny", "float32"):
+        workers = [threading.Thread(target=steady_load, args=(delay,)) for delay in (0, 0.05)]
+        for worker in workers:
+            worker.start()
+        time.sleep(0.02)
+        reloader = threading.Thread(target=reload)
+        reloader.start()
+        time.sleep(0.05)
+
+    reloader.join(3)
+    reloaded_under_load = not reloader.is_alive()
+    stop.set()
+    for worker in workers:
+        worker.join(5)
+    reloader.join(5)
+
+    assert reloaded_under_load
+
+    assert events == [("reloaded", "base")]
+    assert StubWhisperModel.loads[:2] == [("tiny", "float32"), ("base", "float32")]
+
+
+def test_requests_resolving_to_the_loaded_settings_share_the_model(monkeypatch, tmp_path):
+    pipeline = make_pipeline(monkeypatch, tmp_path)
+    pipeline.available_compute_types = ["float32", "int8"]
+    monkeypatch.setattr(pipeline, "autotune", lambda model_size: AutotuneResult(
+        compute_type="int8", cpu_threads=2, rtf=0.1, tuned_at=""))
+
+    pipeline.update_model("tiny", "auto")
+    with pipeline.acquire_model("tiny", "float16") as model:
+        assert model is pipeline.model
+    assert StubWhisperModel.loads == [("tiny", "int8")]
+
+    with pipeline.acquire_model("tiny", "float32"):
+        pass
+    assert StubWhisperModel.loads == [("tiny", "int8"), ("tiny", "float32")]
@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from modules.whisper import base_transcription_pipeline
+from modules.whisper.base_transcription_pipeline import BaseTranscriptionPipeline
+from modules.whisper.data_classes import Segment
+from modules.whisper.incremental import (MAX_STATES_PER_HEAD, IncrementalState, find_matching_state,
+                                         find_stable_boundary, get_prefix_hash, update_states)
+
+
+class StubPipeline(BaseTranscriptionPipeline):
+    def transcribe(self, audio, progress=None, progress_callback=None, *whisper_params):
+        return [], 0.0
+
+    def update_model(self, *args, **kwargs):
+        pass
+
+
+def test_stable_boundary_is_in_a_silence_no_segment_spans():
+    speech_chunks = [{"start": 10, "end": 30}, {"start": 40, "end": 60}, {"start": 80, "end": 95}]
+    segments = [Segment(start=1.0, end=3.6), Segment(start=4.0, end=7.5), Segment(start=8.0, end=9.5)]
+
+    # The middles of the silences between 30 and 40, and between 60 and 80, are spanned by the segments
+    boundary = find_stable_boundary(speech_chunks, segments, num_samples=100, sample_rate=10, stable_margin_s=3)
+    assert boundary == 5
+
+    segments[0].start = 0.2
+    assert find_stable_boundary(speech_chunks, segments, num_samples=100, sample_rate=10, stable_margin_s=3) == 0
+    assert find_stable_boundary([], [], num_samples=100, sample_rate=10, stable_margin_s=3) == 70
+
+
+def test_state_matches_only_the_extended_recording():
+    rng = np.random.default_rng(0)
+    recording = rng.standard_normal(1000).astype(np.float32)
+    other = rng.standard_normal(1000).astype(np.float32)
+
+    state = IncrementalState(stable_end=400, prefix_hash=get_prefix_hash(recording, 400))
+    states = update_states([], None, state)
+
+    assert find_matching_state(states, recording) is state
+    assert find_matching_state(states, recording[:300]) is None
+    assert find_matching_state(states, other) is None
+
+    extended = IncrementalState(stable_end=800, prefix_hash=get_prefix_hash(recording, 800))
+    states = update_states(states, state, extended)
+    assert states == [extended]
+
+
+def test_states_in_memory_are_bounded_and_kept_under_concurrent_uploads(monkeypatch, tmp_path):
+    pipeline = StubPipeline(output_dir=str(tmp_path))
+    states = [IncrementalState(stable_end=i + 1, prefix_hash=f"{i}") for i in range(MAX_STATES_PER_HEAD)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda state: pipeline._update_incremental_states("head", None, state), states))
+    assert sorted(state.prefix_hash for state in pipeline._get_incremental_states("head")) == \
+           sorted(state.prefix_hash for state in states)
+
+    monkeypatch.setattr(base_transcription_pipeline, "MAX_STATE_HEADS", 2)
+    pipeline._update_incremental_states("other head", None, states[0])
+    pipeline._get_incremental_states("head")
+    pipeline._update_incremental_states("third head", None, states[0])
+    assert list(pipeline.incremental_states) == ["head", "third head"]
@@ -0,0 +1,89 @@
+import os
+import numpy as np
+import soundfile as sf
+from faster_whisper.audio import decode_audio
+
+from modules.utils.audio_manager import DecodedAudio, LowMemoryOptions, decode_pcm16, to_float32, to_int16
+from modules.utils.audio_analysis import analyze_audio
+from modules.vad.silero_vad import SileroVAD
+from modules.whisper.base_transcription_pipeline import BaseTranscriptionPipeline
+from modules.whisper.data_classes import *
+
+SAMPLE_RATE = 16000
+
+
+def make_tone(duration: float) -> np.ndarray:
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * 220 * t) * (np.sin(2 * np.pi * 0.5 * t) > 0)).astype(np.float32)
+
+
+class WindowRecordingPipeline(BaseTranscriptionPipeline):
+    """Returns a segment at each second of the audio and records the audio it's given"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.windows = []
+
+    def transcribe(self, audio, progress=None, progress_callback=None, *whisper_params):
+        self.windows.append(audio)
+        duration = len(audio) / SAMPLE_RATE
+        return [Segment(text=f"{i}", start=float(i), end=i + 0.5) for i in range(int(duration))], 0.0
+
+    def update_model(self, *args, **kwargs):
+        pass
+
+
+def test_pcm16_decoding_matches_float32_decoding(tmp_path):
+    audio_path = os.path.join(str(tmp_path), "audio.wav")
+    sf.write(audio_path, make_tone(3), SAMPLE_RATE)
+
+    pcm = decode_pcm16(audio_path, SAMPLE_RATE, LowMemoryOptions())
+    assert pcm.dtype == np.int16
+    np.testing.assert_allclose(to_float32(pcm), decode_audio(audio_path, sampling_rate=SAMPLE_RATE), atol=1e-6)
+
+    memmap_dir = str(tmp_path / "memmap")
+    mapped = decode_pcm16(audio_path, SAMPLE_RATE, LowMemoryOptions(memmap_threshold_mb=0, memmap_dir=memmap_dir))
+    assert isinstance(mapped, np.memmap)
+    np.testing.assert_array_equal(mapped, pcm)
+    assert os.listdir(memmap_dir) == []
+
+    audio = DecodedAudio.from_source(audio_path, low_memory=LowMemoryOptions())
+    assert audio.is_low_memory and audio.duration == 3
+    np.testing.assert_array_equal(audio.window(100, 200), to_float32(pcm[100:200]))
+
+
+def test_int16_conversion_round_trip():
+    waveform = make_tone(2)
+    pcm = to_int16(waveform)
+    assert pcm.dtype == np.int16
+    np.testing.assert_allclose(to_float32(pcm), waveform, atol=1 / 32768)
+    assert to_int16(np.array([1.5, -1.5], dtype=np.float32)).tolist() == [32767, -32768]
+
+    assert analyze_audio(pcm).speech_ratio == analyze_audio(waveform).speech_ratio
+
+
+def test_int16_speech_probs_match_float32():
+    vad = SileroVAD()
+    pcm = to_int16(make_tone(10))
+
+    np.testing.assert_array_equal(vad.get_speech_probs(pcm, block_size_samples=SAMPLE_RATE * 4),
+                                  vad.get_speech_probs(to_float32(pcm)))
+
+
+def test_low_memory_transcription_is_windowed(tmp_path):
+    pipeline = WindowRecordingPipeline(output_dir=str(tmp_path))
+    pipeline.register_low_memory(LowMemoryOptions(window_s=4))
+    audio = DecodedAudio.from_source(make_tone(10), low_memory=pipeline.low_memory)
+    speech_chunks = [{"start": i * SAMPLE_RATE, "end": (i + 2) * SAMPLE_RATE} for i in range(0, 10, 3)]
+
+    result = pipeline._transcribe_preprocessed(
+        audio=SileroVAD.collect_chunks(audio.pcm, speech_chunks),
+        origin_audio=audio,
+        speech_chunks=speech_chunks,
+        whisper_params=WhisperParams(),
+    )
+
+    assert len(pipeline.windows) == 2
+    assert all(window.dtype == np.float32 and len(window) <= 4 * SAMPLE_RATE for window in pipeline.windows)
+    assert [segment.start for segment in result] == [0, 1, 3, 4, 6, 7, 9]
+    assert [segment.id for segment in result] == list(range(1, 8))
@@ -0,0 +1,71 @@
+import threading
+import time
+
+from modules.utils.model_registry import ModelRegistry
+
+
+def test_model_registry_lru_eviction():
+    registry = ModelRegistry(memory_budget_bytes=250)
+    offloaded = []
+    for key in ["a", "b", "c"]:
+        registry.register(key, lambda key=key: offloaded.append(key), size_bytes=100)
+        time.sleep(0.01)
+
+    assert offloaded == ["a"]
+    assert registry.get_total_memory() == 200
+
+
+def test_model_registry_keeps_models_in_use():
+    registry = ModelRegistry(memory_budget_bytes=150)
+    offloaded = []
+    registry.register("a", lambda: offloaded.append("a"), size_bytes=100)
+
+    with registry.use("a"):
+        registry.register("b", lambda: offloaded.append("b"), size_bytes=100)
+        assert offloaded == []
+    registry.register("c", lambda: offloaded.append("c"), size_bytes=10)
+
+    assert "a" not in offloaded
+    assert offloaded == ["b"]
+
+
+def test_model_registry_idle_timeout():
+    registry = ModelRegistry()
+    registry.idle_timeout = 0.01
+    offloaded = []
+    registry.register("a", lambda: offloaded.append("a"))
+    time.sleep(0.05)
+    registry.evict_idle()
+
+    assert offloaded == ["a"]
+    assert not registry.should_offload(True)
+
+
+def test_model_registry_use_waits_for_the_offload():
+    registry = ModelRegistry(memory_budget_bytes=150)
+    events = []
+    offload_started, finish_offload = threading.Event(), threading.Event()
+
+    def slow_offload():
+        offload_started.set()
+        finish_offload.wait(5)
+        events.append("offloaded")
+
+    def use():
+        with registry.use("a"):
+            events.append("used")
+
+    registry.register("a", slow_offload, size_bytes=100)
+    evictor = threading.Thread(target=registry.register, args=("b", lambda: None, 100))
+    evictor.start()
+    assert offload_started.wait(5)
+
+    user = threading.Thread(target=use)
+    user.start()
+    time.sleep(0.1)
+    assert events == []
+    finish_offload.set()
+    evictor.join(5)
+    user.join(5)
+
+    assert events == ["offloaded", "used"]
@@ -0,0 +1,57 @@
+import numpy as np
+
+from modules.utils.audio_analysis import analyze_audio
+from modules.utils.audio_manager import DecodedAudio
+from modules.whisper.data_classes import *
+from modules.whisper.pipeline_planner import PipelinePlanner
+
+SAMPLE_RATE = 16000
+
+
+def make_speech(duration: float) -> np.ndarray:
+    """Harmonic bursts with syllable-rate gaps, a rough stand-in for speech"""
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    phase = 2 * np.pi * np.cumsum(120 + 60 * np.sin(2 * np.pi * 0.7 * t)) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = np.clip(np.sin(2 * np.pi * 2 * t), 0, None) * (np.sin(2 * np.pi * 0.25 * t) > 0)
+    return (0.2 * voiced * envelope).astype(np.float32)
+
+
+def make_music(duration: float) -> np.ndarray:
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    return (0.05 * sum(np.sin(2 * np.pi * f * t) for f in (261.6, 329.6, 392.0))).astype(np.float32)
+
+
+def test_analysis_of_silence_and_music():
+    silence = analyze_audio(np.zeros(SAMPLE_RATE * 10, dtype=np.float32))
+    assert silence.speech_ratio == 0
+    assert silence.duration == 10
+
+    music = analyze_audio(make_music(10))
+    assert music.speech_ratio > 0.9
+    assert music.music_ratio > 0.5
+
+
+def test_analysis_is_independent_of_block_size():
+    audio = make_speech(20) + make_music(20)
+    assert analyze_audio(audio, block_frames=7) == analyze_audio(audio)
+
+
+def test_plan_skips_unneeded_stages():
+    planner = PipelinePlanner(max_shards=4, shard_duration_s=10)
+    params = TranscriptionPipelineParams(bgm_separation=BGMSeparationParams(is_separate_bgm=True))
+
+    silent_plan = planner.plan(DecodedAudio(pcm=np.zeros(SAMPLE_RATE * 5, dtype=np.float32)), params)
+    assert not silent_plan.transcribe
+
+    music_plan = planner.plan(DecodedAudio(pcm=make_speech(30) + make_music(30)), params)
+    assert music_plan.transcribe and music_plan.separate_bgm
+    assert music_plan.num_shards == 3
+
+    speech_plan = planner.plan(DecodedAudio(pcm=make_speech(30)), params)
+    assert speech_plan.transcribe and not speech_plan.separate_bgm
+    assert speech_plan.vad_filter
+
+    planned_params = planner.apply(speech_plan, params.model_copy(deep=True))
+    assert not planned_params.bgm_separation.is_separate_bgm
+    assert planned_params.vad.vad_filter
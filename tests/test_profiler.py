@@ -0,0 +1,21 @@
+import time
+
+from modules.utils.profiler import PipelineProfiler, profile_stage
+
+
+def test_profiler_records_stages():
+    profiler = PipelineProfiler(audio_duration=10)
+    with profiler.stage("vad"):
+        time.sleep(0.02)
+    with profile_stage(profiler, "transcription"):
+        sum(range(100000))
+    with profile_stage(profiler, "vad"):
+        time.sleep(0.02)
+    with profile_stage(None, "diarization"):
+        pass
+
+    stages = {profile.stage: profile for profile in profiler.stages}
+    assert list(stages) == ["vad", "transcription"]
+    assert stages["vad"].wall_time >= 0.04
+    assert stages["transcription"].cpu_time > 0
+    assert stages["vad"].rtf == stages["vad"].wall_time / 10
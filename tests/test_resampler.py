@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+from scipy.signal import resample_poly
+
+from modules.utils.resampler import StreamingResampler, get_resample_kernel, resample
+
+
+@pytest.mark.parametrize("sample_rate", [44100, 48000, 8000])
+def test_streaming_resampler_matches_resample_poly(sample_rate):
+    audio = np.random.default_rng(0).standard_normal((sample_rate * 2 + 7, 2)).astype(np.float32)
+    kernel = get_resample_kernel(sample_rate, 16000)
+    expected = resample_poly(audio.mean(axis=1), kernel.up, kernel.down)
+
+    resampler = StreamingResampler(sample_rate, 16000)
+    chunks = [resampler.process(audio[start:start + 1000]) for start in range(0, len(audio), 1000)]
+    streamed = np.concatenate(chunks + [resampler.flush()])
+
+    assert streamed.dtype == np.float32
+    assert np.allclose(streamed, expected, atol=1e-5)
+    assert np.allclose(resample(audio, sample_rate, 16000, chunk_size=12345), expected, atol=1e-5)
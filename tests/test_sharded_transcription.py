@@ -0,0 +1,85 @@
+import threading
+from concurrent.futures import Future
+
+import faster_whisper
+import numpy as np
+import pytest
+
+from modules.vad.silero_vad import SileroVAD
+from modules.whisper.data_classes import WhisperParams
+from modules.whisper.faster_whisper_inference import FasterWhisperInference
+
+SAMPLE_RATE = 16000
+
+
+def make_chunks(rng: np.random.Generator, num_chunks: int):
+    boundaries = np.cumsum(rng.integers(SAMPLE_RATE, SAMPLE_RATE * 20, size=2 * num_chunks))
+    return [{"start": int(start), "end": int(end)} for start, end in boundaries.reshape(-1, 2)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_speech_chunks_are_split_into_balanced_contiguous_groups(seed: int):
+    rng = np.random.default_rng(seed)
+    chunks = make_chunks(rng, int(rng.integers(1, 40)))
+    num_shards = int(rng.integers(1, 10))
+
+    shards = SileroVAD.split_speech_chunks(chunks, num_shards)
+
+    assert len(shards) == min(num_shards, len(chunks))
+    assert all(shards)
+    assert [chunk for shard in shards for chunk in shard] == chunks
+
+    durations = [sum(chunk["end"] - chunk["start"] for chunk in shard) for shard in shards]
+    max_chunk = max(chunk["end"] - chunk["start"] for chunk in chunks)
+    assert max(durations) <= sum(durations) / len(shards) + max_chunk
+
+
+def test_equal_chunks_are_split_evenly():
+    chunks = [{"start": i * 100, "end": i * 100 + 50} for i in range(12)]
+    assert [len(shard) for shard in SileroVAD.split_speech_chunks(chunks, 4)] == [3, 3, 3, 3]
+    assert SileroVAD.split_speech_chunks([], 4) == []
+
+
+class StubShardPool:
+    """Transcribes each shard into a segment per speech chunk, and completes the shards in the reverse order"""
+
+    def __init__(self, shards):
+        self.shards = shards
+        self.futures = []
+
+    def submit(self, fn, audio, transcribe_options):
+        chunks = self.shards[len(self.futures)]
+        assert len(audio) == sum(chunk["end"] - chunk["start"] for chunk in chunks)
+        segments, offset = [], 0
+        for chunk in chunks:
+            start = offset / SAMPLE_RATE
+            offset += chunk["end"] - chunk["start"]
+            segments.append(faster_whisper.transcribe.Segment(
+                id=len(segments) + 1, seek=0, start=start, end=start + 0.5, text=f"{chunk['start']}", tokens=[],
+                avg_logprob=0.0, compression_ratio=1.0, no_speech_prob=0.0, words=None, temperature=0.0
+            ))
+        future = Future()
+        self.futures.append((future, segments))
+        if len(self.futures) == len(self.shards):
+            threading.Timer(0.05, self.complete_in_reverse).start()
+        return future
+
+    def complete_in_reverse(self):
+        for future, segments in reversed(self.futures):
+            future.set_result(segments)
+
+
+def test_shards_are_merged_in_order_with_restored_timestamps(monkeypatch, tmp_path):
+    pipeline = FasterWhisperInference(model_dir=str(tmp_path / "models"), output_dir=str(tmp_path / "outputs"))
+    chunks = make_chunks(np.random.default_rng(0), 9)
+    shards = SileroVAD.split_speech_chunks(chunks, 3)
+    pool = StubShardPool(shards)
+    monkeypatch.setattr(pipeline, "resolve_model_path", lambda model_size: (model_size, True))
+    monkeypatch.setattr(pipeline, "get_shard_pool", lambda **kwargs: pool)
+
+    audio = np.zeros(chunks[-1]["end"], dtype=np.float32)
+    result = pipeline.transcribe_sharded(audio, shards, lambda *args, **kwargs: None, None,
+                                         *WhisperParams(model_size="tiny").to_list())
+
+    assert [segment.text for segment in result] == [f"{chunk['start']}" for chunk in chunks]
+    assert [segment.start for segment in result] == [round(chunk["start"] / SAMPLE_RATE, 2) for chunk in chunks]
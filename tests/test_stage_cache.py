@@ -0,0 +1,72 @@
+import os
+import time
+import numpy as np
+
+from modules.utils.disk_cache import DiskLRUCache
+from modules.utils.audio_manager import get_audio_hash
+
+
+def test_disk_lru_cache(tmp_path):
+    cache = DiskLRUCache(cache_dir=str(tmp_path), max_bytes=10 ** 9)
+    key = DiskLRUCache.make_key("audio", {"threshold": 0.5})
+
+    assert cache.get(key) is None
+    cache.put(key, [{"start": 0, "end": 16000}])
+    assert cache.get(key) == [{"start": 0, "end": 16000}]
+    assert key != DiskLRUCache.make_key("audio", {"threshold": 0.6})
+
+
+def test_disk_lru_cache_eviction(tmp_path):
+    value = np.zeros(1000, dtype=np.float32)
+    cache = DiskLRUCache(cache_dir=str(tmp_path), max_bytes=10 ** 9)
+    for key in ["a", "b", "c"]:
+        cache.put(key, value)
+        time.sleep(0.01)
+    cache.get("a")
+
+    entry_size = os.path.getsize(cache.get_path("a"))
+    cache.max_bytes = entry_size * 2
+    cache.evict()
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_disk_lru_cache_eviction_skips_locked_entries(tmp_path, monkeypatch):
+    value = np.zeros(1000, dtype=np.float32)
+    cache = DiskLRUCache(cache_dir=str(tmp_path), max_bytes=10 ** 9)
+    for key in ["a", "b", "c"]:
+        cache.put(key, value)
+        time.sleep(0.01)
+
+    locked_path = cache.get_path("a")
+    remove = os.remove
+
+    def remove_unless_locked(path):
+        if os.path.abspath(path) == os.path.abspath(locked_path):
+            raise PermissionError("The file is in use")
+        remove(path)
+
+    monkeypatch.setattr(os, "remove", remove_unless_locked)
+    entry_size = os.path.getsize(locked_path)
+    cache.max_bytes = entry_size * 2
+    cache.evict()
+
+    # The locked entry still counts towards the size, so the next oldest entry is evicted in its place
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_audio_hash(tmp_path):
+    audio = np.random.rand(16000).astype(np.float32)
+    assert get_audio_hash(audio) == get_audio_hash(audio.copy())
+    assert get_audio_hash(audio) != get_audio_hash(audio[:8000])
+
+    audio_path = os.path.join(str(tmp_path), "audio.bin")
+    with open(audio_path, "wb") as f:
+        f.write(audio.tobytes())
+    with open(audio_path, "rb") as f:
+        assert get_audio_hash(audio_path) == get_audio_hash(f)
+        assert f.tell() == 0
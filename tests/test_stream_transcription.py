@@ -0,0 +1,69 @@
+import numpy as np
+
+from modules.utils.audio_manager import LowMemoryOptions
+from modules.vad.silero_vad import SileroVAD
+from modules.whisper.base_transcription_pipeline import BaseTranscriptionPipeline
+from modules.whisper.data_classes import *
+
+SAMPLE_RATE = 16000
+
+
+class StreamingStubPipeline(BaseTranscriptionPipeline):
+    """Decodes a segment at each second of the audio, and records how many segments it has decoded"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.num_decoded = 0
+        self.window_sizes = []
+
+    def transcribe_stream(self, audio, progress=None, progress_callback=None, *whisper_params):
+        assert audio.dtype == np.float32
+        self.window_sizes.append(len(audio))
+        for i in range(len(audio) // SAMPLE_RATE):
+            self.num_decoded += 1
+            yield Segment(text=f"{i}", start=float(i), end=i + 0.5)
+
+    def transcribe(self, audio, progress=None, progress_callback=None, *whisper_params):
+        return list(self.transcribe_stream(audio)), 0.0
+
+    def update_model(self, *args, **kwargs):
+        pass
+
+
+def test_stream_yields_restored_segments_one_at_a_time(monkeypatch, tmp_path):
+    pipeline = StreamingStubPipeline(output_dir=str(tmp_path))
+    speech_chunks = [{"start": SAMPLE_RATE, "end": 3 * SAMPLE_RATE}, {"start": 5 * SAMPLE_RATE, "end": 8 * SAMPLE_RATE}]
+    monkeypatch.setattr(pipeline.vad, "run", lambda audio, vad_parameters, progress, fast_mode=False: (
+        SileroVAD.collect_chunks(audio.pcm, speech_chunks), speech_chunks))
+    monkeypatch.setattr(pipeline, "cache_parameters", lambda *args, **kwargs: None)
+    params = TranscriptionPipelineParams(vad=VadParams(vad_filter=True))
+    audio = np.random.default_rng(0).uniform(-0.1, 0.1, 10 * SAMPLE_RATE).astype(np.float32)
+
+    streamed = []
+    for index, segment in pipeline.run_stream(audio, params=params):
+        assert index == len(streamed)
+        assert pipeline.num_decoded == index + 1
+        streamed.append(segment)
+
+    expected, _ = pipeline.run(audio, None, "SRT", False, params=params)
+    assert [(s.text, s.start, s.end) for s in streamed] == [(s.text, s.start, s.end) for s in expected]
+    assert [s.start for s in streamed] == [1.0, 2.0, 5.0, 6.0, 7.0]
+
+
+def test_stream_transcribes_low_memory_windows(monkeypatch, tmp_path):
+    pipeline = StreamingStubPipeline(output_dir=str(tmp_path))
+    pipeline.register_low_memory(LowMemoryOptions(memmap_dir=str(tmp_path), window_s=3))
+    speech_chunks = [{"start": SAMPLE_RATE, "end": 3 * SAMPLE_RATE}, {"start": 5 * SAMPLE_RATE, "end": 6 * SAMPLE_RATE},
+                     {"start": 7 * SAMPLE_RATE, "end": 9 * SAMPLE_RATE}]
+    monkeypatch.setattr(pipeline.vad, "run", lambda audio, vad_parameters, progress, fast_mode=False: (
+        SileroVAD.collect_chunks(audio.pcm, speech_chunks), speech_chunks))
+    monkeypatch.setattr(pipeline, "cache_parameters", lambda *args, **kwargs: None)
+    params = TranscriptionPipelineParams(vad=VadParams(vad_filter=True))
+    audio = np.random.default_rng(0).uniform(-0.1, 0.1, 10 * SAMPLE_RATE).astype(np.float32)
+
+    streamed = [segment for _, segment in pipeline.run_stream(audio, params=params)]
+
+    assert len(pipeline.window_sizes) > 1
+    assert max(pipeline.window_sizes) <= 3 * SAMPLE_RATE
+    assert [s.start for s in streamed] == [1.0, 2.0, 5.0, 7.0, 8.0]
+    assert [s.id for s in streamed] == [1, 2, 3, 4, 5]
@@ -0,0 +1,77 @@
+import os
+import threading
+
+import numpy as np
+import soundfile as sf
+
+from modules.whisper.base_transcription_pipeline import BaseTranscriptionPipeline
+from modules.whisper.data_classes import *
+
+SAMPLE_RATE = 16000
+
+
+class StubPipeline(BaseTranscriptionPipeline):
+    """Returns a segment at each second of the audio"""
+
+    def transcribe(self, audio, progress=None, progress_callback=None, *whisper_params):
+        return [Segment(text=f"{i}", start=float(i), end=i + 0.5) for i in range(len(audio) // SAMPLE_RATE)], 0.0
+
+    def update_model(self, *args, **kwargs):
+        pass
+
+
+def make_files(tmp_path, durations):
+    files = []
+    for i, duration in enumerate(durations):
+        path = os.path.join(str(tmp_path), f"file{i}.wav")
+        t = np.arange(duration * SAMPLE_RATE) / SAMPLE_RATE
+        sf.write(path, (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32), SAMPLE_RATE)
+        files.append(path)
+    return files
+
+
+def make_pipeline(monkeypatch, tmp_path) -> StubPipeline:
+    pipeline = StubPipeline(output_dir=str(tmp_path / "outputs"))
+    monkeypatch.setattr(pipeline, "cache_parameters", lambda *args, **kwargs: None)
+    return pipeline
+
+
+def test_results_are_in_the_input_order(monkeypatch, tmp_path):
+    pipeline = make_pipeline(monkeypatch, tmp_path)
+    durations = [3, 1, 4, 2]
+    files = make_files(tmp_path, durations)
+
+    _, _, result_paths, _ = pipeline.transcribe_file(files, None, None, None, "txt", False, False, None)
+
+    assert [os.path.basename(path) for path in result_paths] == [f"file{i}.txt" for i in range(len(files))]
+    for path, duration in zip(result_paths, durations):
+        with open(path, encoding="utf-8") as f:
+            assert len(f.read().split()) == duration
+
+
+def test_failure_preparing_the_next_file_reaches_the_caller(monkeypatch, tmp_path):
+    pipeline = make_pipeline(monkeypatch, tmp_path)
+    files = make_files(tmp_path, [1, 1, 1])
+    prepare = pipeline.prepare
+
+    def failing_prepare(audio, *args, **kwargs):
+        if audio == files[1]:
+            raise ValueError("broken media")
+        return prepare(audio, *args, **kwargs)
+
+    monkeypatch.setattr(pipeline, "prepare", failing_prepare)
+    errors = []
+
+    def transcribe():
+        try:
+            pipeline.transcribe_file(files, None, None, None, "txt", False, False, None)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=transcribe, daemon=True)
+    thread.start()
+    thread.join(30)
+
+    assert not thread.is_alive()
+    assert len(errors) == 1 and isinstance(errors[0], RuntimeError)
+    assert "broken media" in str(errors[0])
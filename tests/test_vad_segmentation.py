@@ -0,0 +1,224 @@
+import copy
+from typing import List
+
+import numpy as np
+import pytest
+from faster_whisper.transcribe import SpeechTimestampsMap
+from faster_whisper.vad import VadOptions
+
+from modules.utils.disk_cache import DiskLRUCache
+from modules.vad.silero_vad import SileroVAD
+from modules.whisper.data_classes import Segment, Word
+
+
+def reference_speech_timestamps(speech_probs: np.ndarray,
+                                audio_length_samples: int,
+                                vad_options: VadOptions,
+                                sampling_rate: int = 16000,
+                                window_size_samples: int = 512):
+    """The loop of Silero VAD that visits every window, which the segmentation has to match"""
+    threshold = vad_options.threshold
+    neg_threshold = vad_options.neg_threshold
+    min_speech_samples = sampling_rate * vad_options.min_speech_duration_ms / 1000
+    speech_pad_samples = sampling_rate * vad_options.speech_pad_ms / 1000
+    max_speech_samples = (sampling_rate * vad_options.max_speech_duration_s
+                          - window_size_samples - 2 * speech_pad_samples)
+    min_silence_samples = sampling_rate * vad_options.min_silence_duration_ms / 1000
+    min_silence_samples_at_max_speech = sampling_rate * 98 / 1000
+
+    triggered = False
+    speeches = []
+    current_speech = {}
+    if neg_threshold is None:
+        neg_threshold = max(threshold - 0.15, 0.01)
+    temp_end = 0
+    prev_end = next_start = 0
+
+    for i, speech_prob in enumerate(speech_probs):
+        if (speech_prob >= threshold) and temp_end:
+            temp_end = 0
+            if next_start < prev_end:
+                next_start = window_size_samples * i
+
+        if (speech_prob >= threshold) and not triggered:
+            triggered = True
+            current_speech["start"] = window_size_samples * i
+            continue
+
+        if triggered and (window_size_samples * i) - current_speech["start"] > max_speech_samples:
+            if prev_end:
+                current_speech["end"] = prev_end
+                speeches.append(current_speech)
+                current_speech = {}
+                if next_start < prev_end:
+                    triggered = False
+                else:
+                    current_speech["start"] = next_start
+                prev_end = next_start = temp_end = 0
+            else:
+                current_speech["end"] = window_size_samples * i
+                speeches.append(current_speech)
+                current_speech = {}
+                prev_end = next_start = temp_end = 0
+                triggered = False
+                continue
+
+        if (speech_prob < neg_threshold) and triggered:
+            if not temp_end:
+                temp_end = window_size_samples * i
+            if (window_size_samples * i) - temp_end > min_silence_samples_at_max_speech:
+                prev_end = temp_end
+            if (window_size_samples * i) - temp_end < min_silence_samples:
+                continue
+            else:
+                current_speech["end"] = temp_end
+                if (current_speech["end"] - current_speech["start"]) > min_speech_samples:
+                    speeches.append(current_speech)
+                current_speech = {}
+                prev_end = next_start = temp_end = 0
+                triggered = False
+                continue
+
+    if current_speech and (audio_length_samples - current_speech["start"]) > min_speech_samples:
+        current_speech["end"] = audio_length_samples
+        speeches.append(current_speech)
+
+    for i, speech in enumerate(speeches):
+        if i == 0:
+            speech["start"] = int(max(0, speech["start"] - speech_pad_samples))
+        if i != len(speeches) - 1:
+            silence_duration = speeches[i + 1]["start"] - speech["end"]
+            if silence_duration < 2 * speech_pad_samples:
+                speech["end"] += int(silence_duration // 2)
+                speeches[i + 1]["start"] = int(max(0, speeches[i + 1]["start"] - silence_duration // 2))
+            else:
+                speech["end"] = int(min(audio_length_samples, speech["end"] + speech_pad_samples))
+                speeches[i + 1]["start"] = int(max(0, speeches[i + 1]["start"] - speech_pad_samples))
+        else:
+            speech["end"] = int(min(audio_length_samples, speech["end"] + speech_pad_samples))
+    return speeches
+
+
+def make_speech_probs(rng: np.random.Generator, num_windows: int) -> np.ndarray:
+    """Runs of speech, silence and uncertain probabilities with random lengths, like the output of the model"""
+    probs = []
+    while len(probs) < num_windows:
+        low, high = [(0.0, 0.2), (0.2, 0.6), (0.6, 1.0)][rng.integers(3)]
+        probs.extend(rng.uniform(low, high, rng.integers(1, 80)))
+    return np.array(probs[:num_windows], dtype=np.float32)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_segmentation_matches_the_reference_loop(seed: int):
+    rng = np.random.default_rng(seed)
+    num_windows = int(rng.integers(1, 3000))
+    speech_probs = make_speech_probs(rng, num_windows)
+    audio_length_samples = num_windows * 512 - int(rng.integers(1, 512))
+    vad_options = VadOptions(
+        threshold=float(rng.uniform(0.3, 0.7)),
+        neg_threshold=None if rng.random() < 0.7 else float(rng.uniform(0.1, 0.8)),
+        min_speech_duration_ms=int(rng.integers(0, 500)),
+        max_speech_duration_s=float("inf") if rng.random() < 0.3 else float(rng.uniform(0.5, 20)),
+        min_silence_duration_ms=int(rng.integers(0, 3000)),
+        speech_pad_ms=int(rng.integers(0, 800)),
+    )
+
+    vad = SileroVAD()
+    expected = reference_speech_timestamps(speech_probs, audio_length_samples, vad_options)
+    assert vad.segment_speech_probs(speech_probs, audio_length_samples, vad_options) == expected
+
+
+def test_speech_probs_are_cached_by_the_audio(tmp_path):
+    model_calls = []
+    rng = np.random.default_rng(0)
+    speech_probs = make_speech_probs(rng, 100)
+
+    def get_speech_probs(audio, fast_mode=False):
+        model_calls.append(audio.shape)
+        return speech_probs
+
+    vad = SileroVAD()
+    vad.get_speech_probs = get_speech_probs
+    vad.register_probs_cache(DiskLRUCache(cache_dir=str(tmp_path), max_bytes=1024 ** 2))
+    audio = np.zeros(100 * 512 - 1, dtype=np.float32)
+
+    first = vad.get_speech_timestamps(audio, VadOptions(threshold=0.5), audio_hash="audio")
+    assert vad.get_speech_timestamps(audio, VadOptions(threshold=0.5), audio_hash="audio") == first
+    vad.get_speech_timestamps(audio, VadOptions(threshold=0.3, speech_pad_ms=0), audio_hash="audio")
+    assert len(model_calls) == 1
+
+    dequantized = np.round(speech_probs * 255).astype(np.uint8).astype(np.float32) / 255
+    assert first == vad.segment_speech_probs(dequantized, len(audio), VadOptions(threshold=0.5))
+
+    vad.get_speech_timestamps(audio, VadOptions(threshold=0.5), audio_hash="other audio")
+    assert len(model_calls) == 2
+
+
+def test_streaming_matches_the_whole_audio():
+    rng = np.random.default_rng(0)
+    t = np.arange(16000 * 20) / 16000
+    bursts = np.sin(2 * np.pi * 150 * t) * (np.sin(2 * np.pi * 0.3 * t) > 0.3)
+    audio = (0.3 * bursts + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+    vad_options = VadOptions(threshold=0.1, min_silence_duration_ms=100, speech_pad_ms=50)
+
+    vad = SileroVAD()
+    np.testing.assert_array_equal(vad.get_speech_probs(audio, block_size_samples=5000), vad.get_speech_probs(audio))
+
+    expected = vad.get_speech_timestamps(audio, vad_options)
+    blocks = (audio[start:start + 7777] for start in range(0, len(audio), 7777))
+    assert list(vad.stream_speech_timestamps(blocks, vad_options)) == expected
+
+
+def test_fast_mode_runs_the_model_on_every_other_window():
+    rng = np.random.default_rng(0)
+    t = np.arange(16000 * 20) / 16000
+    bursts = np.sin(2 * np.pi * 150 * t) * (np.sin(2 * np.pi * 0.3 * t) > 0.3)
+    audio = (0.3 * bursts + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+    vad_options = VadOptions(threshold=0.1, min_silence_duration_ms=100, speech_pad_ms=50)
+
+    vad = SileroVAD()
+    speech_probs = vad.get_speech_probs(audio, fast_mode=True)
+    assert speech_probs.shape == vad.get_speech_probs(audio).shape
+    np.testing.assert_array_equal(speech_probs[0::2][:len(speech_probs[1::2])], speech_probs[1::2])
+    np.testing.assert_array_equal(vad.get_speech_probs(audio, block_size_samples=5000, fast_mode=True), speech_probs)
+
+    expected = vad.get_speech_timestamps(audio, vad_options, fast_mode=True)
+    assert expected
+    blocks = (audio[start:start + 7777] for start in range(0, len(audio), 7777))
+    assert list(vad.stream_speech_timestamps(blocks, vad_options, fast_mode=True)) == expected
+
+
+def reference_restore_speech_timestamps(segments: List[Segment], speech_chunks: List[dict]) -> List[Segment]:
+    """Restoration with a `SpeechTimestampsMap` call per time, which the vectorized restoration has to match"""
+    ts_map = SpeechTimestampsMap(speech_chunks, 16000)
+    for segment in segments:
+        if segment.words:
+            for word in segment.words:
+                chunk_index = ts_map.get_chunk_index((word.start + word.end) / 2)
+                word.start = ts_map.get_original_time(word.start, chunk_index)
+                word.end = ts_map.get_original_time(word.end, chunk_index)
+            segment.start = segment.words[0].start
+            segment.end = segment.words[-1].end
+        else:
+            segment.start = ts_map.get_original_time(segment.start)
+            segment.end = ts_map.get_original_time(segment.end)
+    return segments
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_restoration_matches_the_timestamps_map(seed: int):
+    rng = np.random.default_rng(seed)
+    boundaries = np.sort(rng.choice(16000 * 600, size=2 * int(rng.integers(1, 40)), replace=False))
+    speech_chunks = [{"start": int(start), "end": int(end)} for start, end in boundaries.reshape(-1, 2)]
+    speech_duration = sum(chunk["end"] - chunk["start"] for chunk in speech_chunks) / 16000
+
+    segments = []
+    for i in range(200):
+        # Times on the 10ms grid of whisper, which hit the halfway cases of the rounding
+        times = np.sort(np.round(rng.uniform(0, speech_duration, 2 * int(rng.integers(0, 6)) + 2), 2))
+        words = [Word(start=float(start), end=float(end), word=f"{i}") for start, end in times.reshape(-1, 2)]
+        segments.append(Segment(start=float(times[0]), end=float(times[-1]),
+                                words=words if rng.random() < 0.8 else None))
+
+    expected = reference_restore_speech_timestamps(copy.deepcopy(segments), speech_chunks)
+    assert SileroVAD().restore_speech_timestamps(segments, speech_chunks) == expected
@@ -0,0 +1,48 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from modules.vad.silero_vad import SileroVAD
+from modules.vad.vad_session_pool import VadSessionPool
+
+
+def make_audio(seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(16000 * 10) / 16000
+    bursts = np.sin(2 * np.pi * 150 * t) * (np.sin(2 * np.pi * (0.2 + 0.1 * seed) * t) > 0.3)
+    return (0.3 * bursts + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def test_each_checkout_gets_its_own_session():
+    pool = VadSessionPool(num_sessions=2, intra_op_num_threads=1)
+    with pool.checkout() as first, pool.checkout() as second:
+        assert first is not second
+        assert first.encoder_session.get_session_options().intra_op_num_threads == 1
+
+        acquired = threading.Event()
+
+        def checkout_third():
+            with pool.checkout():
+                acquired.set()
+
+        thread = threading.Thread(target=checkout_third)
+        thread.start()
+        assert not acquired.wait(0.2)
+    thread.join(5)
+    assert acquired.is_set()
+
+    with pool.checkout() as session:
+        assert session in (first, second)
+
+
+def test_concurrent_vad_with_the_pool_matches_the_shared_model():
+    audios = [make_audio(seed) for seed in range(4)]
+    expected = [SileroVAD().get_speech_probs(audio) for audio in audios]
+
+    vad = SileroVAD()
+    vad.register_session_pool(VadSessionPool(num_sessions=2, intra_op_num_threads=1))
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(vad.get_speech_probs, audios))
+    for result, probs in zip(results, expected):
+        np.testing.assert_array_equal(result, probs)